@@ -0,0 +1,25 @@
+"""analysis timings
+
+Revision ID: 0002_analysis_timings
+Revises: 0001_initial_schema
+Create Date: 2026-10-19 10:00:00
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_analysis_timings"
+down_revision: Union[str, None] = "0001_initial_schema"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("analyses", sa.Column("timings", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("analyses", "timings")
@@ -0,0 +1,44 @@
+"""scan jobs
+
+Revision ID: 0003_scan_jobs
+Revises: 0002_analysis_timings
+Create Date: 2026-10-19 12:00:00
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_scan_jobs"
+down_revision: Union[str, None] = "0002_analysis_timings"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "scan_jobs",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("status", sa.String(length=32), nullable=False),
+        sa.Column("org", sa.String(length=255), nullable=True),
+        sa.Column("total", sa.Integer(), nullable=False),
+        sa.Column("token_budget", sa.Integer(), nullable=False),
+        sa.Column("extra_metadata", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    with op.batch_alter_table("analyses") as batch:
+        batch.add_column(sa.Column("job_id", sa.Integer(), nullable=True))
+        batch.create_foreign_key("fk_analyses_job_id", "scan_jobs", ["job_id"], ["id"], ondelete="SET NULL")
+        batch.create_index("ix_analyses_job_id", ["job_id"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("analyses") as batch:
+        batch.drop_index("ix_analyses_job_id")
+        batch.drop_constraint("fk_analyses_job_id", type_="foreignkey")
+        batch.drop_column("job_id")
+    op.drop_table("scan_jobs")
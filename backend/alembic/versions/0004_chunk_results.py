@@ -0,0 +1,41 @@
+"""chunk result checkpoints
+
+Revision ID: 0004_chunk_results
+Revises: 0003_scan_jobs
+Create Date: 2026-10-19 14:00:00
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_chunk_results"
+down_revision: Union[str, None] = "0003_scan_jobs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "chunk_results",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("analysis_id", sa.Integer(), nullable=False),
+        sa.Column("fingerprint", sa.String(length=64), nullable=False),
+        sa.Column("file_path", sa.String(length=512), nullable=False),
+        sa.Column("outcome", sa.String(length=16), nullable=False),
+        sa.Column("summary", sa.Text(), nullable=True),
+        sa.Column("quality_score", sa.Integer(), nullable=True),
+        sa.Column("issues", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["analysis_id"], ["analyses.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("analysis_id", "fingerprint", name="uq_chunk_results_fingerprint"),
+    )
+    op.create_index("ix_chunk_results_analysis_id", "chunk_results", ["analysis_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_chunk_results_analysis_id", table_name="chunk_results")
+    op.drop_table("chunk_results")
@@ -1,28 +1,104 @@
-import asyncio
 import json
 import logging
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from sqlalchemy import select, update
 from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 from sse_starlette.sse import EventSourceResponse
 
 from app.db import get_db, AsyncSessionLocal
 from app.models.analysis import Analysis
-from app.schemas.analysis import AnalysisCreate, AnalysisDetail, AnalysisList, AnalysisOut
+from app.models.issue import Issue
+from app.schemas.analysis import (
+    AnalysisCreate,
+    AnalysisDetail,
+    AnalysisList,
+    AnalysisOut,
+    AnalysisResume,
+    AnalysisTimings,
+)
 from app.services.analysis_agent import AnalysisAgent, AnalysisInput
+from app.services.compression import accepted_encodings, gzip_stream, pick_encoding
+from app.services.exporters import EXPORT_COLUMNS, MEDIA_TYPES, csv_lines, ndjson_lines, sarif_chunks
+from app.services.profiling import artifact_path, remove_artifacts
 from app.services.progress import progress_hub
+from app.services.response_cache import CachedBody, analysis_cache
+from app.services.scan_scheduler import TERMINAL_STATUSES
+from app.services.task_registry import analysis_tasks
+from app.services.tracing import waterfall
 from app.core.config import settings
+from app.core.metrics import SSE_SUBSCRIBERS
+from app.core.security import is_admin, require_admin
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 agent = AnalysisAgent()
+# How long cancel and delete wait for a run to unwind (abort its LLM calls, record its status).
+CANCEL_WAIT_S = 5.0
+# Rows fetched per round trip of the export cursor; also the unit each export response chunk is built from.
+EXPORT_BATCH_ROWS = 1_000
+# Statuses of a run that was still in progress; after a crash nothing is driving it any more.
+IN_PROGRESS_STATUSES = {"queued", "fetching", "chunking", "analyzing", "persisting"}
+
+
+def start_run(analysis_id: int, payload: AnalysisInput):
+    async def runner() -> None:
+        async with AsyncSessionLocal() as session:
+            await agent.run(analysis_id, session, payload)
+
+    return analysis_tasks.start(analysis_id, runner())
+
+
+def stored_input(analysis: Analysis, github_token: str | None = None) -> AnalysisInput:
+    """Rebuild a run's input from the row; chunks checkpointed by the earlier attempt are reused."""
+    metadata = analysis.extra_metadata or {}
+    if github_token is None and metadata.get("trigger") == "webhook":
+        github_token = settings.webhook_github_token or None
+    return AnalysisInput(
+        repo_url=analysis.repo_url,
+        pr_number=analysis.pr_number,
+        github_token=github_token,
+        allow_git_clone=bool(metadata.get("allow_git_clone")),
+        head_sha=metadata.get("head_sha"),
+        base_sha=metadata.get("base_sha"),
+    )
+
+
+async def resume_interrupted() -> list[int]:
+    """Restart every standalone analysis a previous process left in progress.
+
+    Children of scan jobs are resumed with their job, under its concurrency and token budget.
+    """
+    resumed = []
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(Analysis).where(Analysis.status.in_(IN_PROGRESS_STATUSES), Analysis.job_id.is_(None))
+        )
+        for analysis in result.scalars().all():
+            # Claim the row so a second worker starting at the same time does not resume it too.
+            claimed = await session.execute(
+                update(Analysis)
+                .where(Analysis.id == analysis.id, Analysis.status == analysis.status)
+                .values(status="queued")
+            )
+            await session.commit()
+            if claimed.rowcount:
+                start_run(analysis.id, stored_input(analysis))
+                resumed.append(analysis.id)
+    if resumed:
+        logger.info("Resumed %d interrupted analyses: %s", len(resumed), resumed)
+    return resumed
 
 
 @router.post("/analyze", response_model=AnalysisOut)
-async def create_analysis(payload: AnalysisCreate, db: AsyncSession = Depends(get_db)):
+async def create_analysis(payload: AnalysisCreate, request: Request, db: AsyncSession = Depends(get_db)):
     if not settings.openrouter_api_key:
         raise HTTPException(status_code=400, detail="OPENROUTER_API_KEY is not configured")
+    if payload.profile and not is_admin(request):
+        raise HTTPException(status_code=403, detail="Profiling requires the admin API key")
 
     analysis = Analysis(
         repo_url=str(payload.repo_url),
@@ -43,13 +119,10 @@ async def create_analysis(payload: AnalysisCreate, db: AsyncSession = Depends(ge
         pr_number=payload.pr_number,
         github_token=payload.github_token,
         allow_git_clone=payload.allow_git_clone,
+        profile=payload.profile,
     )
 
-    async def runner() -> None:
-        async with AsyncSessionLocal() as session:
-            await agent.run(analysis.id, session, task_payload)
-
-    asyncio.create_task(runner())
+    start_run(analysis.id, task_payload)
     return analysis
 
 
@@ -60,15 +133,82 @@ async def list_analyses(db: AsyncSession = Depends(get_db)):
     return AnalysisList(items=items)
 
 
+def _cached_response(entry: CachedBody, request: Request) -> Response:
+    # no-cache: clients may keep the body but must revalidate, which costs a 304 and no DB work.
+    coding = pick_encoding(request.headers.get("accept-encoding"), entry.encoded)
+    headers = {"ETag": entry.etag_for(coding), "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if entry.matches(request.headers.get("if-none-match"), coding):
+        return Response(status_code=304, headers=headers)
+    if coding is not None:
+        headers["Content-Encoding"] = coding
+    return Response(entry.encoded[coding] if coding else entry.body, media_type="application/json", headers=headers)
+
+
 @router.get("/analyses/{analysis_id}", response_model=AnalysisDetail)
-async def get_analysis(analysis_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(Analysis).options(selectinload(Analysis.issues)).where(Analysis.id == analysis_id)
-    )
-    analysis = result.scalar_one_or_none()
-    if not analysis:
+async def get_analysis(analysis_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    entry = await analysis_cache.get(analysis_id)
+    if entry is None:
+        result = await db.execute(
+            select(Analysis).options(selectinload(Analysis.issues)).where(Analysis.id == analysis_id)
+        )
+        analysis = result.scalar_one_or_none()
+        if not analysis:
+            raise HTTPException(status_code=404, detail="Analysis not found")
+        if analysis.status != "completed":
+            return analysis
+        body = AnalysisDetail.model_validate(analysis).model_dump_json().encode("utf-8")
+        entry = await analysis_cache.put(analysis_id, body)
+    return _cached_response(entry, request)
+
+
+async def _issue_batches(analysis_id: int):
+    # The request's session is closed before a streamed body is sent, so the cursor gets its own.
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(
+            select(*(getattr(Issue, column) for column in EXPORT_COLUMNS))
+            .where(Issue.analysis_id == analysis_id)
+            .order_by(Issue.id)
+            .execution_options(yield_per=EXPORT_BATCH_ROWS)
+        )
+        async for partition in result.partitions():
+            yield [tuple(row) for row in partition]
+
+
+@router.get("/analyses/{analysis_id}/export")
+async def export_analysis(
+    analysis_id: int,
+    request: Request,
+    export_format: Literal["ndjson", "sarif", "csv"] = Query("ndjson", alias="format"),
+    db: AsyncSession = Depends(get_db),
+):
+    repo_url = await db.scalar(select(Analysis.repo_url).where(Analysis.id == analysis_id))
+    if repo_url is None:
         raise HTTPException(status_code=404, detail="Analysis not found")
-    return analysis
+
+    batches = _issue_batches(analysis_id)
+    if export_format == "sarif":
+        body = sarif_chunks(batches, repo_url)
+    elif export_format == "csv":
+        body = csv_lines(batches)
+    else:
+        body = ndjson_lines(batches)
+    headers = {
+        "Content-Disposition": f'attachment; filename="analysis-{analysis_id}.{export_format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if "gzip" in accepted_encodings(request.headers.get("accept-encoding")):
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=MEDIA_TYPES[export_format], headers=headers)
+
+
+@router.get("/analyses/{analysis_id}/timings", response_model=AnalysisTimings)
+async def get_analysis_timings(analysis_id: int, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(Analysis.status, Analysis.timings).where(Analysis.id == analysis_id))
+    row = result.one_or_none()
+    if not row:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return AnalysisTimings(analysis_id=analysis_id, status=row.status, **waterfall(row.timings))
 
 
 @router.delete("/analyses/{analysis_id}")
@@ -76,27 +216,67 @@ async def delete_analysis(analysis_id: int, db: AsyncSession = Depends(get_db)):
     analysis = await db.get(Analysis, analysis_id)
     if not analysis:
         raise HTTPException(status_code=404, detail="Analysis not found")
+    await analysis_tasks.cancel(analysis_id, "Analysis deleted", wait_s=CANCEL_WAIT_S)
     await db.delete(analysis)
     await db.commit()
+    analysis_cache.invalidate(analysis_id)
+    remove_artifacts(analysis_id)
     return {"status": "deleted"}
 
 
+@router.post("/analyses/{analysis_id}/cancel")
+async def cancel_analysis(analysis_id: int, db: AsyncSession = Depends(get_db)):
+    analysis = await db.get(Analysis, analysis_id)
+    if not analysis:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    if not await analysis_tasks.cancel(analysis_id, "Cancelled by request", wait_s=CANCEL_WAIT_S):
+        raise HTTPException(status_code=409, detail="Analysis is not running in this worker")
+    return {"status": "cancelling" if analysis_tasks.is_running(analysis_id) else "cancelled"}
+
+
+@router.post("/analyses/{analysis_id}/resume", response_model=AnalysisOut)
+async def resume_analysis(
+    analysis_id: int, payload: AnalysisResume | None = None, db: AsyncSession = Depends(get_db)
+):
+    analysis = await db.get(Analysis, analysis_id)
+    if not analysis:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    if analysis.status == "completed" or analysis_tasks.is_running(analysis_id):
+        raise HTTPException(status_code=409, detail=f"Analysis is {analysis.status}")
+    analysis.status = "queued"
+    await db.commit()
+    start_run(analysis_id, stored_input(analysis, payload.github_token if payload else None))
+    return analysis
+
+
+@router.get("/analyses/{analysis_id}/artifacts/{name}", dependencies=[Depends(require_admin)])
+async def get_analysis_artifact(analysis_id: int, name: str):
+    path = artifact_path(analysis_id, name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    return FileResponse(path, filename=f"analysis-{analysis_id}-{name}")
+
+
 @router.get("/analyses/{analysis_id}/events")
 async def analysis_events(analysis_id: int):
     queue = progress_hub.get_queue(analysis_id)
 
     async def event_generator():
-        while True:
-            update = await queue.get()
-            yield {
-                "event": "progress",
-                "data": json.dumps({
-                    "status": update.status,
-                    "progress": update.progress,
-                    "message": update.message,
-                }),
-            }
-            if update.status in {"completed", "failed"}:
-                break
+        SSE_SUBSCRIBERS.inc()
+        try:
+            while True:
+                update = await queue.get()
+                yield {
+                    "event": "progress",
+                    "data": json.dumps({
+                        "status": update.status,
+                        "progress": update.progress,
+                        "message": update.message,
+                    }),
+                }
+                if update.status in TERMINAL_STATUSES:
+                    break
+        finally:
+            SSE_SUBSCRIBERS.dec()
 
     return EventSourceResponse(event_generator())
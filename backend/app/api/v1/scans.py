@@ -0,0 +1,146 @@
+import json
+import logging
+
+import httpx
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sse_starlette.sse import EventSourceResponse
+
+from app.api.v1.analyze import agent
+from app.core.config import settings
+from app.core.metrics import SSE_SUBSCRIBERS
+from app.db import AsyncSessionLocal, get_db
+from app.models.analysis import Analysis
+from app.models.scan_job import ScanJob
+from app.schemas.analysis import ScanCreate, ScanJobDetail
+from app.services.progress import progress_hub
+from app.services.scan_scheduler import TERMINAL_STATUSES, ScanOptions, ScanScheduler, rollup, summarize_job
+from app.services.task_registry import scan_tasks
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+scheduler = ScanScheduler(agent)
+
+
+async def resume_interrupted_scans() -> list[int]:
+    """Restart every scan job a previous process left queued or running.
+
+    Children the earlier attempt settled keep their results; the rest run again without a
+    GitHub token, which is never stored.
+    """
+    resumed = []
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(ScanJob).where(ScanJob.status.in_(("queued", "running"))))
+        for job in result.scalars().all():
+            # Claim the row so a second worker starting at the same time does not resume it too.
+            claimed = await session.execute(
+                update(ScanJob).where(ScanJob.id == job.id, ScanJob.status == job.status).values(status="queued")
+            )
+            await session.commit()
+            if claimed.rowcount:
+                allow_git_clone = bool((job.extra_metadata or {}).get("allow_git_clone"))
+                scan_tasks.start(job.id, scheduler.run_job(job.id, ScanOptions(None, allow_git_clone)))
+                resumed.append(job.id)
+    if resumed:
+        logger.info("Resumed %d interrupted scan jobs: %s", len(resumed), resumed)
+    return resumed
+
+
+async def _load_job(db: AsyncSession, job_id: int) -> ScanJobDetail:
+    result = await db.execute(select(ScanJob).options(selectinload(ScanJob.analyses)).where(ScanJob.id == job_id))
+    job = result.scalar_one_or_none()
+    if not job:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    detail = ScanJobDetail.model_validate(job)
+    detail.rollup = await summarize_job(db, job_id)
+    return detail
+
+
+@router.post("/scans", response_model=ScanJobDetail)
+async def create_scan(payload: ScanCreate, db: AsyncSession = Depends(get_db)):
+    if not settings.openrouter_api_key:
+        raise HTTPException(status_code=400, detail="OPENROUTER_API_KEY is not configured")
+
+    if payload.org:
+        try:
+            repo_urls = await agent.github.list_org_repos(payload.org, payload.github_token, settings.batch_max_repos)
+        except (httpx.HTTPError, RuntimeError) as exc:
+            logger.warning("Listing repositories for %s failed: %s", payload.org, exc)
+            raise HTTPException(status_code=502, detail=f"Could not list repositories for {payload.org}")
+        targets = [(url, None) for url in repo_urls]
+    else:
+        targets = [(str(target.repo_url), target.pr_number) for target in payload.targets]
+    if not targets:
+        raise HTTPException(status_code=400, detail="No repositories to scan")
+    if len(targets) > settings.batch_max_repos:
+        raise HTTPException(status_code=400, detail=f"At most {settings.batch_max_repos} repositories per scan")
+
+    job = ScanJob(
+        status="queued",
+        org=payload.org,
+        total=len(targets),
+        token_budget=payload.token_budget,
+        extra_metadata={"allow_git_clone": payload.allow_git_clone},
+    )
+    db.add(job)
+    await db.flush()
+    db.add_all(
+        Analysis(
+            repo_url=repo_url,
+            pr_number=pr_number,
+            job_id=job.id,
+            status="queued",
+            progress=0,
+            extra_metadata={"allow_git_clone": payload.allow_git_clone, "thread_name": None},
+        )
+        for repo_url, pr_number in targets
+    )
+    await db.commit()
+
+    options = ScanOptions(github_token=payload.github_token, allow_git_clone=payload.allow_git_clone)
+    scan_tasks.start(job.id, scheduler.run_job(job.id, options))
+    return await _load_job(db, job.id)
+
+
+@router.get("/scans/{job_id}", response_model=ScanJobDetail)
+async def get_scan(job_id: int, db: AsyncSession = Depends(get_db)):
+    return await _load_job(db, job_id)
+
+
+@router.get("/scans/{job_id}/events")
+async def scan_events(job_id: int):
+    # Subscribe before reading the snapshot so no child update falls between the two.
+    queue = progress_hub.get_job_queue(job_id)
+    async with AsyncSessionLocal() as session:
+        if await session.get(ScanJob, job_id) is None:
+            raise HTTPException(status_code=404, detail="Scan not found")
+        result = await session.execute(
+            select(Analysis.id, Analysis.status, Analysis.progress).where(Analysis.job_id == job_id)
+        )
+        states = {row.id: (row.status, row.progress) for row in result}
+
+    async def event_generator():
+        SSE_SUBSCRIBERS.inc()
+        try:
+            yield {"event": "job", "data": json.dumps(rollup(states))}
+            while any(status not in TERMINAL_STATUSES for status, _ in states.values()):
+                update = await queue.get()
+                if update.analysis_id not in states:
+                    continue
+                states[update.analysis_id] = (update.status, update.progress)
+                yield {
+                    "event": "progress",
+                    "data": json.dumps({
+                        "analysis_id": update.analysis_id,
+                        "status": update.status,
+                        "progress": update.progress,
+                        "message": update.message,
+                    }),
+                }
+                yield {"event": "job", "data": json.dumps(rollup(states))}
+        finally:
+            SSE_SUBSCRIBERS.dec()
+
+    return EventSourceResponse(event_generator())
@@ -0,0 +1,80 @@
+import json
+import logging
+
+from fastapi import APIRouter, HTTPException, Request
+
+from app.api.v1.analyze import agent
+from app.core.config import settings
+from app.db import AsyncSessionLocal
+from app.models.analysis import Analysis
+from app.services.analysis_agent import AnalysisInput
+from app.services.task_registry import analysis_tasks
+from app.services.webhooks import PushDebouncer, parse_pull_request_event, verify_signature
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+async def launch(repo_url: str, pr_number: int, head_sha: str, base_sha: str | None):
+    async with AsyncSessionLocal() as session:
+        analysis = Analysis(
+            repo_url=repo_url,
+            pr_number=pr_number,
+            status="queued",
+            progress=0,
+            extra_metadata={
+                "allow_git_clone": False,
+                "thread_name": None,
+                "trigger": "webhook",
+                "head_sha": head_sha,
+                "base_sha": base_sha,
+            },
+        )
+        session.add(analysis)
+        await session.commit()
+        analysis_id = analysis.id
+
+    payload = AnalysisInput(
+        repo_url=repo_url,
+        pr_number=pr_number,
+        github_token=settings.webhook_github_token or None,
+        allow_git_clone=False,
+        head_sha=head_sha,
+        base_sha=base_sha,
+    )
+
+    async def runner() -> str | None:
+        async with AsyncSessionLocal() as session:
+            await agent.run(analysis_id, session, payload)
+            analysis = await session.get(Analysis, analysis_id)
+            return analysis.status if analysis else None
+
+    return analysis_id, analysis_tasks.start(analysis_id, runner())
+
+
+debouncer = PushDebouncer(launch, settings.webhook_debounce_s)
+
+
+@router.post("/webhooks/github", status_code=202)
+async def github_webhook(request: Request):
+    if not settings.webhook_secret:
+        raise HTTPException(status_code=404, detail="Webhooks are not configured")
+    body = await request.body()
+    if not verify_signature(settings.webhook_secret, body, request.headers.get("x-hub-signature-256")):
+        raise HTTPException(status_code=401, detail="Invalid signature")
+
+    event_name = request.headers.get("x-github-event")
+    if event_name == "ping":
+        return {"status": "pong"}
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    event = parse_pull_request_event(event_name, payload)
+    if event is None:
+        return {"status": "ignored"}
+    if not settings.openrouter_api_key:
+        raise HTTPException(status_code=400, detail="OPENROUTER_API_KEY is not configured")
+    status = await debouncer.handle(event)
+    logger.info("Webhook %s for %s#%s at %s: %s", event.action, event.repo_url, event.pr_number, event.head_sha, status)
+    return {"status": status}
@@ -7,19 +7,63 @@ class Settings(BaseSettings):
     environment: str = "development"
     database_url: str = "sqlite+aiosqlite:///./acra.db"
     github_api_base: str = "https://api.github.com"
+    github_cache_dir: str = ".acra_cache/github"
+    github_cache_max_body_bytes: int = 2_000_000
+    github_cache_max_bytes: int = 512 * 1024**2
+    # "auto" fetches contents through GraphQL when a token is available, REST otherwise.
+    github_content_strategy: str = "auto"
+    github_graphql_batch_size: int = 50
+    github_graphql_batch_bytes: int = 2_000_000
     openrouter_api_base: str = "https://openrouter.ai/api/v1"
     openrouter_model: str = "qwen/qwen3-235b-a22b-thinking-2507"
     openrouter_api_key: str = ""
+    # Cascade: a small model triages every chunk and only flagged chunks reach `openrouter_model`.
+    cascade_enabled: bool = False
+    triage_model: str = "qwen/qwen3-30b-a3b-instruct-2507"
+    triage_escalate_risk: float = 0.3
+    triage_min_confidence: float = 0.7
+    # "auto" asks OpenRouter which models accept a JSON schema `response_format`.
+    structured_output: str = "auto"
+    llm_max_output_tokens: int = 8_192
+    parse_repair_enabled: bool = True
     request_timeout_s: int = 60
     max_file_bytes: int = 400_000
+    # Dedupe identical files and strip license headers and blank-line runs before chunking.
+    prompt_compaction: bool = True
     chunk_char_limit: int = 8_000
     max_files: int = 2_000
+    max_input_tokens: int = 0
+    analysis_deadline_s: int = 0
+    planner_seconds_per_chunk: float = 20.0
+    planner_churn_days: int = 90
+    max_data_file_bytes: int = 100_000
+    skip_generated_files: bool = True
     allow_git_clone_default: bool = False
+    repo_cache_dir: str = ".acra_cache/repos"
+    repo_cache_max_bytes: int = 5 * 1024**3
     max_concurrent_chunks: int = 2
+    local_read_workers: int = 8
+    batch_max_concurrency: int = 4
+    batch_max_repos: int = 500
+    # Restart analyses left unfinished by a crash; only safe when a single worker owns the database.
+    resume_on_startup: bool = False
+    # Push-triggered PR analysis: GitHub webhooks signed with this secret (empty disables the endpoint).
+    webhook_secret: str = ""
+    webhook_debounce_s: float = 10.0
+    webhook_github_token: str = ""
     api_key: str = ""
+    admin_api_key: str = ""
+    artifacts_dir: str = ".acra_cache/artifacts"
+    # Serialized bodies of completed analyses: LRU entries in memory, plus an optional shared disk copy.
+    response_cache_entries: int = 256
+    response_cache_dir: str = ""
+    response_cache_disk_entries: int = 10_000
     cors_allow_origins: list[str] = ["http://localhost:5173", "http://127.0.0.1:5173"]
     rate_limit_per_minute: int = 60
     rate_limit_window_s: int = 60
+    rate_limit_max_keys: int = 10_000
+    rate_limit_shared_path: str = ""
+    metrics_dir: str = ""
 
     @field_validator("cors_allow_origins", mode="before")
     @classmethod
@@ -0,0 +1,291 @@
+"""In-process metrics registry rendered in the Prometheus text exposition format.
+
+With ``ACRA_METRICS_DIR`` set, every worker process periodically writes a JSON snapshot
+of its metrics into that directory and ``/metrics`` merges the snapshots of all workers:
+counters and histograms are summed, gauges are combined from live workers only.
+"""
+from __future__ import annotations
+
+import asyncio
+import atexit
+import json
+import logging
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+FLUSH_INTERVAL_S = 5.0
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str, labelnames: tuple[str, ...]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = registry.lock
+        self._samples: dict[tuple[str, ...], object] = {}
+        registry.register(self)
+
+    def _key(self, labels: dict[str, object]) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def snapshot(self) -> dict[str, object]:
+        with self._lock:
+            return {json.dumps(key): _copy(value) for key, value in self._samples.items()}
+
+
+def _copy(value: object) -> object:
+    if isinstance(value, dict):
+        return {"buckets": list(value["buckets"]), "sum": value["sum"], "count": value["count"]}
+    return value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._samples[key] = self._samples.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, mode: str = "sum", **kwargs) -> None:
+        # `mode` decides how values from several worker processes are combined: sum, min or max.
+        self.mode = mode
+        super().__init__(*args, **kwargs)
+
+    def set(self, value: float, **labels: object) -> None:
+        with self._lock:
+            self._samples[self._key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._samples[key] = self._samples.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: object) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: tuple[float, ...] = DEFAULT_BUCKETS, **kwargs) -> None:
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        super().__init__(*args, **kwargs)
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = self._key(labels)
+        with self._lock:
+            sample = self._samples.get(key)
+            if sample is None:
+                sample = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._samples[key] = sample
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    sample["buckets"][index] += 1
+                    break
+            sample["sum"] += value
+            sample["count"] += 1
+
+    def time(self, **labels: object) -> "_Timer":
+        return _Timer(self, labels)
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: dict[str, object]) -> None:
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class MetricsRegistry:
+    def __init__(self, directory: str = "") -> None:
+        self.lock = threading.Lock()
+        self.metrics: dict[str, _Metric] = {}
+        self.directory = Path(directory) if directory else None
+        self._flush_task: asyncio.Task | None = None
+
+    def register(self, metric: _Metric) -> None:
+        self.metrics[metric.name] = metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return Counter(self, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), mode: str = "sum") -> Gauge:
+        return Gauge(self, name, documentation, labelnames, mode=mode)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return Histogram(self, name, documentation, labelnames, buckets=buckets)
+
+    def snapshot(self) -> dict[str, dict[str, object]]:
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    # -- multi-process support -------------------------------------------------
+
+    def _snapshot_path(self) -> Path:
+        return self.directory / f"metrics-{os.getpid()}.json"
+
+    def flush(self) -> None:
+        if self.directory is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        target = self._snapshot_path()
+        staging = target.with_suffix(".tmp")
+        staging.write_text(json.dumps(self.snapshot()))
+        os.replace(staging, target)
+
+    def start_background_flush(self) -> None:
+        if self.directory is None or self._flush_task is not None:
+            return
+
+        async def _loop() -> None:
+            while True:
+                try:
+                    await asyncio.to_thread(self.flush)
+                except OSError as exc:
+                    logger.warning("Failed to flush metrics snapshot: %s", exc)
+                await asyncio.sleep(FLUSH_INTERVAL_S)
+
+        self._flush_task = asyncio.create_task(_loop())
+        atexit.register(self.flush)
+
+    def _collect(self) -> list[tuple[dict[str, dict[str, object]], bool]]:
+        """Return (snapshot, is_live) pairs for this process and every other worker.
+
+        Snapshots of exited workers stay in the sum so their counters and histograms never go
+        backwards (which Prometheus would read as a reset); only their gauges are left out.
+        """
+        snapshots = [(self.snapshot(), True)]
+        if self.directory is None or not self.directory.exists():
+            return snapshots
+        own = self._snapshot_path()
+        for path in self.directory.glob("metrics-*.json"):
+            if path == own:
+                continue
+            try:
+                live = _pid_alive(int(path.stem.removeprefix("metrics-")))
+                snapshots.append((json.loads(path.read_text()), live))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def render(self) -> str:
+        snapshots = self._collect()
+        lines: list[str] = []
+        for name, metric in self.metrics.items():
+            merged = self._merge(metric, snapshots)
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key, value in sorted(merged.items()):
+                labels = tuple(json.loads(key))
+                if isinstance(metric, Histogram):
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets, value["buckets"]):
+                        cumulative += count
+                        bucket_label = f'le="{_format_value(bound)}"'
+                        lines.append(
+                            f"{name}_bucket{_format_labels(metric.labelnames, labels, bucket_label)} {cumulative}"
+                        )
+                    lines.append(f"{name}_sum{_format_labels(metric.labelnames, labels)} {_format_value(value['sum'])}")
+                    lines.append(f"{name}_count{_format_labels(metric.labelnames, labels)} {value['count']}")
+                else:
+                    lines.append(f"{name}{_format_labels(metric.labelnames, labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _merge(metric: _Metric, snapshots: list[tuple[dict[str, dict[str, object]], bool]]) -> dict[str, object]:
+        merged: dict[str, object] = {}
+        for snapshot, live in snapshots:
+            samples = snapshot.get(metric.name, {})
+            if isinstance(metric, Gauge) and not live:
+                continue
+            for key, value in samples.items():
+                if key not in merged:
+                    merged[key] = _copy(value)
+                elif isinstance(metric, Histogram):
+                    current = merged[key]
+                    current["buckets"] = [a + b for a, b in zip(current["buckets"], value["buckets"])]
+                    current["sum"] += value["sum"]
+                    current["count"] += value["count"]
+                elif isinstance(metric, Gauge) and metric.mode == "min":
+                    merged[key] = min(merged[key], value)
+                elif isinstance(metric, Gauge) and metric.mode == "max":
+                    merged[key] = max(merged[key], value)
+                else:
+                    merged[key] += value
+        return merged
+
+
+registry = MetricsRegistry(settings.metrics_dir)
+
+GITHUB_REQUESTS = registry.counter(
+    "acra_github_requests_total", "GitHub API requests by endpoint and status code", ("endpoint", "status")
+)
+GITHUB_RATE_LIMIT_REMAINING = registry.gauge(
+    "acra_github_rate_limit_remaining", "Last reported GitHub API rate limit remaining", mode="min"
+)
+GITHUB_CACHE = registry.counter("acra_github_cache_total", "Conditional GitHub requests by cache result", ("result",))
+LLM_REQUESTS = registry.counter("acra_llm_requests_total", "OpenRouter requests by model and outcome", ("model", "status"))
+LLM_LATENCY = registry.histogram("acra_llm_request_seconds", "OpenRouter request latency per attempt", ("model",))
+LLM_RETRIES = registry.counter("acra_llm_retries_total", "OpenRouter request retries by reason", ("model", "reason"))
+CHUNKS_ANALYZED = registry.counter("acra_chunks_analyzed_total", "Chunks analyzed by outcome", ("outcome",))
+CASCADE_CHUNKS = registry.counter("acra_cascade_chunks_total", "Chunks by the cascade tier that produced the result", ("tier",))
+PARSE_FAILURES = registry.counter("acra_parse_failures_total", "LLM responses that could not be parsed as JSON")
+ANALYSES = registry.counter("acra_analyses_total", "Finished analyses by final status", ("status",))
+DB_COMMIT_LATENCY = registry.histogram("acra_db_commit_seconds", "Database commit latency in the analysis pipeline")
+SSE_SUBSCRIBERS = registry.gauge("acra_sse_subscribers", "Open SSE progress streams")
+RATE_LIMITED = registry.counter("acra_rate_limited_total", "Requests rejected by the rate limiter")
+RESPONSE_CACHE = registry.counter("acra_response_cache_total", "Completed-analysis body cache lookups by result", ("result",))
+PROGRESS_EVENTS = registry.counter("acra_progress_events_total", "Progress updates published", ("status",))
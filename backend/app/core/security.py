@@ -1,12 +1,19 @@
 from __future__ import annotations
 
+import asyncio
+import math
+import sqlite3
+import threading
 import time
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Callable
 
 from fastapi import Header, HTTPException, Request
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.core.config import settings
+from app.core.metrics import RATE_LIMITED
 
 SENSITIVE_FIELDS = {"token", "authorization", "api_key", "openrouter_api_key", "github_token"}
 
@@ -19,6 +26,22 @@ def redact(value: str | None) -> str | None:
     return value[:2] + "***" + value[-2:]
 
 
+def request_token(request: Request) -> str | None:
+    authorization = request.headers.get("authorization")
+    token = None
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization.split(" ", 1)[1].strip()
+    if not token:
+        token = request.headers.get("x-acra-api-key")
+    if not token:
+        token = request.query_params.get("api_key")
+    return token
+
+
+def is_admin(request: Request) -> bool:
+    return bool(settings.admin_api_key) and request_token(request) == settings.admin_api_key
+
+
 def require_api_key(
     request: Request,
     authorization: str | None = Header(default=None),
@@ -28,63 +51,163 @@ def require_api_key(
         return
     if not settings.api_key:
         return
-    token = None
-    if authorization and authorization.lower().startswith("bearer "):
-        token = authorization.split(" ", 1)[1].strip()
-    if not token:
-        token = x_acra_api_key
-    if not token:
-        token = request.query_params.get("api_key")
-    if token != settings.api_key:
+    token = request_token(request)
+    if token != settings.api_key and not is_admin(request):
         raise HTTPException(status_code=401, detail="Unauthorized")
 
 
-@dataclass
-class RateLimitEntry:
-    window_start: float
-    count: int
+def require_admin(request: Request):
+    if not is_admin(request):
+        raise HTTPException(status_code=403, detail="Admin API key required")
 
 
-class RateLimiter:
-    def __init__(self, limit: int, window_s: int) -> None:
-        self.limit = max(1, limit)
+@dataclass
+class Bucket:
+    tokens: float
+    updated: float
+
+
+class MemoryBucketStore:
+    """Token buckets for one process, bounded by LRU eviction of at most `max_keys` entries."""
+
+    def __init__(self, max_keys: int) -> None:
+        self.max_keys = max(1, max_keys)
+        self._buckets: OrderedDict[str, Bucket] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, key: str, capacity: float, refill_per_s: float, now: float) -> bool:
+        # A bucket idle long enough to refill completely is indistinguishable from a new one.
+        idle_s = capacity / refill_per_s
+        while self._buckets:
+            oldest_key, oldest = next(iter(self._buckets.items()))
+            if now - oldest.updated < idle_s:
+                break
+            del self._buckets[oldest_key]
+
+        bucket = self._buckets.pop(key, None) or Bucket(tokens=capacity, updated=now)
+        bucket.tokens = min(capacity, bucket.tokens + (now - bucket.updated) * refill_per_s)
+        bucket.updated = now
+        allowed = bucket.tokens >= 1
+        if allowed:
+            bucket.tokens -= 1
+        self._buckets[key] = bucket
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed
+
+
+class SQLiteBucketStore:
+    """Token buckets shared by every worker process through one SQLite file."""
+
+    PRUNE_EVERY = 1_000
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, capacity: float, refill_per_s: float, now: float) -> bool:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * refill_per_s)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+            self._calls += 1
+            if self._calls % self.PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM rate_limit_buckets WHERE updated < ?", (now - capacity / refill_per_s,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed
+
+
+class TokenBucketLimiter:
+    """Allows bursts of `limit` requests per key, refilling at `limit` tokens per `window_s`."""
+
+    def __init__(self, limit: int, window_s: int, max_keys: int = 10_000, shared_path: str = "") -> None:
+        self.capacity = float(max(1, limit))
         self.window_s = max(1, window_s)
-        self._entries: dict[str, RateLimitEntry] = {}
-
-    def _key(self, request: Request) -> str:
-        client = request.client.host if request.client else "unknown"
-        return f"{client}:{request.url.path}"
-
-    def allow(self, request: Request) -> bool:
-        now = time.monotonic()
-        key = self._key(request)
-        entry = self._entries.get(key)
-        if not entry or now - entry.window_start >= self.window_s:
-            self._entries[key] = RateLimitEntry(window_start=now, count=1)
-            return True
-        if entry.count >= self.limit:
-            return False
-        entry.count += 1
-        return True
-
-
-def rate_limit_middleware(limiter: RateLimiter) -> Callable:
-    async def _middleware(request: Request, call_next):
-        if request.url.path.startswith("/api/"):
-            if not limiter.allow(request):
-                raise HTTPException(status_code=429, detail="Rate limit exceeded")
-        return await call_next(request)
-
-    return _middleware
-
-
-def security_headers_middleware() -> Callable:
-    async def _middleware(request: Request, call_next):
-        response = await call_next(request)
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["Referrer-Policy"] = "no-referrer"
-        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
-        return response
-
-    return _middleware
+        self.refill_per_s = self.capacity / self.window_s
+        self.shared = bool(shared_path)
+        self.store = SQLiteBucketStore(shared_path) if shared_path else MemoryBucketStore(max_keys)
+
+    async def allow(self, key: str) -> bool:
+        if self.shared:
+            return await asyncio.to_thread(self.store.take, key, self.capacity, self.refill_per_s, time.time())
+        return self.store.take(key, self.capacity, self.refill_per_s, time.monotonic())
+
+
+class RateLimitMiddleware:
+    """Pure ASGI rate limiting for /api/ paths; responses pass through untouched, including SSE streams."""
+
+    def __init__(self, app: ASGIApp, limiter: TokenBucketLimiter, prefix: str = "/api/") -> None:
+        self.app = app
+        self.limiter = limiter
+        self.prefix = prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+        client = scope.get("client")
+        key = f"{client[0] if client else 'unknown'}:{scope['path']}"
+        if not await self.limiter.allow(key):
+            RATE_LIMITED.inc()
+            response = JSONResponse(
+                {"detail": "Rate limit exceeded"},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(1 / self.limiter.refill_per_s))},
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+SECURITY_HEADERS = [
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"referrer-policy", b"no-referrer"),
+    (b"permissions-policy", b"geolocation=(), microphone=(), camera=()"),
+]
+
+
+class SecurityHeadersMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                names = {name for name, _ in SECURITY_HEADERS}
+                headers = [(k, v) for k, v in message.get("headers", []) if k.lower() not in names]
+                message["headers"] = headers + SECURITY_HEADERS
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
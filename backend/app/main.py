@@ -1,11 +1,17 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.api.metrics import router as metrics_router
 from app.api.router import api_router
+from app.api.v1.analyze import CANCEL_WAIT_S, resume_interrupted
+from app.api.v1.scans import resume_interrupted_scans
+from app.api.v1.webhooks import router as webhooks_router
 from app.core.config import settings
 from app.core.logging import setup_logging
-from app.core.security import RateLimiter, rate_limit_middleware, security_headers_middleware
+from app.core.metrics import registry
+from app.core.security import RateLimitMiddleware, SecurityHeadersMiddleware, TokenBucketLimiter, require_api_key
 from app.db import init_db
+from app.services.task_registry import analysis_tasks, scan_tasks
 import logging
 
 
@@ -24,14 +30,33 @@ def create_app() -> FastAPI:
     )
 
     app.include_router(api_router, prefix="/api/v1")
+    # Webhooks authenticate with their HMAC signature instead of the API key.
+    app.include_router(webhooks_router, prefix="/api/v1", tags=["webhooks"])
+    app.include_router(metrics_router, tags=["metrics"], dependencies=[Depends(require_api_key)])
 
-    limiter = RateLimiter(settings.rate_limit_per_minute, settings.rate_limit_window_s)
-    app.middleware("http")(rate_limit_middleware(limiter))
-    app.middleware("http")(security_headers_middleware())
+    limiter = TokenBucketLimiter(
+        settings.rate_limit_per_minute,
+        settings.rate_limit_window_s,
+        max_keys=settings.rate_limit_max_keys,
+        shared_path=settings.rate_limit_shared_path,
+    )
+    app.add_middleware(RateLimitMiddleware, limiter=limiter)
+    app.add_middleware(SecurityHeadersMiddleware)
 
     @app.on_event("startup")
     async def on_startup():
         await init_db()
+        registry.start_background_flush()
+        if settings.resume_on_startup:
+            await resume_interrupted()
+            await resume_interrupted_scans()
+
+    @app.on_event("shutdown")
+    async def on_shutdown():
+        # Children first, so each scan job sees them settle and records its own outcome.
+        await analysis_tasks.cancel_all("Server shutting down", wait_s=CANCEL_WAIT_S)
+        await scan_tasks.wait_all(CANCEL_WAIT_S)
+        await scan_tasks.cancel_all("Server shutting down", wait_s=CANCEL_WAIT_S)
 
     return app
 
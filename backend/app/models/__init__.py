@@ -1,3 +1,5 @@
 from .base import Base
 from .analysis import Analysis
 from .issue import Issue
+from .chunk_result import ChunkResult
+from .scan_job import ScanJob
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import DateTime, Integer, String, Text, JSON
+from sqlalchemy import DateTime, ForeignKey, Integer, String, Text, JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
@@ -11,12 +11,18 @@ class Analysis(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     repo_url: Mapped[str] = mapped_column(String(512), nullable=False)
     pr_number: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    job_id: Mapped[int | None] = mapped_column(
+        ForeignKey("scan_jobs.id", ondelete="SET NULL"), nullable=True, index=True
+    )
     status: Mapped[str] = mapped_column(String(32), default="queued", nullable=False)
     progress: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     summary: Mapped[str | None] = mapped_column(Text, nullable=True)
     quality_score: Mapped[int | None] = mapped_column(Integer, nullable=True)
     extra_metadata: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    timings: Mapped[dict | None] = mapped_column(JSON, nullable=True, deferred=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
 
     issues: Mapped[list["Issue"]] = relationship(back_populates="analysis", cascade="all, delete-orphan")
+    chunk_results: Mapped[list["ChunkResult"]] = relationship(back_populates="analysis", cascade="all, delete-orphan")
+    job: Mapped["ScanJob | None"] = relationship(back_populates="analyses")
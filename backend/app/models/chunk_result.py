@@ -0,0 +1,25 @@
+from datetime import datetime
+from sqlalchemy import DateTime, ForeignKey, Integer, String, Text, JSON, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from .base import Base
+
+
+class ChunkResult(Base):
+    """Checkpoint of one analyzed chunk, keyed by the fingerprint of its path, part and text."""
+
+    __tablename__ = "chunk_results"
+    __table_args__ = (UniqueConstraint("analysis_id", "fingerprint", name="uq_chunk_results_fingerprint"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    analysis_id: Mapped[int] = mapped_column(ForeignKey("analyses.id", ondelete="CASCADE"), index=True)
+    fingerprint: Mapped[str] = mapped_column(String(64), nullable=False)
+    file_path: Mapped[str] = mapped_column(String(512), nullable=False)
+    outcome: Mapped[str] = mapped_column(String(16), nullable=False)
+    # Parsed reply with line numbers relative to the chunk; all None when the reply was unusable.
+    summary: Mapped[str | None] = mapped_column(Text, nullable=True)
+    quality_score: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    issues: Mapped[list | None] = mapped_column(JSON, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+
+    analysis: Mapped["Analysis"] = relationship(back_populates="chunk_results")
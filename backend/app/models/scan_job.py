@@ -0,0 +1,20 @@
+from datetime import datetime
+from sqlalchemy import DateTime, Integer, String, JSON
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from .base import Base
+
+
+class ScanJob(Base):
+    __tablename__ = "scan_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    status: Mapped[str] = mapped_column(String(32), default="queued", nullable=False)
+    org: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    token_budget: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    extra_metadata: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    analyses: Mapped[list["Analysis"]] = relationship(back_populates="job")
@@ -1,5 +1,5 @@
 from datetime import datetime
-from pydantic import BaseModel, Field, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl, model_validator
 
 
 class AnalysisCreate(BaseModel):
@@ -8,6 +8,12 @@ class AnalysisCreate(BaseModel):
     pr_number: int | None = Field(default=None, ge=1)
     github_token: str | None = None
     allow_git_clone: bool = False
+    profile: bool = False
+
+
+class AnalysisResume(BaseModel):
+    # Tokens are never stored; pass one again to resume a private-repo analysis.
+    github_token: str | None = None
 
 
 class IssueOut(BaseModel):
@@ -46,3 +52,57 @@ class AnalysisDetail(AnalysisOut):
 
 class AnalysisList(BaseModel):
     items: list[AnalysisOut]
+
+
+class TimingSpan(BaseModel):
+    name: str
+    start_ms: float
+    duration_ms: float
+    attrs: dict = {}
+
+
+class AnalysisTimings(BaseModel):
+    analysis_id: int
+    status: str
+    total_ms: float
+    stages: list[TimingSpan]
+    spans: list[TimingSpan]
+    totals: dict
+
+
+class ScanTarget(BaseModel):
+    repo_url: HttpUrl
+    pr_number: int | None = Field(default=None, ge=1)
+
+
+class ScanCreate(BaseModel):
+    targets: list[ScanTarget] = []
+    org: str | None = Field(default=None, min_length=1, max_length=100, pattern=r"^[A-Za-z0-9][A-Za-z0-9-]*$")
+    github_token: str | None = None
+    allow_git_clone: bool = False
+    token_budget: int = Field(default=0, ge=0)
+
+    @model_validator(mode="after")
+    def check_source(self) -> "ScanCreate":
+        if bool(self.targets) == bool(self.org):
+            raise ValueError("Provide either targets or org")
+        return self
+
+
+class ScanJobOut(BaseModel):
+    id: int
+    status: str
+    org: str | None
+    total: int
+    token_budget: int
+    extra_metadata: dict | None = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ScanJobDetail(ScanJobOut):
+    analyses: list[AnalysisOut] = []
+    rollup: dict = {}
@@ -1,26 +1,121 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
 import json
 import logging
-from dataclasses import dataclass
+from collections import Counter
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from tempfile import TemporaryDirectory
 
-from sqlalchemy import select
+from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
+from app.core.metrics import ANALYSES, CASCADE_CHUNKS, CHUNKS_ANALYZED, DB_COMMIT_LATENCY, PARSE_FAILURES
 from app.models.analysis import Analysis
+from app.models.chunk_result import ChunkResult
 from app.models.issue import Issue
-from app.services.file_utils import chunk_text
+from app.services.compaction import CompactedSource, CompactionStats, FileGroup, compact_source, group_duplicates
+from app.services.file_planner import FilePlan, PlanBudget, TokenPool, estimate_tokens, plan_files
+from app.services.file_utils import FileItem, chunk_text, estimate_chunk_count
 from app.services.github_service import GitHubService
-from app.services.openrouter_service import OpenRouterService
+from app.services.http_cache import track_cache_stats
+from app.services.openrouter_service import Completion, OpenRouterService
+from app.services.profiling import RunProfiler
 from app.services.progress import ProgressUpdate, progress_hub
+from app.services.response_cache import analysis_cache
+from app.services.tracing import Trace
 
 logger = logging.getLogger(__name__)
 
+_WORKER_DONE = object()
+
 
 SYSTEM_PROMPT = """You are a senior code reviewer. Analyze the provided code for security issues (OWASP Top 10), performance optimizations, and general code quality.\nReturn strict JSON with fields: summary (string), quality_score (0-100), issues (array). Each issue has: file_path, line_start (int or null), line_end (int or null), severity (low|medium|high|critical), category (security|performance|quality), message, recommendation.\nRecommendation must include a concrete code-level fix, ideally with a short before/after snippet.\nDo not include any text outside JSON."""
 
+TRIAGE_PROMPT = """You are triaging code before a detailed security, performance and quality review. Do not list issues.\nReturn strict JSON with fields: risk (0-1, how likely the code contains an issue worth reporting), confidence (0-1, how sure you are of that risk), quality_score (0-100).\nDo not include any text outside JSON."""
+
+REPAIR_PROMPT = """Rewrite the code review below as JSON with fields: summary (string), quality_score (0-100), issues (array). Each issue has: file_path, line_start (int or null), line_end (int or null), severity (low|medium|high|critical), category (security|performance|quality), message, recommendation.\nKeep every finding and its line numbers; drop anything that is not part of the review. Do not include any text outside JSON."""
+
+_ISSUE_SCHEMA = {
+    "type": "object",
+    "additionalProperties": False,
+    "required": [
+        "file_path", "line_start", "line_end", "severity", "category", "message", "recommendation",
+    ],
+    "properties": {
+        "file_path": {"type": "string"},
+        "line_start": {"type": ["integer", "null"]},
+        "line_end": {"type": ["integer", "null"]},
+        "severity": {"type": "string", "enum": ["low", "medium", "high", "critical"]},
+        "category": {"type": "string", "enum": ["security", "performance", "quality"]},
+        "message": {"type": "string"},
+        "recommendation": {"type": "string"},
+    },
+}
+REVIEW_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "code_review",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "additionalProperties": False,
+            "required": ["summary", "quality_score", "issues"],
+            "properties": {
+                "summary": {"type": "string"},
+                "quality_score": {"type": "integer", "minimum": 0, "maximum": 100},
+                "issues": {"type": "array", "items": _ISSUE_SCHEMA},
+            },
+        },
+    },
+}
+TRIAGE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "triage",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "additionalProperties": False,
+            "required": ["risk", "confidence", "quality_score"],
+            "properties": {
+                "risk": {"type": "number", "minimum": 0, "maximum": 1},
+                "confidence": {"type": "number", "minimum": 0, "maximum": 1},
+                "quality_score": {"type": "integer", "minimum": 0, "maximum": 100},
+            },
+        },
+    },
+}
+# Output budget: a floor for the summary and reasoning, plus room proportional to the chunk.
+RESPONSE_TOKEN_FLOOR = 2_048
+TRIAGE_MAX_TOKENS = 512
+# Checkpoint outcomes restored on resume; anything else (a parse error) is sent to the model again.
+RESTORABLE_OUTCOMES = ("ok", "repaired", "retried")
+
+
+def response_token_budget(text: str) -> int | None:
+    if settings.llm_max_output_tokens <= 0:
+        return None
+    return min(settings.llm_max_output_tokens, RESPONSE_TOKEN_FLOOR + estimate_tokens(len(text)))
+
+
+def _restore(checkpoint: ChunkResult) -> ParsedResult:
+    return ParsedResult(
+        summary=checkpoint.summary or "", quality_score=checkpoint.quality_score, issues=checkpoint.issues or []
+    )
+
+
+def _count_usage(usage: Counter, completion: Completion) -> None:
+    usage.update(
+        prompt_tokens=completion.prompt_tokens,
+        completion_tokens=completion.completion_tokens,
+        retries=completion.retries,
+    )
+
 
 @dataclass
 class AnalysisInput:
@@ -28,6 +123,12 @@ class AnalysisInput:
     pr_number: int | None
     github_token: str | None
     allow_git_clone: bool
+    profile: bool = False
+    # Set for batch scans: the plan reserves its estimated input tokens from the job's shared pool.
+    token_pool: TokenPool | None = None
+    # Set for push-triggered runs: read contents at `head_sha`; with `base_sha` only analyze what changed since.
+    head_sha: str | None = None
+    base_sha: str | None = None
 
 
 class AnalysisAgent:
@@ -36,34 +137,208 @@ class AnalysisAgent:
         self.openrouter = OpenRouterService()
 
     async def run(self, analysis_id: int, session: AsyncSession, payload: AnalysisInput) -> None:
+        deadline = settings.analysis_deadline_s
+        if not deadline:
+            await self._run_profiled(analysis_id, session, payload)
+            return
+
+        # Past the deadline the run is cancelled like a user cancel: in-flight LLM calls are aborted
+        # and the analysis is recorded as cancelled, but the caller's task carries on.
+        task = asyncio.current_task()
+        expired = False
+
+        def expire() -> None:
+            nonlocal expired
+            expired = True
+            task.cancel(f"Deadline of {deadline}s exceeded")
+
+        timer = asyncio.get_running_loop().call_later(deadline, expire)
         try:
-            await self._update_status(session, analysis_id, "fetching", 5, "Fetching repository")
-            files = await self._fetch_files(payload)
+            await self._run_profiled(analysis_id, session, payload)
+        except asyncio.CancelledError:
+            if not expired:
+                raise
+            task.uncancel()
+        finally:
+            timer.cancel()
+
+    async def _run_profiled(self, analysis_id: int, session: AsyncSession, payload: AnalysisInput) -> None:
+        if not payload.profile:
+            await self._run(analysis_id, session, payload)
+            return
+
+        profiler = RunProfiler(analysis_id)
+        if not profiler.start():
+            await self._record_metadata(session, analysis_id, profile={"status": "skipped", "reason": "busy"})
+            await self._run(analysis_id, session, payload)
+            return
+        try:
+            await self._run(analysis_id, session, payload)
+        finally:
+            profiler.stop()
+            try:
+                names = await asyncio.to_thread(profiler.write_artifacts)
+            except OSError as exc:
+                logger.warning("Failed to write profile artifacts: %s", exc)
+                names = []
+            await self._record_metadata(
+                session,
+                analysis_id,
+                profile={"status": "captured" if names else "failed"},
+                artifacts={name: f"/api/v1/analyses/{analysis_id}/artifacts/{name}" for name in names},
+            )
+
+    async def _run(self, analysis_id: int, session: AsyncSession, payload: AnalysisInput) -> None:
+        trace = Trace()
+        try:
+            with TemporaryDirectory(prefix="acra-") as workspace:
+                await self._update_status(session, analysis_id, "fetching", 5, "Fetching repository")
+                plans: list[FilePlan] = []
+                with trace.span("fetch") as span, track_cache_stats() as cache_stats:
+                    files = await self._fetch_files(payload, Path(workspace), plans)
+                    span.update(files=len(files), bytes=sum(f.size for f in files), cached=cache_stats.hits)
+                metadata = {"plan": plans[-1].to_metadata()} if plans else {}
+                if cache_stats.hits or cache_stats.misses:
+                    metadata["github_cache"] = cache_stats.to_metadata()
+                if metadata:
+                    await self._record_metadata(session, analysis_id, **metadata)
+
+                await self._update_status(session, analysis_id, "chunking", 15, f"Preparing {len(files)} files")
+                counts = {"total": sum(estimate_chunk_count(f.size, settings.chunk_char_limit) for f in files)}
+
+                await self._update_status(session, analysis_id, "analyzing", 30, f"Analyzing ~{counts['total']} chunks")
+                with trace.span("analyze") as span:
+                    issues, summaries, scores = await self._analyze_chunks(session, analysis_id, files, counts, trace)
+                    span.update(chunks=counts["total"], issues=len(issues))
+
+            await self._update_status(session, analysis_id, "persisting", 92, "Saving results")
+            with trace.span("persist", issues=len(issues)):
+                analysis = await session.get(Analysis, analysis_id)
+                if analysis:
+                    analysis.summary = "\n".join([s for s in summaries if s])[:4000] if summaries else ""
+                    if scores:
+                        analysis.quality_score = int(sum(scores) / len(scores))
+                    analysis.status = "completed"
+                    analysis.progress = 100
+                    session.add_all(issues)
+                    # The results are final now; the per-chunk checkpoints are no longer needed.
+                    await session.execute(delete(ChunkResult).where(ChunkResult.analysis_id == analysis_id))
+                    await self._commit(session)
+            if analysis:
+                analysis.timings = trace.to_dict()
+                await self._commit(session)
+                # The row changed after it was marked completed; drop any body cached in between.
+                analysis_cache.invalidate(analysis_id)
+
+            ANALYSES.inc(status="completed")
+            await progress_hub.publish(ProgressUpdate(analysis_id=analysis_id, status="completed", progress=100))
+        except asyncio.CancelledError as exc:
+            # Cancel, delete or the deadline: the fetch and every queued or in-flight chunk request are
+            # already unwound by the time this runs; record the outcome and let the cancellation finish.
+            reason = str(exc.args[0]) if exc.args else "Cancelled"
+            logger.info("Analysis %s cancelled: %s", analysis_id, reason)
+            await session.rollback()
+            analysis = await session.get(Analysis, analysis_id)
+            if analysis:
+                analysis.status = "cancelled"
+                analysis.progress = 100
+                analysis.timings = trace.to_dict()
+                analysis.extra_metadata = {**(analysis.extra_metadata or {}), "cancelled_reason": reason}
+                await self._commit(session)
+            ANALYSES.inc(status="cancelled")
+            await progress_hub.publish(
+                ProgressUpdate(analysis_id=analysis_id, status="cancelled", progress=100, message=reason)
+            )
+            raise
+        except Exception as exc:
+            logger.exception("Analysis failed: %s", exc)
+            analysis = await session.get(Analysis, analysis_id)
+            if analysis:
+                analysis.status = "failed"
+                analysis.progress = 100
+                analysis.timings = trace.to_dict()
+                await self._commit(session)
+            ANALYSES.inc(status="failed")
+            await progress_hub.publish(
+                ProgressUpdate(analysis_id=analysis_id, status="failed", progress=100, message=str(exc))
+            )
 
-            await self._update_status(session, analysis_id, "chunking", 15, f"Preparing {len(files)} files")
-            chunks = self._build_chunks(files)
+    async def _analyze_chunks(
+        self,
+        session: AsyncSession,
+        analysis_id: int,
+        files: list[FileItem],
+        counts: dict[str, int],
+        trace: Trace,
+    ) -> tuple[list[Issue], list[str], list[int]]:
+        issues: list[Issue] = []
+        summaries: list[str] = []
+        scores: list[int] = []
+        tiers: Counter[str] = Counter()
+        outcomes: Counter[str] = Counter()
+        compaction = CompactionStats()
+        # Chunks finished by an earlier, interrupted run of this analysis are restored instead of re-sent.
+        checkpoints = await self._load_checkpoints(session, analysis_id)
 
-            await self._update_status(session, analysis_id, "analyzing", 30, f"Analyzing {len(chunks)} chunks")
-            issues: list[Issue] = []
-            summaries: list[str] = []
-            scores: list[int] = []
+        # Workers pull chunks lazily from one shared generator, so only about
+        # `max_concurrent_chunks` files are ever held in memory at once.
+        chunk_iter = self._build_chunks(files, counts, trace, compaction)
+        chunk_lock = asyncio.Lock()
+        results: asyncio.Queue[object] = asyncio.Queue()
 
-            semaphore = asyncio.Semaphore(max(1, settings.max_concurrent_chunks))
+        async def next_chunk() -> Chunk | None:
+            async with chunk_lock:
+                return await anext(chunk_iter, None)
 
-            async def analyze_one(idx: int, chunk: str) -> ParsedResult | None:
-                async with semaphore:
-                    user_prompt = chunk
-                    response = await self.openrouter.analyze_chunk(SYSTEM_PROMPT, user_prompt)
-                    parsed = self._parse_response(response)
-                    return parsed
+        async def worker() -> None:
+            try:
+                while (chunk := await next_chunk()) is not None:
+                    checkpoint = checkpoints.pop(chunk.fingerprint, None)
+                    if checkpoint is not None:
+                        outcomes["resumed"] += 1
+                        CHUNKS_ANALYZED.inc(outcome="resumed")
+                        await results.put((chunk, _restore(checkpoint), None))
+                        continue
+                    with trace.span("chunk", file=chunk.path, part=chunk.part, bytes=len(chunk.text)) as span:
+                        parsed = await self._review_chunk(chunk, span, trace)
+                    tiers[span["tier"]] += 1
+                    outcomes[span["parse"]] += 1
+                    CASCADE_CHUNKS.inc(tier=span["tier"])
+                    CHUNKS_ANALYZED.inc(outcome=span["parse"])
+                    await results.put((chunk, parsed, span["parse"]))
+            except Exception as exc:
+                await results.put(exc)
+            finally:
+                await results.put(_WORKER_DONE)
 
-            tasks = [asyncio.create_task(analyze_one(i, c)) for i, c in enumerate(chunks, start=1)]
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, settings.max_concurrent_chunks))]
+        try:
+            running = len(workers)
             completed = 0
-            total = max(1, len(tasks))
+            while running:
+                result = await results.get()
+                if result is _WORKER_DONE:
+                    running -= 1
+                    continue
+                if isinstance(result, Exception):
+                    raise result
+                chunk, parsed, outcome = result
+                if outcome is not None:
+                    # Committed together with the progress update below, so every finished chunk is durable.
+                    session.add(
+                        ChunkResult(
+                            analysis_id=analysis_id,
+                            fingerprint=chunk.fingerprint,
+                            file_path=chunk.path,
+                            outcome=outcome,
+                            summary=parsed.summary if parsed else None,
+                            quality_score=parsed.quality_score if parsed else None,
+                            issues=parsed.issues if parsed else None,
+                        )
+                    )
 
-            for task in asyncio.as_completed(tasks):
-                parsed = await task
                 completed += 1
+                total = max(1, counts["total"], completed)
                 progress = 30 + int(60 * completed / total)
                 await self._update_status(
                     session,
@@ -79,62 +354,206 @@ class AnalysisAgent:
                 summaries.append(parsed.summary)
                 scores.append(parsed.quality_score)
                 for item in parsed.issues:
-                    issues.append(
-                        Issue(
-                            analysis_id=analysis_id,
-                            file_path=item.get("file_path", "unknown"),
-                            line_start=item.get("line_start"),
-                            line_end=item.get("line_end"),
-                            severity=item.get("severity", "low"),
-                            category=item.get("category", "quality"),
-                            message=item.get("message", ""),
-                            recommendation=item.get("recommendation"),
+                    # Duplicate files were analyzed once; report every finding under each copy's path.
+                    for path in [item.get("file_path", chunk.path), *chunk.duplicates]:
+                        issues.append(
+                            Issue(
+                                analysis_id=analysis_id,
+                                file_path=path,
+                                line_start=chunk.original_line(item.get("line_start")),
+                                line_end=chunk.original_line(item.get("line_end")),
+                                severity=item.get("severity", "low"),
+                                category=item.get("category", "quality"),
+                                message=item.get("message", ""),
+                                recommendation=item.get("recommendation"),
+                            )
                         )
-                    )
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await chunk_iter.aclose()
+        metadata = {"compaction": compaction.to_metadata(), "parse": dict(outcomes)}
+        if settings.cascade_enabled:
+            metadata["cascade"] = dict(tiers)
+        await self._record_metadata(session, analysis_id, **metadata)
+        return issues, summaries, scores
 
-            await self._update_status(session, analysis_id, "persisting", 92, "Saving results")
-            analysis = await session.get(Analysis, analysis_id)
-            if analysis:
-                analysis.summary = "\n".join([s for s in summaries if s])[:4000] if summaries else ""
-                if scores:
-                    analysis.quality_score = int(sum(scores) / len(scores))
-                analysis.status = "completed"
-                analysis.progress = 100
-                session.add_all(issues)
-                await session.commit()
+    async def _load_checkpoints(self, session: AsyncSession, analysis_id: int) -> dict[str, ChunkResult]:
+        # Chunks the model answered unusably are analyzed again: retrying them is much of why runs get resumed.
+        await session.execute(
+            delete(ChunkResult).where(
+                ChunkResult.analysis_id == analysis_id, ChunkResult.outcome.not_in(RESTORABLE_OUTCOMES)
+            )
+        )
+        result = await session.execute(select(ChunkResult).where(ChunkResult.analysis_id == analysis_id))
+        return {checkpoint.fingerprint: checkpoint for checkpoint in result.scalars()}
 
-            await progress_hub.publish(ProgressUpdate(analysis_id=analysis_id, status="completed", progress=100))
-        except Exception as exc:
-            logger.exception("Analysis failed: %s", exc)
-            analysis = await session.get(Analysis, analysis_id)
-            if analysis:
-                analysis.status = "failed"
-                analysis.progress = 100
-                await session.commit()
-            await progress_hub.publish(
-                ProgressUpdate(analysis_id=analysis_id, status="failed", progress=100, message=str(exc))
+    async def _review_chunk(self, chunk: Chunk, span: dict, trace: Trace) -> ParsedResult | None:
+        """Analyze one chunk, letting the triage model clear low-risk chunks when the cascade is on."""
+        usage = Counter()
+        if settings.cascade_enabled:
+            with trace.span("triage", file=chunk.path, part=chunk.part) as triage_span:
+                structured = await self.openrouter.supports_structured_output(settings.triage_model)
+                completion = await self.openrouter.complete(
+                    TRIAGE_PROMPT,
+                    chunk.prompt,
+                    model=settings.triage_model,
+                    response_format=TRIAGE_FORMAT if structured else None,
+                    max_tokens=TRIAGE_MAX_TOKENS,
+                )
+                verdict = self._parse_triage(completion.content)
+                triage_span.update(risk=verdict.risk if verdict else None, escalate=verdict is None or verdict.escalate)
+            _count_usage(usage, completion)
+            if verdict is not None and not verdict.escalate:
+                span.update(usage, tier="triage", parse="ok")
+                return ParsedResult(summary="", quality_score=verdict.quality_score, issues=[])
+
+        completion = await self._complete_review(chunk)
+        _count_usage(usage, completion)
+        parsed = self._parse_response(completion.content)
+        outcome = "ok"
+        if parsed is None:
+            PARSE_FAILURES.inc()
+            outcome = "parse_error"
+            if settings.parse_repair_enabled:
+                parsed, outcome = await self._recover_chunk(chunk, completion, usage)
+        span.update(usage, tier="full", parse=outcome, finish_reason=completion.finish_reason)
+        return parsed
+
+    async def _complete_review(self, chunk: Chunk, full_budget: bool = False) -> Completion:
+        structured = await self.openrouter.supports_structured_output()
+        if full_budget:
+            max_tokens = settings.llm_max_output_tokens if settings.llm_max_output_tokens > 0 else None
+        else:
+            max_tokens = response_token_budget(chunk.text)
+        return await self.openrouter.complete(
+            SYSTEM_PROMPT,
+            chunk.prompt,
+            response_format=REVIEW_FORMAT if structured else None,
+            max_tokens=max_tokens,
+        )
+
+    async def _recover_chunk(
+        self, chunk: Chunk, failed: Completion, usage: Counter
+    ) -> tuple[ParsedResult | None, str]:
+        """Salvage an unparseable review: reformat the reply with the small model, then re-ask once.
+
+        A reply cut off at `max_tokens` (thinking models spend part of it reasoning) is not worth
+        repairing; it is re-asked with the full `llm_max_output_tokens` budget instead.
+        """
+        truncated = failed.finish_reason == "length"
+        if failed.content.strip() and not truncated:
+            structured = await self.openrouter.supports_structured_output(settings.triage_model)
+            repair = await self.openrouter.complete(
+                REPAIR_PROMPT,
+                failed.content[: settings.chunk_char_limit],
+                model=settings.triage_model,
+                response_format=REVIEW_FORMAT if structured else None,
+                max_tokens=response_token_budget(failed.content),
             )
+            _count_usage(usage, repair)
+            parsed = self._parse_response(repair.content)
+            if parsed is not None:
+                return parsed, "repaired"
+            PARSE_FAILURES.inc()
+
+        retry = await self._complete_review(chunk, full_budget=truncated)
+        _count_usage(usage, retry)
+        parsed = self._parse_response(retry.content)
+        if parsed is None:
+            PARSE_FAILURES.inc()
+            return None, "parse_error"
+        return parsed, "retried"
+
+    async def _fetch_files(self, payload: AnalysisInput, workspace: Path, plans: list[FilePlan]) -> list[FileItem]:
+        def select(files: list[FileItem], churn: dict[str, int]) -> list[FileItem]:
+            plan = plan_files(files, PlanBudget.from_settings(payload.token_pool), churn)
+            if payload.token_pool is not None:
+                payload.token_pool.reserve(plan.estimated_tokens)
+            plans.append(plan)
+            return plan.selected
 
-    async def _fetch_files(self, payload: AnalysisInput):
         if payload.allow_git_clone:
             try:
-                return await self.github.fetch_repo_files_via_git(payload.repo_url, payload.github_token)
+                return await self.github.fetch_repo_files_via_git(
+                    payload.repo_url, payload.github_token, workspace, select
+                )
             except Exception as exc:
                 logger.warning("git clone failed, falling back to GitHub API: %s", exc)
-        return await self.github.fetch_repo_files_via_api(payload.repo_url, payload.github_token, payload.pr_number)
-
-    def _build_chunks(self, files):
-        chunks: list[str] = []
-        for file in files[: settings.max_files]:
-            if len(file.content.encode("utf-8", errors="ignore")) > settings.max_file_bytes:
-                continue
-            parts = chunk_text(file.content, settings.chunk_char_limit)
+        return await self.github.fetch_repo_files_via_api(
+            payload.repo_url,
+            payload.github_token,
+            payload.pr_number,
+            workspace,
+            select,
+            head_sha=payload.head_sha,
+            base_sha=payload.base_sha,
+        )
+
+    async def _build_chunks(
+        self,
+        files: list[FileItem],
+        counts: dict[str, int],
+        trace: Trace | None = None,
+        stats: CompactionStats | None = None,
+    ) -> AsyncIterator[Chunk]:
+        trace = trace or Trace()
+        stats = stats or CompactionStats()
+        compact = settings.prompt_compaction
+        groups = group_duplicates(files) if compact else [FileGroup(file) for file in files]
+        produced = 0
+        for group in groups:
+            file = group.file
+            with trace.span("read", file=file.path, bytes=file.size) as span:
+                content = await asyncio.to_thread(file.read_text)
+                source = compact_source(file.path, content) if compact else CompactedSource(content)
+                span.update(compacted_bytes=len(source.text), duplicates=len(group.duplicates))
+            stats.files += 1 + len(group.duplicates)
+            stats.duplicate_files += len(group.duplicates)
+            stats.original_bytes += len(content) * (1 + len(group.duplicates))
+            stats.compacted_bytes += len(source.text)
+
+            parts = chunk_text(source.text, settings.chunk_char_limit)
+            first_line = 1
             for idx, part in enumerate(parts, start=1):
-                header = f"\n\n# File: {file.path} (part {idx}/{len(parts)})\n"
-                chunks.append(header + part)
-        return chunks
+                produced += 1
+                yield Chunk(
+                    path=file.path,
+                    part=idx,
+                    parts=len(parts),
+                    text=part,
+                    first_line=first_line,
+                    line_map=source.line_map,
+                    duplicates=group.duplicates,
+                )
+                first_line += part.count("\n")
+        # The up-front total is estimated from byte sizes; settle it once every file is chunked.
+        counts["total"] = produced
 
     def _parse_response(self, response: str):
+        data = self._load_json(response)
+        if data is None:
+            return None
+
+        summary = data.get("summary", "")
+        quality_score = int(data.get("quality_score", 0))
+        issues = data.get("issues", []) if isinstance(data.get("issues"), list) else []
+        return ParsedResult(summary=summary, quality_score=quality_score, issues=issues)
+
+    def _parse_triage(self, response: str) -> TriageVerdict | None:
+        data = self._load_json(response)
+        try:
+            risk = float(data["risk"])
+            confidence = float(data.get("confidence", 0.0))
+            quality_score = int(data.get("quality_score", 0))
+        except (TypeError, KeyError, ValueError):
+            return None
+        escalate = risk >= settings.triage_escalate_risk or confidence < settings.triage_min_confidence
+        return TriageVerdict(risk=risk, confidence=confidence, quality_score=quality_score, escalate=escalate)
+
+    @staticmethod
+    def _load_json(response: str) -> dict | None:
         text = response.strip()
         if text.startswith("```"):
             text = text.strip("`")
@@ -151,28 +570,70 @@ class AnalysisAgent:
                 data = json.loads(text[start : end + 1])
             except json.JSONDecodeError:
                 return None
+        return data if isinstance(data, dict) else None
 
-        if not isinstance(data, dict):
-            return None
+    async def _commit(self, session: AsyncSession) -> None:
+        with DB_COMMIT_LATENCY.time():
+            await session.commit()
 
-        summary = data.get("summary", "")
-        quality_score = int(data.get("quality_score", 0))
-        issues = data.get("issues", []) if isinstance(data.get("issues"), list) else []
-        return ParsedResult(summary=summary, quality_score=quality_score, issues=issues)
+    async def _record_metadata(self, session: AsyncSession, analysis_id: int, **values) -> None:
+        analysis = await session.get(Analysis, analysis_id)
+        if analysis:
+            # Reassign rather than mutate so SQLAlchemy notices the JSON change.
+            analysis.extra_metadata = {**(analysis.extra_metadata or {}), **values}
+            await self._commit(session)
+            analysis_cache.invalidate(analysis_id)
 
     async def _update_status(self, session: AsyncSession, analysis_id: int, status: str, progress: int, message: str):
         analysis = await session.get(Analysis, analysis_id)
         if analysis:
             analysis.status = status
             analysis.progress = progress
-            await session.commit()
+            await self._commit(session)
         await progress_hub.publish(
             ProgressUpdate(analysis_id=analysis_id, status=status, progress=progress, message=message)
         )
 
 
+@dataclass
+class Chunk:
+    path: str
+    part: int
+    parts: int
+    text: str
+    first_line: int = 1
+    line_map: list[int] | None = None
+    duplicates: list[str] = field(default_factory=list)
+
+    @property
+    def prompt(self) -> str:
+        return f"\n\n# File: {self.path} (part {self.part}/{self.parts})\n{self.text}"
+
+    @property
+    def fingerprint(self) -> str:
+        identity = f"{self.path}\0{self.part}/{self.parts}\0{self.text}"
+        return hashlib.sha256(identity.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+    def original_line(self, line):
+        """Translate a line number relative to this chunk into a line of the original file."""
+        if not isinstance(line, int) or line < 1:
+            return line
+        compacted = self.first_line + line - 1
+        if self.line_map is None:
+            return compacted
+        return self.line_map[min(compacted, len(self.line_map)) - 1] if self.line_map else line
+
+
 @dataclass
 class ParsedResult:
     summary: str
     quality_score: int
     issues: list[dict]
+
+
+@dataclass
+class TriageVerdict:
+    risk: float
+    confidence: float
+    quality_score: int
+    escalate: bool
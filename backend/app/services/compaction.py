@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+
+from app.services.file_utils import FileItem
+
+LICENSE_MARKERS = re.compile(
+    r"copyright|licen[cs]e|spdx-license-identifier|all rights reserved|permission is hereby granted", re.IGNORECASE
+)
+# Lines that must stay above a stripped header: shebangs and Python/Ruby encoding declarations.
+PREAMBLE_LINE = re.compile(r"^(#!|#.*coding[:=])")
+LINE_COMMENT_PREFIXES = ("//", "#", "--", ";")
+# Languages where a leading `#` is a preprocessor directive rather than a comment.
+NO_HASH_COMMENT_EXTENSIONS = {".c", ".h", ".cpp", ".hpp", ".cc", ".cs", ".m", ".mm"}
+BLOCK_COMMENTS = (("/*", "*/"), ("<!--", "-->"))
+
+# Full-line comment runs are cut to their first lines; lines hinting at secrets or open work are kept.
+COMMENT_RUN_KEEP = 4
+KEPT_COMMENT_HINT = re.compile(r"passw|secret|token|api[_-]?key|credential|todo|fixme|xxx|hack|unsafe|nosec|noqa", re.IGNORECASE)
+HASH_COMMENT_EXTENSIONS = {".py", ".rb", ".sh", ".bash", ".yml", ".yaml", ".toml", ".r", ".pl", ".ps1", ".tf"}
+DASH_COMMENT_EXTENSIONS = {".sql", ".lua", ".hs"}
+SLASH_COMMENT_EXTENSIONS = {
+    ".js", ".jsx", ".ts", ".tsx", ".java", ".go", ".rs", ".swift", ".kt", ".scala", ".php", ".css", ".scss",
+    *NO_HASH_COMMENT_EXTENSIONS,
+}
+
+
+@dataclass
+class CompactedSource:
+    text: str
+    # Original 1-based line number for every line of `text`; None when nothing was removed.
+    line_map: list[int] | None = None
+
+
+@dataclass
+class CompactionStats:
+    files: int = 0
+    duplicate_files: int = 0
+    original_bytes: int = 0
+    compacted_bytes: int = 0
+
+    def to_metadata(self) -> dict[str, int]:
+        return {
+            "files": self.files,
+            "duplicate_files": self.duplicate_files,
+            "original_bytes": self.original_bytes,
+            "compacted_bytes": self.compacted_bytes,
+        }
+
+
+@dataclass
+class FileGroup:
+    file: FileItem
+    duplicates: list[str] = field(default_factory=list)
+
+
+def group_duplicates(files: Iterable[FileItem]) -> list[FileGroup]:
+    """Collapse byte-identical files (same blob sha) onto the first path seen."""
+    groups: dict[str, FileGroup] = {}
+    for item in files:
+        key = item.sha or f"path:{item.path}"
+        if key in groups:
+            groups[key].duplicates.append(item.path)
+        else:
+            groups[key] = FileGroup(item)
+    return list(groups.values())
+
+
+def _license_header(lines: list[str], path: str) -> tuple[int, int] | None:
+    """Return the [start, end) line range of a leading license comment, if there is one."""
+    start = 0
+    while start < len(lines) and PREAMBLE_LINE.match(lines[start]):
+        start += 1
+    while start < len(lines) and not lines[start].strip():
+        start += 1
+    if start == len(lines):
+        return None
+
+    first = lines[start].lstrip()
+    end = start
+    block = next(((opener, closer) for opener, closer in BLOCK_COMMENTS if first.startswith(opener)), None)
+    if block is not None:
+        while end < len(lines):
+            end += 1
+            if block[1] in lines[end - 1]:
+                break
+        else:
+            return None
+    else:
+        prefixes = LINE_COMMENT_PREFIXES
+        if PurePosixPath(path).suffix.lower() in NO_HASH_COMMENT_EXTENSIONS:
+            prefixes = tuple(prefix for prefix in prefixes if prefix != "#")
+        prefix = next((prefix for prefix in prefixes if first.startswith(prefix)), None)
+        if prefix is None:
+            return None
+        while end < len(lines) and lines[end].lstrip().startswith(prefix):
+            end += 1
+
+    if LICENSE_MARKERS.search("\n".join(lines[start:end])):
+        return start, end
+    return None
+
+
+def _comment_prefixes(path: str) -> tuple[str, ...]:
+    suffix = PurePosixPath(path).suffix.lower()
+    if suffix in HASH_COMMENT_EXTENSIONS:
+        return ("#",)
+    if suffix in DASH_COMMENT_EXTENSIONS:
+        return ("--",)
+    if suffix in SLASH_COMMENT_EXTENSIONS:
+        # Block comments are tracked separately: a bare `*` only continues one inside `/* ... */`.
+        return ("//",)
+    # Unknown formats (markdown, plain text) keep every line: `#` and `*` are not comments there.
+    return ()
+
+
+def compact_source(path: str, content: str) -> CompactedSource:
+    """Strip a leading license header, long comment runs, trailing whitespace and blank-line runs.
+
+    The returned line map lets line numbers reported against the compacted text be traced back.
+    """
+    lines = content.split("\n")
+    header = _license_header(lines, path)
+    comment_prefixes = _comment_prefixes(path)
+    block_comments = PurePosixPath(path).suffix.lower() in SLASH_COMMENT_EXTENSIONS
+    in_block = False
+    kept: list[str] = []
+    line_map: list[int] = []
+    previous_blank = True
+    comment_run = 0
+    for number, line in enumerate(lines, start=1):
+        if header and header[0] < number <= header[1]:
+            continue
+        line = line.rstrip()
+        blank = not line
+        if blank and previous_blank:
+            continue
+        stripped = line.lstrip()
+        is_comment = in_block or (bool(comment_prefixes) and stripped.startswith(comment_prefixes))
+        if block_comments and not in_block and stripped.startswith("/*"):
+            is_comment, in_block = True, "*/" not in stripped[2:]
+        elif in_block and "*/" in stripped:
+            in_block = False
+        comment_run = comment_run + 1 if is_comment else 0
+        if comment_run > COMMENT_RUN_KEEP and not KEPT_COMMENT_HINT.search(line):
+            continue
+        kept.append(line)
+        line_map.append(number)
+        previous_blank = blank
+    if kept and not kept[-1]:
+        kept.pop()
+        line_map.pop()
+
+    text = "\n".join(kept)
+    if text == content:
+        return CompactedSource(text)
+    return CompactedSource(text, line_map)
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import gzip
+import zlib
+from collections.abc import AsyncIterable, AsyncIterator
+
+try:  # optional: `pip install brotli` adds `br` to the encodings cached responses are offered in
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def accepted_encodings(header: str | None) -> set[str]:
+    """Content codings from an Accept-Encoding header, leaving out those sent with q=0."""
+    accepted: set[str] = set()
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = params.strip().removeprefix("q=")
+        if not coding or (quality and quality.replace(".", "").strip("0") == ""):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+async def gzip_stream(chunks: AsyncIterable[str | bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """Compress a streamed body incrementally; memory stays bounded by zlib's window."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def encode_body(body: bytes) -> dict[str, bytes]:
+    """Every compressed representation of `body` this process can produce, by content coding."""
+    encoded = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoded["br"] = brotli.compress(body)
+    return encoded
+
+
+def pick_encoding(header: str | None, available: dict[str, bytes]) -> str | None:
+    accepted = accepted_encodings(header)
+    return next((coding for coding in ("br", "gzip") if coding in available and coding in accepted), None)
@@ -0,0 +1,86 @@
+"""Streaming serializers for exporting an analysis's issues as NDJSON, SARIF or CSV.
+
+Each exporter takes an async iterator of issue row batches and yields text, one batch at a
+time, so an export never holds more than one batch in memory.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+from collections.abc import AsyncIterable, AsyncIterator, Sequence
+
+from app.core.config import settings
+
+EXPORT_COLUMNS = ("id", "file_path", "line_start", "line_end", "severity", "category", "message", "recommendation")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sarif": "application/sarif+json", "csv": "text/csv"}
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+SARIF_LEVELS = {"critical": "error", "high": "error", "medium": "warning", "low": "note", "info": "note"}
+# Spreadsheet apps evaluate cells starting with these; findings quote untrusted code, so neutralize them.
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+Row = Sequence[object]
+
+
+async def ndjson_lines(batches: AsyncIterable[list[Row]]) -> AsyncIterator[str]:
+    async for batch in batches:
+        yield "".join(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in batch)
+
+
+def _csv_cell(value: object) -> object:
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+async def csv_lines(batches: AsyncIterable[list[Row]]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    async for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_cell(value) for value in row] for row in batch)
+        yield buffer.getvalue()
+
+
+def _sarif_result(row: Row) -> dict:
+    issue = dict(zip(EXPORT_COLUMNS, row))
+    region = {}
+    if isinstance(issue["line_start"], int) and issue["line_start"] >= 1:
+        region["startLine"] = issue["line_start"]
+        if isinstance(issue["line_end"], int) and issue["line_end"] >= issue["line_start"]:
+            region["endLine"] = issue["line_end"]
+    location = {"artifactLocation": {"uri": issue["file_path"]}}
+    if region:
+        location["region"] = region
+    message = issue["message"]
+    if issue["recommendation"]:
+        message = f"{message}\n\nRecommendation: {issue['recommendation']}"
+    return {
+        "ruleId": issue["category"],
+        "level": SARIF_LEVELS.get(str(issue["severity"]).lower(), "warning"),
+        "message": {"text": message},
+        "locations": [{"physicalLocation": location}],
+        "properties": {"severity": issue["severity"], "issueId": issue["id"]},
+    }
+
+
+async def sarif_chunks(batches: AsyncIterable[list[Row]], repo_url: str) -> AsyncIterator[str]:
+    """One SARIF 2.1.0 log with a single run; the results array is written as the rows arrive."""
+    run = {
+        "tool": {"driver": {"name": settings.app_name}},
+        "versionControlProvenance": [{"repositoryUri": repo_url}],
+    }
+    header = json.dumps({"$schema": SARIF_SCHEMA, "version": "2.1.0", "runs": [run]})
+    # Open the results array inside the run: `...}]}` -> `..., "results": [`.
+    yield header[: -len("}]}")] + ', "results": ['
+    first = True
+    async for batch in batches:
+        if not batch:
+            continue
+        body = ",".join(json.dumps(_sarif_result(row)) for row in batch)
+        yield body if first else "," + body
+        first = False
+    yield "]}]}"
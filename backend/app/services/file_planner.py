@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import math
+import re
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+
+from app.core.config import settings
+from app.services.file_utils import FileItem, estimate_chunk_count
+
+CHARS_PER_TOKEN = 4
+SKIPPED_METADATA_LIMIT = 200
+
+LANGUAGE_WEIGHTS = {
+    ".py": 1.0, ".js": 1.0, ".ts": 1.0, ".tsx": 0.9, ".jsx": 0.9, ".java": 1.0, ".go": 1.0,
+    ".rs": 1.0, ".cpp": 1.0, ".c": 1.0, ".h": 0.7, ".cs": 1.0, ".rb": 1.0, ".php": 1.0,
+    ".swift": 0.9, ".kt": 0.9, ".scala": 0.9, ".sql": 0.9, ".sh": 0.8, ".ps1": 0.8,
+    ".html": 0.4, ".css": 0.2, ".yaml": 0.4, ".yml": 0.4, ".toml": 0.3, ".json": 0.3, ".md": 0.1,
+}
+
+# (pattern, bonus) pairs matched case-insensitively against the full path.
+PATH_SIGNALS = [
+    (re.compile(r"auth|login|logout|session|passw|secret|token|jwt|oauth|saml|permission|acl|rbac"), 3.0),
+    (re.compile(r"crypt|cipher|hash|sign|cert|tls|ssl|random"), 2.5),
+    (re.compile(r"exec|shell|subprocess|eval|deserial|pickle|upload|template|render"), 2.0),
+    (re.compile(r"(^|/)(db|database|sql|query|queries|models?|repositor(y|ies)|migrations?|orm|dao)(/|\.|_)"), 1.5),
+    (re.compile(r"(^|/)(api|routes?|router|handlers?|controllers?|views?|endpoints?|middleware)(/|\.|_)"), 1.5),
+    (re.compile(r"config|settings|security"), 1.0),
+]
+
+ENTRY_POINT_NAMES = {
+    "main.py", "app.py", "server.py", "manage.py", "wsgi.py", "asgi.py", "__main__.py",
+    "main.go", "main.rs", "index.js", "index.ts", "server.js", "server.ts", "app.js", "app.ts",
+    "program.cs", "application.java",
+}
+ENTRY_POINT_BONUS = 2.0
+
+LOW_VALUE_PATTERN = re.compile(r"(^|/)(tests?|spec|__tests__|docs?|examples?|samples?|fixtures?|benchmarks?)/|(^|/)test_|_test\.|\.spec\.|\.test\.")
+LOW_VALUE_FACTOR = 0.3
+TINY_FILE_BYTES = 200
+
+
+@dataclass
+class TokenPool:
+    """Input-token allowance shared by several analyses; each plan reserves its estimate."""
+
+    limit: int
+    reserved: int = 0
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.limit - self.reserved)
+
+    @property
+    def exhausted(self) -> bool:
+        return self.limit > 0 and self.remaining == 0
+
+    def reserve(self, tokens: int) -> None:
+        self.reserved += tokens
+
+
+@dataclass
+class PlanBudget:
+    max_files: int
+    max_tokens: int = 0
+    deadline_s: float = 0.0
+
+    @classmethod
+    def from_settings(cls, pool: TokenPool | None = None) -> "PlanBudget":
+        max_tokens = settings.max_input_tokens
+        if pool is not None and pool.limit:
+            # Zero means unlimited, so an exhausted pool still caps the plan at one token.
+            remaining = max(1, pool.remaining)
+            max_tokens = min(max_tokens, remaining) if max_tokens else remaining
+        return cls(
+            max_files=settings.max_files,
+            max_tokens=max_tokens,
+            deadline_s=settings.analysis_deadline_s,
+        )
+
+
+@dataclass
+class FilePlan:
+    selected: list[FileItem] = field(default_factory=list)
+    skipped: list[tuple[str, str]] = field(default_factory=list)
+    estimated_tokens: int = 0
+    estimated_seconds: float = 0.0
+
+    def to_metadata(self) -> dict:
+        return {
+            "selected": len(self.selected),
+            "skipped": len(self.skipped),
+            "estimated_tokens": self.estimated_tokens,
+            "estimated_seconds": round(self.estimated_seconds, 1),
+            "skipped_files": [
+                {"path": path, "reason": reason} for path, reason in self.skipped[:SKIPPED_METADATA_LIMIT]
+            ],
+        }
+
+
+def estimate_tokens(size: int) -> int:
+    return math.ceil(size / CHARS_PER_TOKEN)
+
+
+def score_file(item: FileItem, churn: Mapping[str, int] | None = None) -> float:
+    path = item.path.lower()
+    name = PurePosixPath(path).name
+    score = 2.0 * LANGUAGE_WEIGHTS.get(PurePosixPath(path).suffix, 0.2)
+    score += sum(bonus for pattern, bonus in PATH_SIGNALS if pattern.search(path))
+    if name in ENTRY_POINT_NAMES or re.search(r"(^|/)cmd/[^/]+/main\.go$", path):
+        score += ENTRY_POINT_BONUS
+    if churn:
+        score += math.log1p(churn.get(item.path, 0))
+    if item.size and item.size < TINY_FILE_BYTES:
+        score *= 0.5
+    if LOW_VALUE_PATTERN.search(path):
+        score *= LOW_VALUE_FACTOR
+    return score
+
+
+def plan_files(
+    files: list[FileItem], budget: PlanBudget, churn: Mapping[str, int] | None = None
+) -> FilePlan:
+    """Pick the highest-scoring files that fit the file, token and deadline budgets."""
+    plan = FilePlan()
+    seconds_per_chunk = settings.planner_seconds_per_chunk / max(1, settings.max_concurrent_chunks)
+    ranked = sorted(files, key=lambda item: (-score_file(item, churn), item.path))
+    for item in ranked:
+        if item.size > settings.max_file_bytes:
+            plan.skipped.append((item.path, "oversized"))
+            continue
+        if len(plan.selected) >= budget.max_files:
+            plan.skipped.append((item.path, "file_budget"))
+            continue
+        tokens = estimate_tokens(item.size)
+        if budget.max_tokens and plan.estimated_tokens + tokens > budget.max_tokens:
+            plan.skipped.append((item.path, "token_budget"))
+            continue
+        seconds = estimate_chunk_count(item.size, settings.chunk_char_limit) * seconds_per_chunk
+        if budget.deadline_s and plan.estimated_seconds + seconds > budget.deadline_s:
+            plan.skipped.append((item.path, "deadline_budget"))
+            continue
+        plan.selected.append(item)
+        plan.estimated_tokens += tokens
+        plan.estimated_seconds += seconds
+    return plan
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import hashlib
+import math
+import os
+import re
+from collections import Counter
 from pathlib import Path
-from typing import Iterable
 
-import pathspec
+from app.core.config import settings
+from app.services.ignore_rules import IgnoreMatcher
 
 BINARY_EXTENSIONS = {
     ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".svg", ".pdf",
@@ -32,20 +36,97 @@ TEXT_EXTENSIONS = {
 }
 
 
-@dataclass
+DATA_EXTENSIONS = {".json", ".yaml", ".yml", ".toml", ".csv"}
+
+# Linguist-style vendored/generated path rules, matched against the full relative path.
+VENDORED_PATH_PATTERNS = [
+    re.compile(p)
+    for p in (
+        r"(^|/)node_modules/",
+        r"(^|/)bower_components/",
+        r"(^|/)vendor(ed)?/",
+        r"(^|/)third[-_]?party/",
+        r"(^|/)Pods/",
+        r"(^|/)Carthage/",
+        r"(^|/)\.yarn/",
+        r"(^|/)site-packages/",
+        r"(^|/)dist/",
+        r"(^|/)__generated__/",
+    )
+]
+
+GENERATED_PATH_PATTERNS = [
+    re.compile(p)
+    for p in (
+        r"\.min\.(js|css)$",
+        r"[.-]bundle\.js$",
+        r"_pb2(_grpc)?\.pyi?$",
+        r"\.pb\.(go|cc|h)$",
+        r"\.pb\.gw\.go$",
+        r"_grpc\.pb\.go$",
+        r"\.g\.(cs|dart)$",
+        r"\.designer\.cs$",
+        r"_generated\.(go|py|ts|js)$",
+        r"\.generated\.(ts|js|cs)$",
+        r"(^|/)zz_generated[^/]*\.go$",
+    )
+]
+
+GENERATED_MARKERS = (
+    "@generated",
+    "do not edit",
+    "code generated by",
+    "autogenerated",
+    "auto-generated",
+    "automatically generated",
+    "generated by the protocol buffer compiler",
+    "openapi-generator",
+    "swagger-codegen",
+)
+
+# Content heuristics. Values are deliberately conservative so hand-written code never trips them.
+MARKER_SCAN_LINES = 20
+MINIFIED_AVG_LINE_LENGTH = 300
+MINIFIED_MAX_LINE_LENGTH = 2_000
+HIGH_ENTROPY_BITS = 5.6
+ENTROPY_SAMPLE_BYTES = 16_384
+MIN_CLASSIFY_BYTES = 1_024
+
+
 class FileItem:
-    path: str
-    content: str
+    """Metadata for one repository file. Content stays on disk at `source` and is read on demand."""
+
+    __slots__ = ("path", "size", "sha", "source")
+
+    def __init__(self, path: str, size: int = 0, sha: str | None = None, source: Path | None = None) -> None:
+        self.path = path
+        self.size = size
+        self.sha = sha
+        self.source = source
+
+    def read_text(self) -> str:
+        if self.source is None:
+            raise ValueError(f"{self.path} has not been downloaded")
+        return self.source.read_bytes().decode("utf-8", errors="ignore")
+
+    def __repr__(self) -> str:
+        return f"FileItem(path={self.path!r}, size={self.size}, sha={self.sha!r})"
 
 
-def load_gitignore_patterns(lines: Iterable[str]) -> pathspec.PathSpec:
-    return pathspec.PathSpec.from_lines("gitwildmatch", lines)
+def is_vendored_path(path: str) -> bool:
+    return any(pattern.search(path) for pattern in VENDORED_PATH_PATTERNS)
+
+
+def is_generated_path(path: str) -> bool:
+    return any(pattern.search(path) for pattern in GENERATED_PATH_PATTERNS)
 
 
 def is_relevant_file(path: str) -> bool:
     p = Path(path)
     if p.name in LOCK_FILES:
         return False
+    if settings.skip_generated_files and (is_vendored_path(path) or is_generated_path(path)):
+        return False
     if p.suffix.lower() in BINARY_EXTENSIONS:
         return False
     if p.suffix.lower() in TEXT_EXTENSIONS:
@@ -53,6 +134,103 @@ def is_relevant_file(path: str) -> bool:
     return False
 
 
+def git_blob_sha(data: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def shannon_entropy(data: bytes) -> float:
+    if not data:
+        return 0.0
+    total = len(data)
+    return -sum((count / total) * math.log2(count / total) for count in Counter(data).values())
+
+
+def exceeds_size_limit(path: str, size: int) -> bool:
+    if size > settings.max_file_bytes:
+        return True
+    return Path(path).suffix.lower() in DATA_EXTENSIONS and size > settings.max_data_file_bytes
+
+
+def classify_content(path: str, content: str) -> str | None:
+    """Return why `content` should be skipped (generated, minified, ...) or None to keep it."""
+    size = len(content.encode("utf-8", errors="ignore"))
+    if exceeds_size_limit(path, size):
+        return "oversized"
+    if size < MIN_CLASSIFY_BYTES:
+        return None
+
+    lines = content.splitlines()
+    head = "\n".join(lines[:MARKER_SCAN_LINES]).lower()
+    if any(marker in head for marker in GENERATED_MARKERS):
+        return "generated"
+
+    lengths = [len(line) for line in lines if line.strip()]
+    if lengths:
+        if max(lengths) >= MINIFIED_MAX_LINE_LENGTH or sum(lengths) / len(lengths) >= MINIFIED_AVG_LINE_LENGTH:
+            return "minified"
+
+    sample = content[:ENTROPY_SAMPLE_BYTES].encode("utf-8", errors="ignore")
+    if shannon_entropy(sample) >= HIGH_ENTROPY_BITS:
+        return "high_entropy"
+    return None
+
+
+def is_relevant_content(path: str, content: str) -> bool:
+    if not settings.skip_generated_files:
+        return True
+    return classify_content(path, content) is None
+
+
+def walk_local_files(root: Path, matcher: IgnoreMatcher) -> list[str]:
+    """Collect relevant file paths under `root`, pruning ignored directories instead of descending.
+
+    Each directory's `.gitignore` is added to `matcher` before its entries are filtered.
+    """
+    paths: list[str] = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = Path(dirpath).relative_to(root).as_posix()
+        prefix = "" if rel_dir == "." else f"{rel_dir}/"
+        if ".gitignore" in filenames:
+            try:
+                lines = (Path(dirpath) / ".gitignore").read_text(encoding="utf-8", errors="ignore").splitlines()
+            except OSError:
+                lines = []
+            matcher.add(prefix, lines)
+        dirnames[:] = [
+            name
+            for name in dirnames
+            if name != ".git" and not _is_pruned_dir(f"{prefix}{name}/", matcher)
+        ]
+        candidates = [f"{prefix}{filename}" for filename in filenames]
+        paths.extend(path for path in matcher.filter(candidates) if is_relevant_file(path))
+    return paths
+
+
+def _is_pruned_dir(rel_dir: str, matcher: IgnoreMatcher) -> bool:
+    if matcher.is_dir_ignored(rel_dir):
+        return True
+    return settings.skip_generated_files and is_vendored_path(rel_dir)
+
+
+def read_local_file(root: Path, rel_path: str) -> FileItem | None:
+    """Classify a checked-out file and return its metadata; the content is not retained."""
+    file_path = root / rel_path
+    try:
+        size = file_path.stat().st_size
+        if exceeds_size_limit(rel_path, size):
+            return None
+        data = file_path.read_bytes()
+    except OSError:
+        return None
+    if not is_relevant_content(rel_path, data.decode("utf-8", errors="ignore")):
+        return None
+    return FileItem(path=rel_path, size=len(data), sha=git_blob_sha(data), source=file_path)
+
+
+def estimate_chunk_count(size: int, limit: int) -> int:
+    return max(1, math.ceil(size / max(1, limit)))
+
+
 def chunk_text(text: str, limit: int) -> list[str]:
     if len(text) <= limit:
         return [text]
@@ -2,15 +2,49 @@ from __future__ import annotations
 
 import asyncio
 import base64
-import os
+import logging
+from collections import Counter
+from collections.abc import AsyncIterator, Callable
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
-from tempfile import TemporaryDirectory
 
 import httpx
 
 from app.core.config import settings
-from app.services.file_utils import FileItem, load_gitignore_patterns, is_relevant_file
+from app.core.metrics import GITHUB_RATE_LIMIT_REMAINING, GITHUB_REQUESTS
+from app.services.file_utils import (
+    FileItem,
+    exceeds_size_limit,
+    git_blob_sha,
+    is_relevant_content,
+    is_relevant_file,
+    read_local_file,
+    walk_local_files,
+)
+from app.services.http_cache import HTTPCache, github_http_cache, record_cache_result
+from app.services.ignore_rules import IgnoreMatcher, read_info_exclude
+from app.services.repo_cache import communicate, git_auth_args, repo_cache, run_git
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT_LABELS = [
+    ("/contents/", "contents"),
+    ("/git/trees/", "tree"),
+    ("/pulls/", "pulls"),
+    ("/compare/", "compare"),
+    ("/graphql", "graphql"),
+]
+
+# GraphQL error types that mean the query was too expensive and should be split.
+GRAPHQL_LIMIT_ERRORS = {"MAX_NODE_LIMIT_EXCEEDED", "RESOURCE_LIMITS_EXCEEDED", "TIMEOUT"}
+BLOB_FIELDS = "... on Blob { text byteSize isBinary isTruncated }"
+
+# Size estimate for changed files the tree cannot size, from the diff's `changes` count.
+BYTES_PER_CHANGED_LINE = 40
+
+FileSelector = Callable[[list[FileItem], dict[str, int]], list[FileItem]]
 
 
 @dataclass
@@ -19,6 +53,38 @@ class RepoRef:
     repo: str
 
 
+class GraphQLLimitError(RuntimeError):
+    pass
+
+
+def _pack_batch(files: list[FileItem], max_count: int, max_bytes: int) -> list[FileItem]:
+    """Take files from the front of `files` while the batch stays within both limits."""
+    batch: list[FileItem] = []
+    total = 0
+    for item in files:
+        if batch and (len(batch) >= max_count or total + item.size > max_bytes):
+            break
+        batch.append(item)
+        total += item.size
+    return batch
+
+
+def _item_path(item: FileItem) -> str:
+    return item.path
+
+
+def _ancestor_dirs(path: str) -> list[str]:
+    parts = path.split("/")[:-1]
+    return ["/".join(parts[: depth + 1]) for depth in range(len(parts))]
+
+
+def _endpoint_label(path: str) -> str:
+    for marker, label in ENDPOINT_LABELS:
+        if marker in path:
+            return label
+    return "repo"
+
+
 def parse_repo_url(repo_url: str) -> RepoRef:
     repo_url = repo_url.rstrip("/")
     if repo_url.endswith(".git"):
@@ -32,8 +98,9 @@ def parse_repo_url(repo_url: str) -> RepoRef:
 
 
 class GitHubService:
-    def __init__(self) -> None:
+    def __init__(self, http_cache: HTTPCache | None = github_http_cache) -> None:
         self.base_url = settings.github_api_base
+        self.http_cache = http_cache
 
     def _headers(self, token: str | None) -> dict[str, str]:
         headers = {
@@ -44,49 +111,258 @@ class GitHubService:
             headers["Authorization"] = f"Bearer {token}"
         return headers
 
+    async def _get(
+        self, client: httpx.AsyncClient, url: str, token: str | None, params: dict | None = None
+    ) -> httpx.Response:
+        """GET with conditional revalidation; a 304 is answered from the cache as a 200."""
+        headers = self._headers(token)
+        if self.http_cache is None:
+            resp = await client.get(url, headers=headers, params=params)
+            self._check_rate_limit(resp)
+            return resp
+
+        key = self.http_cache.key(str(httpx.URL(url, params=params)), token)
+        cached = await self.http_cache.lookup(key)
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        resp = await client.get(url, headers=headers, params=params)
+        self._check_rate_limit(resp)
+        if resp.status_code == 304 and cached is not None:
+            record_cache_result(hit=True)
+            return httpx.Response(200, headers=cached.headers, content=cached.body, request=resp.request)
+        record_cache_result(hit=False)
+        if resp.status_code == 200:
+            await self.http_cache.store(key, dict(resp.headers), resp.content)
+        return resp
+
+    async def list_org_repos(self, org: str, token: str | None, limit: int) -> list[str]:
+        """Clone URLs of an org's (or user's) non-archived, non-fork repositories."""
+        repos: list[str] = []
+        async with httpx.AsyncClient(timeout=settings.request_timeout_s) as client:
+            url = f"{self.base_url}/orgs/{org}/repos"
+            page = 1
+            while len(repos) < limit:
+                resp = await self._get(client, url, token, params={"page": page, "per_page": 100, "type": "sources"})
+                if resp.status_code == 404 and page == 1 and "/orgs/" in url:
+                    url = f"{self.base_url}/users/{org}/repos"
+                    continue
+                resp.raise_for_status()
+                items = resp.json()
+                if not items:
+                    break
+                repos.extend(
+                    item["html_url"] for item in items if not item.get("archived") and not item.get("fork")
+                )
+                page += 1
+        return repos[:limit]
+
     async def fetch_repo_files_via_api(
-        self, repo_url: str, token: str | None, pr_number: int | None
+        self,
+        repo_url: str,
+        token: str | None,
+        pr_number: int | None,
+        workspace: Path,
+        select: FileSelector | None = None,
+        head_sha: str | None = None,
+        base_sha: str | None = None,
     ) -> list[FileItem]:
+        """List and download the files to analyze.
+
+        With `head_sha` contents are read at that commit; with `base_sha` as well only the files
+        changed between the two commits are analyzed (incremental mode, falling back to the whole
+        PR when GitHub no longer knows `base_sha`, e.g. after a force push).
+        """
         ref = parse_repo_url(repo_url)
+        spool = workspace / "files"
+        spool.mkdir(parents=True, exist_ok=True)
         async with httpx.AsyncClient(timeout=settings.request_timeout_s) as client:
-            if pr_number:
-                files = await self._fetch_pr_files(client, ref, token, pr_number)
-            else:
+            churn: dict[str, int] = {}
+            files = None
+            if base_sha and head_sha:
+                files = await self._fetch_compare_files(client, ref, token, base_sha, head_sha, churn)
+            if files is None and pr_number:
+                files = await self._fetch_pr_files(client, ref, token, pr_number, churn)
+            listed_tree = files is None
+            commit = head_sha
+            if listed_tree:
                 files = await self._fetch_repo_tree_files(client, ref, token)
+            else:
+                # Files a PR lists exist at its head, which may not be on the default branch yet.
+                if commit is None and pr_number:
+                    commit = await self._fetch_pr_head(client, ref, token, pr_number)
+                if select is not None:
+                    await self._size_listed_files(client, ref, token, files, churn, commit)
 
-            gitignore_lines = await self._fetch_gitignore(client, ref, token)
-            spec = load_gitignore_patterns(gitignore_lines)
+            matcher = await self._fetch_ignore_rules(client, ref, token, files, listed_tree, commit)
+            files = [item for item in matcher.filter(files, key=_item_path) if is_relevant_file(item.path)]
+            if select is not None:
+                files = select(files, churn)
 
             results: list[FileItem] = []
-            for path in files:
-                if spec.match_file(path):
-                    continue
-                if not is_relevant_file(path):
-                    continue
-                content = await self._fetch_file_content(client, ref, token, path)
-                if content is None:
+            async for item, data in self._iter_contents(client, ref, token, files, commit):
+                if data is None or not is_relevant_content(item.path, data.decode("utf-8", errors="ignore")):
                     continue
-                results.append(FileItem(path=path, content=content))
+                # Spool to disk so only metadata stays in memory until the chunk is analyzed.
+                item.source = spool / str(len(results))
+                item.source.write_bytes(data)
+                item.size = len(data)
+                item.sha = item.sha or git_blob_sha(data)
+                results.append(item)
             return results
 
+    def _use_graphql(self, token: str | None) -> bool:
+        strategy = settings.github_content_strategy
+        return strategy == "graphql" or (strategy == "auto" and bool(token))
+
+    async def _iter_contents(
+        self,
+        client: httpx.AsyncClient,
+        ref: RepoRef,
+        token: str | None,
+        files: list[FileItem],
+        commit: str | None = None,
+    ) -> AsyncIterator[tuple[FileItem, bytes | None]]:
+        if self._use_graphql(token):
+            async for pair in self._fetch_blobs_via_graphql(client, ref, token, files, commit):
+                yield pair
+            return
+        for item in files:
+            yield item, await self._fetch_file_content(client, ref, token, item.path, commit)
+
+    async def _fetch_blobs_via_graphql(
+        self,
+        client: httpx.AsyncClient,
+        ref: RepoRef,
+        token: str | None,
+        files: list[FileItem],
+        commit: str | None = None,
+    ) -> AsyncIterator[tuple[FileItem, bytes | None]]:
+        """Fetch blob text many files per query, sizing batches from the previous response."""
+        max_count = max(1, settings.github_graphql_batch_size)
+        target_bytes = max(1, settings.github_graphql_batch_bytes)
+        batch_size = max_count
+        pending = list(files)
+        while pending:
+            batch = _pack_batch(pending, batch_size, target_bytes)
+            try:
+                blobs, response_bytes = await self._query_blobs(
+                    client, ref, token, [item.path for item in batch], commit
+                )
+            except GraphQLLimitError as exc:
+                if len(batch) > 1:
+                    batch_size = max(1, len(batch) // 2)
+                    logger.info("GraphQL batch of %d hit a limit (%s); retrying with %d", len(batch), exc, batch_size)
+                    continue
+                blobs, response_bytes = [{"isTruncated": True}], 0
+            del pending[: len(batch)]
+            # Aim the next batch at the byte target using this response's bytes per file.
+            if response_bytes:
+                batch_size = min(max_count, max(1, int(len(batch) * target_bytes / response_bytes)))
+
+            for item, blob in zip(batch, blobs):
+                if blob is None:
+                    yield item, None
+                elif blob.get("isBinary") or exceeds_size_limit(item.path, blob.get("byteSize") or 0):
+                    # Decided from metadata alone; the text is never decoded or spooled.
+                    yield item, None
+                elif blob.get("isTruncated") or blob.get("text") is None:
+                    yield item, await self._fetch_file_content(client, ref, token, item.path, commit)
+                else:
+                    yield item, blob["text"].encode("utf-8")
+
+    async def _query_blobs(
+        self,
+        client: httpx.AsyncClient,
+        ref: RepoRef,
+        token: str | None,
+        paths: list[str],
+        commit: str | None = None,
+    ) -> tuple[list[dict | None], int]:
+        fields = "\n".join(f"f{i}: object(expression: $e{i}) {{ {BLOB_FIELDS} }}" for i in range(len(paths)))
+        params = "".join(f", $e{i}: String!" for i in range(len(paths)))
+        query = f"query($owner: String!, $name: String!{params}) {{ repository(owner: $owner, name: $name) {{ {fields} }} }}"
+        variables = {"owner": ref.owner, "name": ref.repo, **{f"e{i}": f"{commit or 'HEAD'}:{path}" for i, path in enumerate(paths)}}
+        try:
+            resp = await client.post(
+                f"{self.base_url}/graphql",
+                headers=self._headers(token),
+                json={"query": query, "variables": variables},
+            )
+        except httpx.TimeoutException as exc:
+            raise GraphQLLimitError("timeout") from exc
+        self._check_rate_limit(resp)
+        if resp.status_code in (502, 504):
+            raise GraphQLLimitError(f"HTTP {resp.status_code}")
+        resp.raise_for_status()
+        payload = resp.json()
+        errors = payload.get("errors") or []
+        if any(error.get("type") in GRAPHQL_LIMIT_ERRORS for error in errors):
+            raise GraphQLLimitError(errors[0].get("type"))
+        repository = (payload.get("data") or {}).get("repository")
+        if repository is None:
+            message = errors[0].get("message") if errors else "repository not found"
+            raise RuntimeError(f"GitHub GraphQL query failed: {message}")
+        return [repository.get(f"f{i}") for i in range(len(paths))], len(resp.content)
+
     async def _fetch_repo_tree_files(
         self, client: httpx.AsyncClient, ref: RepoRef, token: str | None
-    ) -> list[str]:
+    ) -> list[FileItem]:
         branch = await self._fetch_default_branch(client, ref, token)
-        tree_ref = branch or "HEAD"
+        tree = await self._fetch_tree(client, ref, token, branch or "HEAD")
+        return [
+            FileItem(path=item["path"], size=item.get("size") or 0, sha=item.get("sha"))
+            for item in tree or []
+            if item.get("type") == "blob" and not exceeds_size_limit(item["path"], item.get("size") or 0)
+        ]
+
+    async def _fetch_tree(
+        self, client: httpx.AsyncClient, ref: RepoRef, token: str | None, tree_ref: str, required: bool = True
+    ) -> list[dict] | None:
+        """Entries of the recursive tree at `tree_ref`; None when optional and GitHub cannot list it."""
         url = f"{self.base_url}/repos/{ref.owner}/{ref.repo}/git/trees/{tree_ref}?recursive=1"
-        resp = await client.get(url, headers=self._headers(token))
-        self._check_rate_limit(resp)
+        resp = await self._get(client, url, token)
+        if not required and resp.status_code in (404, 409, 422):
+            return None
         resp.raise_for_status()
-        data = resp.json()
-        return [item["path"] for item in data.get("tree", []) if item.get("type") == "blob"]
+        return resp.json().get("tree", [])
+
+    async def _fetch_pr_head(
+        self, client: httpx.AsyncClient, ref: RepoRef, token: str | None, pr_number: int
+    ) -> str | None:
+        url = f"{self.base_url}/repos/{ref.owner}/{ref.repo}/pulls/{pr_number}"
+        resp = await self._get(client, url, token)
+        if resp.status_code == 404:
+            return None
+        resp.raise_for_status()
+        return (resp.json().get("head") or {}).get("sha")
+
+    async def _size_listed_files(
+        self,
+        client: httpx.AsyncClient,
+        ref: RepoRef,
+        token: str | None,
+        files: list[FileItem],
+        churn: dict[str, int],
+        commit: str | None,
+    ) -> None:
+        """Give PR and compare items (listed without sizes) their blob size at `commit`.
+
+        The planner's token and deadline budgets are computed from sizes. Paths the tree
+        cannot size fall back to an estimate from the lines the change touched.
+        """
+        tree = await self._fetch_tree(client, ref, token, commit, required=False) if commit else None
+        sizes = {item["path"]: item.get("size") or 0 for item in tree or [] if item.get("type") == "blob"}
+        for item in files:
+            item.size = sizes.get(item.path) or churn.get(item.path, 0) * BYTES_PER_CHANGED_LINE
 
     async def _fetch_default_branch(
         self, client: httpx.AsyncClient, ref: RepoRef, token: str | None
     ) -> str | None:
         url = f"{self.base_url}/repos/{ref.owner}/{ref.repo}"
-        resp = await client.get(url, headers=self._headers(token))
-        self._check_rate_limit(resp)
+        resp = await self._get(client, url, token)
         if resp.status_code == 404:
             return None
         resp.raise_for_status()
@@ -94,98 +370,148 @@ class GitHubService:
         return data.get("default_branch")
 
     async def _fetch_pr_files(
-        self, client: httpx.AsyncClient, ref: RepoRef, token: str | None, pr_number: int
-    ) -> list[str]:
+        self,
+        client: httpx.AsyncClient,
+        ref: RepoRef,
+        token: str | None,
+        pr_number: int,
+        churn: dict[str, int] | None = None,
+    ) -> list[FileItem]:
         url = f"{self.base_url}/repos/{ref.owner}/{ref.repo}/pulls/{pr_number}/files"
-        files: list[str] = []
+        files: list[FileItem] = []
         page = 1
         while True:
-            resp = await client.get(
-                url,
-                headers=self._headers(token),
-                params={"page": page, "per_page": 100},
-            )
-            self._check_rate_limit(resp)
+            resp = await self._get(client, url, token, params={"page": page, "per_page": 100})
             resp.raise_for_status()
             items = resp.json()
             if not items:
                 break
-            files.extend(item["filename"] for item in items)
+            for item in items:
+                if item.get("status") == "removed":
+                    continue
+                files.append(FileItem(path=item["filename"], sha=item.get("sha")))
+                if churn is not None:
+                    churn[item["filename"]] = item.get("changes") or 0
             page += 1
         return files
 
-    async def _fetch_gitignore(
-        self, client: httpx.AsyncClient, ref: RepoRef, token: str | None
-    ) -> list[str]:
-        url = f"{self.base_url}/repos/{ref.owner}/{ref.repo}/contents/.gitignore"
-        resp = await client.get(url, headers=self._headers(token))
-        self._check_rate_limit(resp)
-        if resp.status_code == 404:
-            return []
-        resp.raise_for_status()
-        data = resp.json()
-        content = data.get("content")
-        if not content:
-            return []
-        decoded = base64.b64decode(content).decode("utf-8", errors="ignore")
-        return decoded.splitlines()
+    async def _fetch_compare_files(
+        self,
+        client: httpx.AsyncClient,
+        ref: RepoRef,
+        token: str | None,
+        base_sha: str,
+        head_sha: str,
+        churn: dict[str, int] | None = None,
+    ) -> list[FileItem] | None:
+        """Files changed between two commits, or None when GitHub cannot compare them."""
+        url = f"{self.base_url}/repos/{ref.owner}/{ref.repo}/compare/{base_sha}...{head_sha}"
+        files: list[FileItem] = []
+        page = 1
+        while True:
+            resp = await self._get(client, url, token, params={"page": page, "per_page": 100})
+            if resp.status_code in (404, 422):
+                return None
+            resp.raise_for_status()
+            items = resp.json().get("files") or []
+            for item in items:
+                if item.get("status") == "removed":
+                    continue
+                files.append(FileItem(path=item["filename"], sha=item.get("sha")))
+                if churn is not None:
+                    churn[item["filename"]] = item.get("changes") or 0
+            if len(items) < 100:
+                return files
+            page += 1
+
+    async def _fetch_ignore_rules(
+        self,
+        client: httpx.AsyncClient,
+        ref: RepoRef,
+        token: str | None,
+        files: list[FileItem],
+        listed_tree: bool,
+        commit: str | None = None,
+    ) -> IgnoreMatcher:
+        """Compile the root and nested `.gitignore` files that can affect `files`.
+
+        A tree listing names every `.gitignore`. PR and compare listings do not, so the ancestors of
+        the changed files are probed, but only when GraphQL can batch the lookups; over REST each
+        probe would be its own request and only the root file is read.
+        """
+        if listed_tree:
+            paths = [item.path for item in files if item.path.rpartition("/")[2] == ".gitignore"]
+        else:
+            paths = [".gitignore"]
+            if self._use_graphql(token):
+                directories = {path for item in files for path in _ancestor_dirs(item.path)}
+                paths += [f"{directory}/.gitignore" for directory in sorted(directories)]
+        matcher = IgnoreMatcher()
+        async for item, data in self._iter_contents(client, ref, token, [FileItem(path) for path in paths], commit):
+            if data is not None:
+                matcher.add(item.path.rpartition("/")[0], data.decode("utf-8", errors="ignore").splitlines())
+        return matcher
 
     async def _fetch_file_content(
-        self, client: httpx.AsyncClient, ref: RepoRef, token: str | None, path: str
-    ) -> str | None:
+        self, client: httpx.AsyncClient, ref: RepoRef, token: str | None, path: str, commit: str | None = None
+    ) -> bytes | None:
         url = f"{self.base_url}/repos/{ref.owner}/{ref.repo}/contents/{path}"
-        resp = await client.get(url, headers=self._headers(token))
-        self._check_rate_limit(resp)
+        resp = await self._get(client, url, token, params={"ref": commit} if commit else None)
         if resp.status_code == 404:
             return None
         resp.raise_for_status()
         data = resp.json()
         if data.get("encoding") == "base64" and data.get("content"):
-            return base64.b64decode(data["content"]).decode("utf-8", errors="ignore")
+            return base64.b64decode(data["content"])
         return None
 
     async def fetch_repo_files_via_git(
-        self, repo_url: str, token: str | None
+        self, repo_url: str, token: str | None, workspace: Path, select: FileSelector | None = None
     ) -> list[FileItem]:
-        with TemporaryDirectory() as tmpdir:
-            await self._git_clone(repo_url, tmpdir, token)
+        checkout = workspace / "checkout"
+        if repo_cache is not None:
+            await repo_cache.materialize(repo_url, token, checkout)
+        else:
+            await self._git_clone(repo_url, str(checkout), token)
+        files = await asyncio.to_thread(self._load_local_files, checkout)
+        if select is not None:
+            files = select(files, await self._fetch_local_churn(checkout))
+        return files
 
-            gitignore_path = Path(tmpdir) / ".gitignore"
-            gitignore_lines = gitignore_path.read_text(encoding="utf-8", errors="ignore").splitlines() if gitignore_path.exists() else []
-            spec = load_gitignore_patterns(gitignore_lines)
+    async def _fetch_local_churn(self, checkout: Path) -> dict[str, int]:
+        # Mirror checkouts carry full history; shallow clones simply report one commit per file.
+        try:
+            output = await run_git(
+                "-C", str(checkout), "log", f"--since={settings.planner_churn_days}.days",
+                "--max-count=1000", "--name-only", "--format=",
+            )
+        except RuntimeError:
+            return {}
+        return dict(Counter(line for line in output.splitlines() if line))
 
-            results: list[FileItem] = []
-            for root, _, files in os.walk(tmpdir):
-                for filename in files:
-                    rel_path = os.path.relpath(os.path.join(root, filename), tmpdir)
-                    if spec.match_file(rel_path):
-                        continue
-                    if not is_relevant_file(rel_path):
-                        continue
-                    file_path = Path(tmpdir) / rel_path
-                    try:
-                        content = file_path.read_text(encoding="utf-8", errors="ignore")
-                    except OSError:
-                        continue
-                    results.append(FileItem(path=rel_path, content=content))
-            return results
+    def _load_local_files(self, root: Path) -> list[FileItem]:
+        # Runs in a worker thread: walking and reading a large checkout must not block the event loop.
+        paths = walk_local_files(root, IgnoreMatcher(read_info_exclude(root)))
+        with ThreadPoolExecutor(max_workers=max(1, settings.local_read_workers)) as pool:
+            items = pool.map(partial(read_local_file, root), paths)
+            return [item for item in items if item is not None]
 
     async def _git_clone(self, repo_url: str, dest: str, token: str | None) -> None:
-        args = ["git", "clone", "--depth", "1"]
-        if token:
-            auth = base64.b64encode(f"x-access-token:{token}".encode("utf-8")).decode("utf-8")
-            args.extend(["-c", f"http.extraHeader=Authorization: Basic {auth}"])
-        args.extend([repo_url, dest])
+        args = ["git", "clone", "--depth", "1", *git_auth_args(token), repo_url, dest]
         proc = await asyncio.create_subprocess_exec(
             *args,
             stdout=asyncio.subprocess.DEVNULL,
             stderr=asyncio.subprocess.PIPE,
         )
-        _, stderr = await proc.communicate()
+        _, stderr = await communicate(proc)
         if proc.returncode != 0:
             raise RuntimeError(f"git clone failed: {stderr.decode('utf-8', errors='ignore')}")
 
     def _check_rate_limit(self, resp: httpx.Response) -> None:
+        GITHUB_REQUESTS.inc(endpoint=_endpoint_label(resp.request.url.path), status=resp.status_code)
+        remaining = resp.headers.get("X-RateLimit-Remaining")
+        if remaining is not None and remaining.isdigit():
+            GITHUB_RATE_LIMIT_REMAINING.set(int(remaining))
         if resp.status_code == 403:
             remaining = resp.headers.get("X-RateLimit-Remaining")
             if remaining == "0":
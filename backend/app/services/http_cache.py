@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+
+from app.core.config import settings
+from app.core.metrics import GITHUB_CACHE
+
+logger = logging.getLogger(__name__)
+
+# Response headers worth replaying from the cache; rate-limit headers always come from the live 304.
+REPLAYED_HEADERS = ("content-type", "etag", "last-modified", "link")
+# Eviction trims the cache below its budget so the next few writes do not each rescan the directory.
+EVICT_TO_FRACTION = 0.9
+
+
+@dataclass
+class CachedResponse:
+    etag: str | None
+    last_modified: str | None
+    headers: dict[str, str]
+    body: bytes
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    def to_metadata(self) -> dict[str, int]:
+        return {"saved_requests": self.hits, "fetched_requests": self.misses}
+
+
+_current_stats: ContextVar[CacheStats | None] = ContextVar("github_cache_stats", default=None)
+
+
+@contextmanager
+def track_cache_stats() -> Iterator[CacheStats]:
+    """Count cache hits and misses for GitHub requests made inside the block by the current task."""
+    stats = CacheStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def record_cache_result(hit: bool) -> None:
+    GITHUB_CACHE.inc(result="hit" if hit else "miss")
+    stats = _current_stats.get()
+    if stats is not None:
+        if hit:
+            stats.hits += 1
+        else:
+            stats.misses += 1
+
+
+class HTTPCache:
+    """Persistent GitHub response cache revalidated with If-None-Match / If-Modified-Since.
+
+    Entries are keyed by URL and a hash of the credential so private responses are never
+    served to a different token. Each entry's mtime doubles as its last-used marker: reads touch
+    it, and writes evict the least recently used entries once the directory exceeds `max_bytes`.
+    """
+
+    def __init__(self, root: str | Path, max_body_bytes: int, max_bytes: int | None = None) -> None:
+        self.root = Path(root)
+        self.max_body_bytes = max_body_bytes
+        self.max_bytes = None if max_bytes is None else max(0, max_bytes)
+        # Running estimate of the directory size, rebuilt by every eviction scan.
+        self._approx_bytes: int | None = None
+
+    @staticmethod
+    def key(url: str, token: str | None) -> str:
+        credential = hashlib.sha256(token.encode("utf-8")).hexdigest() if token else "anonymous"
+        return hashlib.sha256(f"{credential}\n{url}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    async def lookup(self, key: str) -> CachedResponse | None:
+        return await asyncio.to_thread(self._read, key)
+
+    async def store(self, key: str, headers: dict[str, str], body: bytes) -> None:
+        etag = headers.get("etag")
+        last_modified = headers.get("last-modified")
+        if not (etag or last_modified) or len(body) > self.max_body_bytes:
+            return
+        entry = CachedResponse(
+            etag=etag,
+            last_modified=last_modified,
+            headers={name: headers[name] for name in REPLAYED_HEADERS if name in headers},
+            body=body,
+        )
+        await asyncio.to_thread(self._write, key, entry)
+
+    def _read(self, key: str) -> CachedResponse | None:
+        path = self._path(key)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return CachedResponse(
+            etag=data.get("etag"),
+            last_modified=data.get("last_modified"),
+            headers=data.get("headers", {}),
+            body=data.get("body", "").encode("utf-8"),
+        )
+
+    def _write(self, key: str, entry: CachedResponse) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        staging = path.with_suffix(f".{os.getpid()}.tmp")
+        staging.write_text(
+            json.dumps(
+                {
+                    "etag": entry.etag,
+                    "last_modified": entry.last_modified,
+                    "headers": entry.headers,
+                    "body": entry.body.decode("utf-8", errors="replace"),
+                }
+            ),
+            encoding="utf-8",
+        )
+        os.replace(staging, path)
+        if self.max_bytes is None:
+            return
+        size = path.stat().st_size
+        if self._approx_bytes is None or self._approx_bytes + size > self.max_bytes:
+            self.evict()
+        else:
+            self._approx_bytes += size
+
+    def evict(self) -> list[Path]:
+        """Drop least-recently-used entries until the cache fits well inside `max_bytes`."""
+        entries = []
+        total = 0
+        for path in self.root.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            total += stat.st_size
+            entries.append((stat.st_mtime, path, stat.st_size))
+
+        evicted: list[Path] = []
+        if self.max_bytes is not None and total > self.max_bytes:
+            target = int(self.max_bytes * EVICT_TO_FRACTION)
+            for _, path, size in sorted(entries, key=lambda entry: entry[0]):
+                if total <= target:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                evicted.append(path)
+            logger.info("Evicted %d cached GitHub responses", len(evicted))
+        self._approx_bytes = total
+        return evicted
+
+
+github_http_cache = (
+    HTTPCache(settings.github_cache_dir, settings.github_cache_max_body_bytes, settings.github_cache_max_bytes)
+    if settings.github_cache_dir
+    else None
+)
@@ -0,0 +1,211 @@
+"""Git ignore rules compiled once for matching many paths.
+
+Each `.gitignore` (and `.git/info/exclude`) becomes a few alternation regexes whose first
+matching alternative is the path's last matching pattern, which is the one git applies. Rules
+from deeper directories take precedence over shallower ones, `info/exclude` comes last, and an
+ignored directory hides everything below it (git never looks inside, so `!` cannot re-include).
+Directory decisions are memoized, so a tree of N files costs about one basename match per file
+per rule file plus one match per distinct directory.
+"""
+from __future__ import annotations
+
+import re
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from typing import TypeVar
+
+from pathspec.patterns import GitWildMatchPattern
+
+T = TypeVar("T")
+
+
+# Tails pathspec appends to a pattern: "also everything below a matching directory", and the
+# directory-only form of a trailing-slash pattern.
+_ANY_TAILS = ("(?:(?P<ps_d>/).*)?$", "(?:/.*)?$")
+_DIR_TAIL = "(?P<ps_d>/).*$"
+_ANY_DIRECTORY = "(?:.+/)?"
+
+
+def _alternation(entries: list[tuple[str, int]]) -> tuple[re.Pattern[str] | None, list[int]]:
+    if not entries:
+        return None, []
+    return re.compile("|".join(f"({regex})" for regex, _ in entries)), [rank for _, rank in entries]
+
+
+class _RuleSet:
+    """One ignore file, as regexes that test a path against the patterns themselves.
+
+    Anything below a matching directory is left to the directory memo in `IgnoreMatcher`, so a
+    file is only tested as itself, and patterns without a slash only against its basename.
+    """
+
+    __slots__ = ("ignores", "_names", "_name_ranks", "_paths", "_path_ranks", "_dirs", "_dir_ranks")
+
+    def __init__(self, patterns: list[tuple[str, bool]]) -> None:
+        # Ranked by precedence: 0 is the last pattern in the file, the one git applies first.
+        self.ignores = [include for _, include in patterns]
+        names: list[tuple[str, int]] = []
+        paths: list[tuple[str, int]] = []
+        dirs: list[tuple[str, int]] = []
+        for rank, (regex, _) in enumerate(patterns):
+            body, dir_only = regex[1:], False
+            for tail in _ANY_TAILS:
+                if body.endswith(tail):
+                    body = body[: -len(tail)]
+                    break
+            else:
+                if body.endswith(_DIR_TAIL):
+                    body, dir_only = body[: -len(_DIR_TAIL)], True
+                else:
+                    # Unrecognised shape: match it as written for both files and directories.
+                    paths.append((regex.replace("(?P<ps_d>/)", "/"), rank))
+                    dirs.append((regex.replace("(?P<ps_d>/)", "/"), rank))
+                    continue
+            dirs.append((f"^{body}/$", rank))
+            if dir_only:
+                continue
+            name = body.removeprefix(_ANY_DIRECTORY)
+            if name != body and "/" not in name:
+                names.append((f"{name}$", rank))
+            else:
+                paths.append((f"^{body}$", rank))
+        self._names, self._name_ranks = _alternation(names)
+        self._paths, self._path_ranks = _alternation(paths)
+        self._dirs, self._dir_ranks = _alternation(dirs)
+
+    @classmethod
+    def compile(cls, lines: Iterable[str]) -> "_RuleSet | None":
+        patterns: list[tuple[str, bool]] = []
+        for line in lines:
+            try:
+                regex, include = GitWildMatchPattern.pattern_to_regex(line.rstrip("\r\n"))
+            except ValueError:
+                continue
+            if regex is not None:
+                patterns.append((regex, include))
+        if not patterns:
+            return None
+        patterns.reverse()
+        return cls(patterns)
+
+    def decide_file(self, path: str, name: str) -> bool | None:
+        """Ignore (True), re-include (False) or no opinion (None) for a file `path` named `name`."""
+        rank = None
+        if self._names is not None:
+            match = self._names.match(name)
+            if match is not None:
+                rank = self._name_ranks[match.lastindex - 1]
+        if self._paths is not None:
+            match = self._paths.match(path)
+            if match is not None:
+                path_rank = self._path_ranks[match.lastindex - 1]
+                rank = path_rank if rank is None else min(rank, path_rank)
+        return None if rank is None else self.ignores[rank]
+
+    def decide_dir(self, directory: str) -> bool | None:
+        """Like `decide_file` for a directory given as "a/b/"."""
+        if self._dirs is None:
+            return None
+        match = self._dirs.match(directory)
+        return None if match is None else self.ignores[self._dir_ranks[match.lastindex - 1]]
+
+
+class IgnoreMatcher:
+    def __init__(self, exclude_lines: Iterable[str] = ()) -> None:
+        # Directory prefix ("" for the root, else "a/b/") -> rules of the .gitignore found there.
+        self._rules: dict[str, _RuleSet] = {}
+        self._exclude = _RuleSet.compile(exclude_lines)
+        self._chains: dict[str, list[tuple[str, _RuleSet]]] = {}
+        self._ignored_dirs: dict[str, bool] = {}
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[str]) -> "IgnoreMatcher":
+        """A matcher for a single root `.gitignore`."""
+        matcher = cls()
+        matcher.add("", lines)
+        return matcher
+
+    def add(self, directory: str, lines: Iterable[str]) -> None:
+        """Register the `.gitignore` of `directory` (repo-relative, "" for the root)."""
+        prefix = directory.strip("/")
+        rules = _RuleSet.compile(lines)
+        if rules is None:
+            return
+        self._rules[f"{prefix}/" if prefix else ""] = rules
+        self._chains.clear()
+        self._ignored_dirs.clear()
+
+    def __bool__(self) -> bool:
+        return bool(self._rules) or self._exclude is not None
+
+    def _chain(self, directory: str) -> list[tuple[str, _RuleSet]]:
+        """Rule sets that apply inside `directory` ("a/b/"), deepest first."""
+        chain = self._chains.get(directory)
+        if chain is None:
+            parent = directory[: directory.rstrip("/").rfind("/") + 1] if directory else None
+            chain = self._chain(parent) if parent is not None else []
+            own = self._rules.get(directory)
+            if own is not None:
+                chain = [(directory, own), *chain]
+            self._chains[directory] = chain
+        return chain
+
+    def _decide_file(self, directory: str, path: str) -> bool:
+        name = path[len(directory):]
+        for prefix, rules in self._chain(directory):
+            decision = rules.decide_file(path[len(prefix):], name)
+            if decision is not None:
+                return decision
+        if self._exclude is not None:
+            return bool(self._exclude.decide_file(path, name))
+        return False
+
+    def _decide_dir(self, parent: str, directory: str) -> bool:
+        for prefix, rules in self._chain(parent):
+            decision = rules.decide_dir(directory[len(prefix):])
+            if decision is not None:
+                return decision
+        if self._exclude is not None:
+            return bool(self._exclude.decide_dir(directory))
+        return False
+
+    def is_dir_ignored(self, directory: str) -> bool:
+        """Whether repo-relative `directory` ("a/b" or "a/b/") and everything below it is ignored."""
+        ignored = self._ignored_dirs.get(directory)
+        if ignored is not None:
+            return ignored
+        directory = directory.strip("/") + "/"
+        ignored = self._ignored_dirs.get(directory)
+        if ignored is None:
+            parent = directory[: directory.rstrip("/").rfind("/") + 1]
+            ignored = (bool(parent) and self.is_dir_ignored(parent)) or self._decide_dir(parent, directory)
+            self._ignored_dirs[directory] = ignored
+        return ignored
+
+    def is_ignored(self, path: str) -> bool:
+        directory = path[: path.rfind("/") + 1]
+        if directory and self.is_dir_ignored(directory):
+            return True
+        return self._decide_file(directory, path)
+
+    def filter(self, items: Iterable[T], key: Callable[[T], str] = str) -> list[T]:
+        """The items whose path is not ignored, in their original order."""
+        if not self:
+            return list(items)
+        return [item for item in items if not self.is_ignored(key(item))]
+
+
+def read_info_exclude(root: Path) -> list[str]:
+    """Lines of `.git/info/exclude` for a checkout, following a worktree's `.git` file to its common dir."""
+    git_dir = root / ".git"
+    try:
+        if git_dir.is_file():
+            pointer = git_dir.read_text(encoding="utf-8").strip()
+            git_dir = (root / pointer.removeprefix("gitdir:").strip()).resolve()
+            commondir = git_dir / "commondir"
+            if commondir.is_file():
+                git_dir = (git_dir / commondir.read_text(encoding="utf-8").strip()).resolve()
+        exclude = git_dir / "info" / "exclude"
+        return exclude.read_text(encoding="utf-8", errors="ignore").splitlines() if exclude.is_file() else []
+    except OSError:
+        return []
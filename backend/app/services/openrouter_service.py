@@ -1,13 +1,36 @@
 import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
 import httpx
 
 from app.core.config import settings
+from app.core.metrics import LLM_LATENCY, LLM_REQUESTS, LLM_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# After a failed `/models` lookup, structured output stays off until this long has passed.
+MODELS_RETRY_S = 60.0
+
+
+@dataclass
+class Completion:
+    content: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    retries: int = 0
+    finish_reason: str | None = None
 
 
 class OpenRouterService:
     def __init__(self) -> None:
         self.base_url = settings.openrouter_api_base
         self.model = settings.openrouter_model
+        self._supported_parameters: dict[str, set[str]] | None = None
+        self._models_retry_at = 0.0
+        self._models_lock = asyncio.Lock()
 
     def _headers(self) -> dict[str, str]:
         return {
@@ -16,37 +39,95 @@ class OpenRouterService:
         }
 
     async def analyze_chunk(self, system_prompt: str, user_prompt: str) -> str:
+        completion = await self.complete(system_prompt, user_prompt)
+        return completion.content
+
+    async def supports_structured_output(self, model: str | None = None) -> bool:
+        """Whether `model` accepts a `response_format` JSON schema, per `ACRA_STRUCTURED_OUTPUT`."""
+        mode = settings.structured_output
+        if mode in ("on", "off"):
+            return mode == "on"
+        async with self._models_lock:
+            if self._supported_parameters is None and time.monotonic() >= self._models_retry_at:
+                supported = await self._fetch_supported_parameters()
+                if supported is None:
+                    self._models_retry_at = time.monotonic() + MODELS_RETRY_S
+                else:
+                    self._supported_parameters = supported
+        return "structured_outputs" in (self._supported_parameters or {}).get(model or self.model, set())
+
+    async def _fetch_supported_parameters(self) -> dict[str, set[str]] | None:
+        # Fetched once per process; a failure (None) is retried after MODELS_RETRY_S.
+        try:
+            async with httpx.AsyncClient(timeout=settings.request_timeout_s) as client:
+                resp = await client.get(f"{self.base_url}/models", headers=self._headers())
+                resp.raise_for_status()
+                models = resp.json().get("data", [])
+        except (httpx.HTTPError, ValueError) as exc:
+            logger.warning("Could not list OpenRouter models, structured output disabled for now: %s", exc)
+            return None
+        return {model["id"]: set(model.get("supported_parameters") or []) for model in models if "id" in model}
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        model: str | None = None,
+        *,
+        response_format: dict | None = None,
+        max_tokens: int | None = None,
+    ) -> Completion:
+        model = model or self.model
         payload = {
-            "model": self.model,
+            "model": model,
             "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt},
             ],
             "temperature": 0.2,
         }
+        if response_format is not None:
+            payload["response_format"] = response_format
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
         attempts = 3
         backoff = 1.5
         last_exc: Exception | None = None
         async with httpx.AsyncClient(timeout=settings.request_timeout_s) as client:
             for attempt in range(1, attempts + 1):
+                started = time.perf_counter()
                 try:
                     resp = await client.post(
                         f"{self.base_url}/chat/completions",
                         headers=self._headers(),
                         json=payload,
                     )
+                    LLM_LATENCY.observe(time.perf_counter() - started, model=model)
+                    LLM_REQUESTS.inc(model=model, status=resp.status_code)
                     resp.raise_for_status()
                     data = resp.json()
-                    return data["choices"][0]["message"]["content"]
+                    usage = data.get("usage") or {}
+                    choice = data["choices"][0]
+                    return Completion(
+                        content=choice["message"].get("content") or "",
+                        model=model,
+                        prompt_tokens=usage.get("prompt_tokens", 0),
+                        completion_tokens=usage.get("completion_tokens", 0),
+                        retries=attempt - 1,
+                        finish_reason=choice.get("finish_reason"),
+                    )
                 except httpx.HTTPStatusError as exc:
                     status = exc.response.status_code
                     if status in {408, 429, 500, 502, 503, 504} and attempt < attempts:
+                        LLM_RETRIES.inc(model=model, reason=status)
                         await asyncio.sleep(backoff ** attempt)
                         last_exc = exc
                         continue
                     raise
                 except httpx.RequestError as exc:
+                    LLM_REQUESTS.inc(model=model, status="error")
                     if attempt < attempts:
+                        LLM_RETRIES.inc(model=model, reason="network")
                         await asyncio.sleep(backoff ** attempt)
                         last_exc = exc
                         continue
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import logging
+import pstats
+import shutil
+import threading
+import tracemalloc
+from pathlib import Path
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ARTIFACT = "profile.pstats"
+PROFILE_SUMMARY_ARTIFACT = "profile.txt"
+ALLOCATIONS_ARTIFACT = "allocations.txt"
+ARTIFACT_NAMES = {PROFILE_ARTIFACT, PROFILE_SUMMARY_ARTIFACT, ALLOCATIONS_ARTIFACT}
+
+TOP_FUNCTIONS = 60
+TOP_ALLOCATIONS = 40
+TRACE_FRAMES = 10
+
+# cProfile and tracemalloc are process-wide resources, so only one run is profiled at a time.
+_active = threading.Lock()
+
+
+def artifact_dir(analysis_id: int) -> Path:
+    return Path(settings.artifacts_dir) / str(analysis_id)
+
+
+def artifact_path(analysis_id: int, name: str) -> Path | None:
+    if name not in ARTIFACT_NAMES:
+        return None
+    path = artifact_dir(analysis_id) / name
+    return path if path.is_file() else None
+
+
+def remove_artifacts(analysis_id: int) -> None:
+    shutil.rmtree(artifact_dir(analysis_id), ignore_errors=True)
+
+
+class RunProfiler:
+    """cProfile plus tracemalloc sampling around one analysis run.
+
+    cProfile only sees the thread that enabled it, i.e. the event loop; work
+    offloaded to worker threads shows up as time spent awaiting it.
+    """
+
+    def __init__(self, analysis_id: int) -> None:
+        self.analysis_id = analysis_id
+        self._profile: cProfile.Profile | None = None
+        self._snapshot: tracemalloc.Snapshot | None = None
+
+    def start(self) -> bool:
+        if not _active.acquire(blocking=False):
+            return False
+        self._profile = cProfile.Profile()
+        tracemalloc.start(TRACE_FRAMES)
+        self._profile.enable()
+        return True
+
+    def stop(self) -> None:
+        """Must run on the thread that called start()."""
+        if self._profile is None:
+            return
+        self._profile.disable()
+        self._snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        _active.release()
+
+    def write_artifacts(self) -> list[str]:
+        if self._profile is None or self._snapshot is None:
+            return []
+        target = artifact_dir(self.analysis_id)
+        target.mkdir(parents=True, exist_ok=True)
+        self._profile.dump_stats(str(target / PROFILE_ARTIFACT))
+
+        summary = io.StringIO()
+        pstats.Stats(self._profile, stream=summary).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        (target / PROFILE_SUMMARY_ARTIFACT).write_text(summary.getvalue())
+        (target / ALLOCATIONS_ARTIFACT).write_text(self._format_allocations())
+        return sorted(ARTIFACT_NAMES)
+
+    def _format_allocations(self) -> str:
+        snapshot = self._snapshot.filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+        )
+        lines = [f"Top {TOP_ALLOCATIONS} allocation sites still held at the end of the run", ""]
+        for index, stat in enumerate(snapshot.statistics("traceback")[:TOP_ALLOCATIONS], start=1):
+            lines.append(f"#{index}: {stat.size / 1024:.1f} KiB in {stat.count} blocks")
+            for frame in stat.traceback.format(limit=TRACE_FRAMES, most_recent_first=True):
+                lines.append(f"    {frame}")
+            lines.append("")
+        return "\n".join(lines)
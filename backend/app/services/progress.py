@@ -2,6 +2,8 @@ import asyncio
 from dataclasses import dataclass, field
 from typing import Any
 
+from app.core.metrics import PROGRESS_EVENTS
+
 
 @dataclass
 class ProgressUpdate:
@@ -15,15 +17,35 @@ class ProgressUpdate:
 class ProgressHub:
     def __init__(self) -> None:
         self._queues: dict[int, asyncio.Queue[ProgressUpdate]] = {}
+        # Batch scans: child analysis id -> job id, and one rolled-up queue per job.
+        self._job_of: dict[int, int] = {}
+        self._job_queues: dict[int, asyncio.Queue[ProgressUpdate]] = {}
 
     def get_queue(self, analysis_id: int) -> asyncio.Queue[ProgressUpdate]:
         if analysis_id not in self._queues:
             self._queues[analysis_id] = asyncio.Queue()
         return self._queues[analysis_id]
 
+    def get_job_queue(self, job_id: int) -> asyncio.Queue[ProgressUpdate]:
+        if job_id not in self._job_queues:
+            self._job_queues[job_id] = asyncio.Queue()
+        return self._job_queues[job_id]
+
+    def attach(self, analysis_id: int, job_id: int) -> None:
+        """Also forward updates for `analysis_id` to the queue of batch job `job_id`."""
+        self._job_of[analysis_id] = job_id
+
+    def discard_job(self, job_id: int) -> None:
+        self._job_queues.pop(job_id, None)
+        self._job_of = {child: job for child, job in self._job_of.items() if job != job_id}
+
     async def publish(self, update: ProgressUpdate) -> None:
         queue = self.get_queue(update.analysis_id)
+        PROGRESS_EVENTS.inc(status=update.status)
         await queue.put(update)
+        job_id = self._job_of.get(update.analysis_id)
+        if job_id is not None:
+            await self.get_job_queue(job_id).put(update)
 
 
 progress_hub = ProgressHub()
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import contextlib
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import shutil
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LAST_USED_MARKER = "acra-last-used"
+FETCH_REFSPECS = ["+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"]
+FILE_LOCK_POLL_S = 0.05
+
+
+def git_auth_args(token: str | None) -> list[str]:
+    if not token:
+        return []
+    auth = base64.b64encode(f"x-access-token:{token}".encode("utf-8")).decode("utf-8")
+    return ["-c", f"http.extraHeader=Authorization: Basic {auth}"]
+
+
+async def communicate(proc: asyncio.subprocess.Process) -> tuple[bytes, bytes]:
+    """`proc.communicate()` that kills the process when the awaiting task is cancelled."""
+    try:
+        return await proc.communicate()
+    except asyncio.CancelledError:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
+
+
+async def run_git(*args: str) -> str:
+    proc = await asyncio.create_subprocess_exec(
+        "git",
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await communicate(proc)
+    if proc.returncode != 0:
+        raise RuntimeError(f"git command failed: {stderr.decode('utf-8', errors='ignore')}")
+    return stdout.decode("utf-8", errors="ignore")
+
+
+@contextlib.asynccontextmanager
+async def file_lock(path: Path, wait: bool = True) -> AsyncIterator[bool]:
+    """Hold an exclusive `flock` on `path`; yields False instead of waiting when `wait` is off.
+
+    Polls rather than blocking a thread so a cancelled run never leaves a lock behind.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if not wait:
+                    yield False
+                    return
+                await asyncio.sleep(FILE_LOCK_POLL_S)
+        try:
+            yield True
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+class RepoMirrorCache:
+    """On-disk cache of bare mirrors keyed by repo URL, checked out through detached worktrees.
+
+    An in-process lock and a `<mirror>.lock` file lock (the directory is shared between workers)
+    guard every fetch, worktree add and eviction of a mirror.
+    """
+
+    def __init__(self, root: str | Path, max_bytes: int) -> None:
+        self.root = Path(root)
+        self.max_bytes = max(0, max_bytes)
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def mirror_path(self, repo_url: str) -> Path:
+        normalized = repo_url.strip().rstrip("/").removesuffix(".git").lower()
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+        slug = re.sub(r"[^a-z0-9]+", "-", normalized.split("://", 1)[-1])[-48:].strip("-")
+        return self.root / f"{slug}-{digest}.git"
+
+    def _lock(self, mirror: Path) -> asyncio.Lock:
+        return self._locks.setdefault(mirror.name, asyncio.Lock())
+
+    @staticmethod
+    def _lock_file(mirror: Path) -> Path:
+        return mirror.with_name(f"{mirror.name}.lock")
+
+    async def materialize(self, repo_url: str, token: str | None, dest: Path, ref: str = "HEAD") -> None:
+        """Clone or incrementally fetch the mirror for `repo_url`, then check `ref` out at `dest`."""
+        mirror = self.mirror_path(repo_url)
+        async with self._lock(mirror), file_lock(self._lock_file(mirror)):
+            if mirror.exists():
+                await run_git(
+                    *git_auth_args(token), "--git-dir", str(mirror),
+                    "fetch", "--prune", "--force", repo_url, *FETCH_REFSPECS,
+                )
+            else:
+                await self._clone(repo_url, token, mirror)
+            (mirror / LAST_USED_MARKER).touch()
+            await run_git("--git-dir", str(mirror), "worktree", "prune")
+            await run_git("--git-dir", str(mirror), "worktree", "add", "--detach", "--force", str(dest), ref)
+        await self.evict()
+
+    async def _clone(self, repo_url: str, token: str | None, mirror: Path) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = mirror.with_name(f"{mirror.name}.tmp-{os.getpid()}")
+        shutil.rmtree(staging, ignore_errors=True)
+        try:
+            await run_git(*git_auth_args(token), "clone", "--bare", "--quiet", repo_url, str(staging))
+            staging.rename(mirror)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    async def evict(self) -> list[Path]:
+        """Drop least-recently-used mirrors until the cache fits in `max_bytes`.
+
+        A mirror is only removed while this process holds both of its locks and no worktree
+        checked out from it still exists, so running analyses keep their history.
+        """
+        entries, total = await asyncio.to_thread(self._usage)
+        evicted: list[Path] = []
+        for _, mirror, size in entries:
+            if total <= self.max_bytes:
+                break
+            lock = self._lock(mirror)
+            if lock.locked():
+                continue
+            async with lock, file_lock(self._lock_file(mirror), wait=False) as acquired:
+                if not acquired or not mirror.exists() or await self._has_worktrees(mirror):
+                    continue
+                logger.info("Evicting cached mirror %s (%d bytes)", mirror.name, size)
+                await asyncio.to_thread(shutil.rmtree, mirror, True)
+            self._locks.pop(mirror.name, None)
+            total -= size
+            evicted.append(mirror)
+        return evicted
+
+    def _usage(self) -> tuple[list[tuple[float, Path, int]], int]:
+        """Mirrors oldest-used first with their sizes, and the total size of the cache."""
+        if not self.root.exists():
+            return [], 0
+        entries = []
+        for mirror in self.root.glob("*.git"):
+            marker = mirror / LAST_USED_MARKER
+            last_used = marker.stat().st_mtime if marker.exists() else 0.0
+            entries.append((last_used, mirror, _disk_usage(mirror)))
+        entries.sort(key=lambda entry: entry[0])
+        return entries, sum(size for _, _, size in entries)
+
+    @staticmethod
+    async def _has_worktrees(mirror: Path) -> bool:
+        # Pruning first drops registrations whose checkout was already deleted.
+        try:
+            await run_git("--git-dir", str(mirror), "worktree", "prune")
+        except RuntimeError:
+            return True
+        worktrees = mirror / "worktrees"
+        return worktrees.is_dir() and any(worktrees.iterdir())
+
+
+def _disk_usage(path: Path) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.stat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                continue
+    return total
+
+
+repo_cache = RepoMirrorCache(settings.repo_cache_dir, settings.repo_cache_max_bytes) if settings.repo_cache_dir else None
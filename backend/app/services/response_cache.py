@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from app.core.config import settings
+from app.core.metrics import RESPONSE_CACHE
+from app.services.compression import encode_body
+
+
+@dataclass
+class CachedBody:
+    body: bytes
+    etag: str
+    # Compressed once when cached: content coding -> bytes.
+    encoded: dict[str, bytes] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, body: bytes) -> "CachedBody":
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        return cls(body=body, etag=etag, encoded=encode_body(body))
+
+    def etag_for(self, coding: str | None) -> str:
+        """The strong validator of one representation; each content coding gets its own."""
+        return self.etag if coding is None else f'{self.etag[:-1]}-{coding}"'
+
+    def matches(self, if_none_match: str | None, coding: str | None = None) -> bool:
+        """Strong comparison against an If-None-Match header (weak validators never match)."""
+        if not if_none_match:
+            return False
+        candidates = [value.strip() for value in if_none_match.split(",")]
+        return "*" in candidates or self.etag_for(coding) in candidates
+
+
+class ResponseCache:
+    """Serialized bodies of finished analyses, which never change once completed.
+
+    Entries live in an in-memory LRU and, with a directory configured, on disk as well. The disk
+    copy is shared by every worker and doubles as the validity marker for the memory copy, so a
+    delete handled by one worker invalidates the others without touching the database. The
+    directory keeps at most `max_disk_entries` bodies, dropping the least recently read first.
+    """
+
+    def __init__(self, max_entries: int, directory: str = "", max_disk_entries: int = 0) -> None:
+        self.max_entries = max(0, max_entries)
+        self.directory = Path(directory) if directory else None
+        self.max_disk_entries = max(0, max_disk_entries)
+        self._entries: OrderedDict[int, CachedBody] = OrderedDict()
+
+    def _path(self, analysis_id: int) -> Path:
+        return self.directory / f"analysis-{analysis_id}.json"
+
+    async def get(self, analysis_id: int) -> CachedBody | None:
+        entry = self._entries.get(analysis_id)
+        if entry is not None and self.directory is not None and not self._path(analysis_id).exists():
+            self._entries.pop(analysis_id, None)
+            entry = None
+        if entry is None and self.directory is not None:
+            try:
+                body = await asyncio.to_thread(self._read, analysis_id)
+            except OSError:
+                body = None
+            if body is not None:
+                entry = await asyncio.to_thread(CachedBody.build, body)
+                self._remember(analysis_id, entry)
+        if entry is None:
+            RESPONSE_CACHE.inc(result="miss")
+            return None
+        if analysis_id in self._entries:
+            self._entries.move_to_end(analysis_id)
+        RESPONSE_CACHE.inc(result="hit")
+        return entry
+
+    async def put(self, analysis_id: int, body: bytes) -> CachedBody:
+        entry = await asyncio.to_thread(CachedBody.build, body)
+        self._remember(analysis_id, entry)
+        if self.directory is not None:
+            try:
+                await asyncio.to_thread(self._write, analysis_id, body)
+            except OSError:
+                pass
+        return entry
+
+    def _remember(self, analysis_id: int, entry: CachedBody) -> None:
+        if not self.max_entries:
+            return
+        self._entries[analysis_id] = entry
+        self._entries.move_to_end(analysis_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read(self, analysis_id: int) -> bytes:
+        path = self._path(analysis_id)
+        body = path.read_bytes()
+        os.utime(path)
+        return body
+
+    def _write(self, analysis_id: int, body: bytes) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        target = self._path(analysis_id)
+        staging = target.with_suffix(f".{os.getpid()}.tmp")
+        staging.write_bytes(body)
+        os.replace(staging, target)
+        if self.max_disk_entries:
+            self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        entries = []
+        for path in self.directory.glob("analysis-*.json"):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except OSError:
+                continue
+        entries.sort(key=lambda entry: entry[0])
+        for _, path in entries[: max(0, len(entries) - self.max_disk_entries)]:
+            path.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def invalidate(self, analysis_id: int) -> None:
+        self._entries.pop(analysis_id, None)
+        if self.directory is not None:
+            self._path(analysis_id).unlink(missing_ok=True)
+
+
+analysis_cache = ResponseCache(
+    settings.response_cache_entries, settings.response_cache_dir, settings.response_cache_disk_entries
+)
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import Counter
+from dataclasses import dataclass
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.db import AsyncSessionLocal
+from app.models.analysis import Analysis
+from app.models.issue import Issue
+from app.models.scan_job import ScanJob
+from app.services.analysis_agent import AnalysisAgent, AnalysisInput
+from app.services.file_planner import TokenPool
+from app.services.progress import ProgressUpdate, progress_hub
+from app.services.task_registry import analysis_tasks
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {"completed", "failed", "skipped", "cancelled"}
+
+
+@dataclass
+class ScanOptions:
+    github_token: str | None
+    allow_git_clone: bool
+
+
+def rollup(states: dict[int, tuple[str, int]]) -> dict:
+    """Aggregate child (status, progress) pairs into one job-level progress view."""
+    total = len(states)
+    return {
+        "total": total,
+        "statuses": dict(Counter(status for status, _ in states.values())),
+        "done": sum(1 for status, _ in states.values() if status in TERMINAL_STATUSES),
+        "progress": int(sum(progress for _, progress in states.values()) / total) if total else 100,
+    }
+
+
+def job_status(statuses: dict[str, int]) -> str:
+    """Final job status from its children's: completed, partial, cancelled or failed."""
+    completed = statuses.get("completed", 0)
+    if completed == sum(statuses.values()):
+        return "completed"
+    if completed:
+        return "partial"
+    return "cancelled" if statuses.get("cancelled") else "failed"
+
+
+async def summarize_job(session: AsyncSession, job_id: int) -> dict:
+    statuses = await session.execute(
+        select(Analysis.status, func.count()).where(Analysis.job_id == job_id).group_by(Analysis.status)
+    )
+    severities = await session.execute(
+        select(Issue.severity, func.count())
+        .join(Analysis, Issue.analysis_id == Analysis.id)
+        .where(Analysis.job_id == job_id)
+        .group_by(Issue.severity)
+    )
+    score = await session.scalar(select(func.avg(Analysis.quality_score)).where(Analysis.job_id == job_id))
+    return {
+        "statuses": dict(statuses.all()),
+        "issues_by_severity": dict(severities.all()),
+        "average_quality_score": round(score) if score is not None else None,
+    }
+
+
+class ScanScheduler:
+    """Runs the child analyses of batch scan jobs under one process-wide concurrency limit."""
+
+    def __init__(self, agent: AnalysisAgent, sessions: async_sessionmaker = AsyncSessionLocal) -> None:
+        self.agent = agent
+        self.sessions = sessions
+        self._slots: asyncio.Semaphore | None = None
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(max(1, settings.batch_max_concurrency))
+        return self._slots
+
+    async def run_job(self, job_id: int, options: ScanOptions) -> None:
+        async with self.sessions() as session:
+            job = await session.get(ScanJob, job_id)
+            if job is None:
+                return
+            # A resumed job only reruns the children its earlier attempt did not settle.
+            result = await session.execute(
+                select(Analysis.id, Analysis.repo_url, Analysis.pr_number)
+                .where(Analysis.job_id == job_id, Analysis.status.not_in(TERMINAL_STATUSES))
+                .order_by(Analysis.id)
+            )
+            children = result.all()
+            job.status = "running"
+            pool = TokenPool(job.token_budget)
+            await session.commit()
+
+        for child in children:
+            progress_hub.attach(child.id, job_id)
+        # Each child is its own registered task, so it can be cancelled whether it is queued or running.
+        tasks = [analysis_tasks.start(child.id, self._run_child(child, options, pool)) for child in children]
+        try:
+            if tasks:
+                await asyncio.wait(tasks)
+            for task in tasks:
+                if not task.cancelled() and task.exception() is not None:
+                    logger.error("Scan job %s child failed outside the agent: %s", job_id, task.exception())
+        finally:
+            await self._finish(job_id, pool)
+            progress_hub.discard_job(job_id)
+
+    async def _run_child(self, child, options: ScanOptions, pool: TokenPool) -> None:
+        started = False
+        try:
+            async with self._semaphore():
+                if pool.exhausted:
+                    await self._settle(child.id, "skipped", "Token budget exhausted")
+                    return
+                payload = AnalysisInput(
+                    repo_url=child.repo_url,
+                    pr_number=child.pr_number,
+                    github_token=options.github_token,
+                    allow_git_clone=options.allow_git_clone,
+                    token_pool=pool if pool.limit else None,
+                )
+                async with self.sessions() as session:
+                    started = True
+                    await self.agent.run(child.id, session, payload)
+        except asyncio.CancelledError as exc:
+            # Once started, the agent records its own cancellation; a queued child never got that far.
+            if not started:
+                await self._settle(child.id, "cancelled", str(exc.args[0]) if exc.args else "Cancelled")
+            raise
+
+    async def _settle(self, analysis_id: int, status: str, reason: str) -> None:
+        async with self.sessions() as session:
+            analysis = await session.get(Analysis, analysis_id)
+            if analysis:
+                analysis.status = status
+                analysis.progress = 100
+                analysis.extra_metadata = {**(analysis.extra_metadata or {}), f"{status}_reason": reason}
+                await session.commit()
+        await progress_hub.publish(
+            ProgressUpdate(analysis_id=analysis_id, status=status, progress=100, message=reason)
+        )
+
+    async def _finish(self, job_id: int, pool: TokenPool) -> None:
+        async with self.sessions() as session:
+            job = await session.get(ScanJob, job_id)
+            if job is None:
+                return
+            summary = await summarize_job(session, job_id)
+            job.status = job_status(summary["statuses"])
+            job.extra_metadata = {**(job.extra_metadata or {}), **summary, "tokens_reserved": pool.reserved}
+            await session.commit()
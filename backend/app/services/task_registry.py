@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Coroutine
+from typing import Any
+
+
+class TaskRegistry:
+    """Background tasks by analysis (or scan job) id, so runs can be cancelled and are never garbage collected.
+
+    The registry is per process: with several workers a cancel only reaches runs started by the same worker.
+    """
+
+    def __init__(self, kind: str = "analysis") -> None:
+        self.kind = kind
+        self._tasks: dict[int, asyncio.Task] = {}
+
+    def start(self, analysis_id: int, coro: Coroutine[Any, Any, Any]) -> asyncio.Task:
+        task = asyncio.create_task(coro, name=f"{self.kind}-{analysis_id}")
+        self._tasks[analysis_id] = task
+        task.add_done_callback(lambda done: self._forget(analysis_id, done))
+        return task
+
+    def _forget(self, analysis_id: int, task: asyncio.Task) -> None:
+        if self._tasks.get(analysis_id) is task:
+            del self._tasks[analysis_id]
+
+    def is_running(self, analysis_id: int) -> bool:
+        task = self._tasks.get(analysis_id)
+        return task is not None and not task.done()
+
+    async def cancel(self, analysis_id: int, reason: str, wait_s: float = 0.0) -> bool:
+        """Cancel the run with `reason` as the CancelledError message; optionally wait for it to unwind."""
+        task = self._tasks.get(analysis_id)
+        if task is None or task.done():
+            return False
+        task.cancel(reason)
+        if wait_s:
+            await asyncio.wait({task}, timeout=wait_s)
+        return True
+
+    async def wait_all(self, timeout_s: float) -> None:
+        """Give every running task up to `timeout_s` to finish on its own."""
+        pending = [task for task in self._tasks.values() if not task.done()]
+        if pending:
+            await asyncio.wait(pending, timeout=timeout_s)
+
+    async def cancel_all(self, reason: str, wait_s: float = 0.0) -> int:
+        """Cancel every running task (at shutdown); returns how many were still running."""
+        pending = [task for task in self._tasks.values() if not task.done()]
+        for task in pending:
+            task.cancel(reason)
+        if pending and wait_s:
+            await asyncio.wait(pending, timeout=wait_s)
+        return len(pending)
+
+
+analysis_tasks = TaskRegistry()
+# Scan jobs by job id; each job's children are registered in `analysis_tasks` as usual.
+scan_tasks = TaskRegistry("scan")
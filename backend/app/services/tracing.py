@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+TRACE_VERSION = 1
+
+
+class Trace:
+    """Span timings for one analysis run, stored compactly as [name, start_ms, duration_ms, attrs] rows."""
+
+    def __init__(self) -> None:
+        self._origin = time.perf_counter()
+        self.spans: list[list[Any]] = []
+
+    def _now_ms(self) -> float:
+        return (time.perf_counter() - self._origin) * 1000
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[dict[str, Any]]:
+        """Time the enclosed block; callers may add attributes to the yielded dict while it runs."""
+        start = self._now_ms()
+        try:
+            yield attrs
+        finally:
+            self.spans.append([name, round(start, 2), round(self._now_ms() - start, 2), attrs or None])
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"v": TRACE_VERSION, "total_ms": round(self._now_ms(), 2), "spans": self.spans}
+
+
+STAGE_SPANS = ("fetch", "analyze", "persist")
+TOTAL_ATTRS = ("bytes", "prompt_tokens", "completion_tokens", "retries")
+
+
+def waterfall(stored: dict[str, Any] | None) -> dict[str, Any]:
+    """Expand a stored trace into stage rows, per-span rows sorted by start, and totals."""
+    rows = sorted((stored or {}).get("spans", []), key=lambda row: row[1])
+    spans = [
+        {"name": name, "start_ms": start, "duration_ms": duration, "attrs": attrs or {}}
+        for name, start, duration, attrs in rows
+    ]
+    chunk_spans = [span for span in spans if span["name"] == "chunk"]
+    totals: dict[str, Any] = {"chunks": len(chunk_spans)}
+    for key in TOTAL_ATTRS:
+        totals[key] = sum(span["attrs"].get(key) or 0 for span in chunk_spans)
+    return {
+        "total_ms": (stored or {}).get("total_ms", 0.0),
+        "stages": [span for span in spans if span["name"] in STAGE_SPANS],
+        "spans": [span for span in spans if span["name"] not in STAGE_SPANS],
+        "totals": totals,
+    }
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from app.services.task_registry import analysis_tasks
+
+logger = logging.getLogger(__name__)
+
+# pull_request actions that move the head commit; "closed" stops any pending or running analysis.
+HEAD_ACTIONS = {"opened", "reopened", "synchronize", "ready_for_review"}
+# PRs with no push for this long are forgotten; their next push is analyzed in full.
+IDLE_STATE_TTL_S = 7 * 24 * 3600
+
+
+def verify_signature(secret: str, body: bytes, signature: str | None) -> bool:
+    """Check GitHub's `X-Hub-Signature-256` header (`sha256=<hex HMAC of the raw body>`)."""
+    if not secret or not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature.removeprefix("sha256="))
+
+
+def sign(secret: str, body: bytes) -> str:
+    return "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+@dataclass
+class PullRequestEvent:
+    repo_url: str
+    pr_number: int
+    action: str
+    head_sha: str
+
+    @property
+    def key(self) -> tuple[str, int]:
+        return self.repo_url, self.pr_number
+
+
+def parse_pull_request_event(event: str | None, payload: dict) -> PullRequestEvent | None:
+    if event != "pull_request":
+        return None
+    pull = payload.get("pull_request") or {}
+    repo_url = (payload.get("repository") or {}).get("html_url")
+    head_sha = (pull.get("head") or {}).get("sha")
+    number = pull.get("number") or payload.get("number")
+    if not repo_url or not head_sha or not number:
+        return None
+    return PullRequestEvent(repo_url=repo_url, pr_number=int(number), action=payload.get("action", ""), head_sha=head_sha)
+
+
+@dataclass
+class _PullRequestState:
+    head_sha: str | None = None
+    # Head of the last analysis that completed: the base for the next incremental run.
+    analyzed_sha: str | None = None
+    pending: asyncio.Task | None = None
+    analysis_id: int | None = None
+    last_event: float = 0.0
+
+    def idle(self) -> bool:
+        return self.pending is None and self.analysis_id is None
+
+
+# (repo_url, pr_number, head_sha, base_sha) -> (analysis id, task resolving to the final status)
+Launcher = Callable[[str, int, str, str | None], Awaitable[tuple[int, asyncio.Task]]]
+
+
+class PushDebouncer:
+    """Coalesces bursts of pushes per PR so only the latest head commit is analyzed.
+
+    A new head cancels the run for the previous one straight away and (re)arms a debounce timer;
+    when the timer fires the newest head is analyzed incrementally against the last completed run.
+    State lives in this process, so webhooks should reach a single worker.
+    """
+
+    def __init__(self, launch: Launcher, debounce_s: float) -> None:
+        self.launch = launch
+        self.debounce_s = debounce_s
+        self._states: dict[tuple[str, int], _PullRequestState] = {}
+
+    async def handle(self, event: PullRequestEvent) -> str:
+        self._expire()
+        if event.action == "closed":
+            await self._stop(event.key, "Pull request closed")
+            self._states.pop(event.key, None)
+            return "stopped"
+        if event.action not in HEAD_ACTIONS:
+            return "ignored"
+
+        state = self._states.setdefault(event.key, _PullRequestState())
+        state.last_event = time.monotonic()
+        if event.head_sha == state.head_sha:
+            return "duplicate"
+        state.head_sha = event.head_sha
+        await self._stop(event.key, f"Superseded by {event.head_sha[:12]}")
+        state.pending = asyncio.create_task(self._fire(event.key, state, event.head_sha))
+        return "scheduled"
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - IDLE_STATE_TTL_S
+        for key in [key for key, state in self._states.items() if state.idle() and state.last_event < cutoff]:
+            del self._states[key]
+
+    async def _stop(self, key: tuple[str, int], reason: str) -> None:
+        state = self._states.get(key)
+        if state is None:
+            return
+        if state.pending is not None:
+            state.pending.cancel()
+            state.pending = None
+        if state.analysis_id is not None:
+            await analysis_tasks.cancel(state.analysis_id, reason)
+
+    async def _fire(self, key: tuple[str, int], state: _PullRequestState, head_sha: str) -> None:
+        await asyncio.sleep(self.debounce_s)
+        state.pending = None
+        repo_url, pr_number = key
+        try:
+            analysis_id, task = await self.launch(repo_url, pr_number, head_sha, state.analyzed_sha)
+        except Exception as exc:
+            logger.error("Starting the analysis of %s#%s at %s failed: %s", repo_url, pr_number, head_sha, exc)
+            return
+        if self._states.get(key) is not state:
+            # A close or push arrived while the run was being created and found nothing to stop.
+            await analysis_tasks.cancel(analysis_id, "Pull request closed")
+            return
+        if state.head_sha != head_sha:
+            await analysis_tasks.cancel(analysis_id, f"Superseded by {state.head_sha[:12]}")
+            return
+        state.analysis_id = analysis_id
+
+        def settle(done: asyncio.Task) -> None:
+            if state.analysis_id == analysis_id:
+                state.analysis_id = None
+            if not done.cancelled() and done.exception() is None and done.result() == "completed":
+                state.analyzed_sha = head_sha
+
+        task.add_done_callback(settle)
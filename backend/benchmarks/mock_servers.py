@@ -0,0 +1,277 @@
+"""Local stand-ins for the GitHub REST API and OpenRouter used by the offline benchmarks."""
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import random
+import re
+import tarfile
+import threading
+import time
+from dataclasses import dataclass, field
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from app.services.file_utils import git_blob_sha
+
+SOURCE_DIRS = ["app/auth", "app/api", "app/db", "app/services", "app/utils", "web/src", "tests", "docs"]
+SOURCE_SNIPPETS = {
+    ".py": "def handler_{n}(request, user_id):\n    query = f\"SELECT * FROM users WHERE id = {{user_id}}\"\n    return db.execute(query)\n\n",
+    ".ts": "export async function load{n}(id: string) {{\n  const res = await fetch(`/api/items/${{id}}`);\n  return res.json();\n}}\n\n",
+    ".md": "## Section {n}\n\nSome documentation text describing the module in detail.\n\n",
+}
+LICENSE_HEADERS = {
+    ".py": "# Copyright (c) Synthetic Corp.\n# Licensed under the Apache License, Version 2.0.\n\n",
+    ".ts": "/*\n * Copyright (c) Synthetic Corp.\n * SPDX-License-Identifier: Apache-2.0\n */\n\n",
+    ".md": "",
+}
+
+
+@dataclass
+class SyntheticRepo:
+    """Deterministic repository of `files` source files of roughly `file_bytes` each."""
+
+    files: int = 100
+    file_bytes: int = 4_000
+    seed: int = 1
+    contents: dict[str, bytes] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        rng = random.Random(self.seed)
+        for index in range(self.files):
+            directory = SOURCE_DIRS[index % len(SOURCE_DIRS)]
+            suffix = ".md" if directory == "docs" else rng.choice([".py", ".ts"])
+            snippet = SOURCE_SNIPPETS[suffix]
+            body = [LICENSE_HEADERS[suffix]]
+            size = len(body[0])
+            # Number snippets per file so no two files are byte-identical.
+            n = index * 1000
+            while size < self.file_bytes:
+                block = snippet.format(n=n)
+                body.append(block)
+                size += len(block)
+                n += 1
+            self.contents[f"{directory}/module_{index}{suffix}"] = "".join(body).encode("utf-8")
+
+    def tarball(self) -> bytes:
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+            for path, data in self.contents.items():
+                info = tarfile.TarInfo(f"repo-main/{path}")
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+        return buffer.getvalue()
+
+
+@dataclass
+class FaultConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    malformed_rate: float = 0.0
+    seed: int = 1
+
+
+class _Faults:
+    def __init__(self, config: FaultConfig) -> None:
+        self.config = config
+        self.rng = random.Random(config.seed)
+
+    async def delay(self) -> None:
+        latency = self.config.latency_ms + self.rng.uniform(0, self.config.jitter_ms)
+        if latency > 0:
+            await asyncio.sleep(latency / 1000)
+
+    def roll(self, rate: float) -> bool:
+        return rate > 0 and self.rng.random() < rate
+
+
+def github_app(repo: SyntheticRepo, faults: FaultConfig | None = None) -> Starlette:
+    fault = _Faults(faults or FaultConfig())
+    headers = {"X-RateLimit-Remaining": "4999", "X-RateLimit-Limit": "5000"}
+
+    def conditional(request: Request, payload: object) -> Response:
+        # Like GitHub, answer a matching If-None-Match with an empty 304.
+        body = json.dumps(payload).encode("utf-8")
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={**headers, "ETag": etag})
+        return Response(body, media_type="application/json", headers={**headers, "ETag": etag})
+
+    async def repository(request: Request) -> Response:
+        await fault.delay()
+        return conditional(request, {"default_branch": "main"})
+
+    async def tree(request: Request) -> Response:
+        await fault.delay()
+        items = [
+            {"path": path, "type": "blob", "size": len(data), "sha": git_blob_sha(data)}
+            for path, data in repo.contents.items()
+        ]
+        return conditional(request, {"sha": "main", "tree": items, "truncated": False})
+
+    async def contents(request: Request) -> Response:
+        await fault.delay()
+        if fault.roll(fault.config.error_rate):
+            return JSONResponse({"message": "API rate limit exceeded"}, status_code=429, headers=headers)
+        data = repo.contents.get(request.path_params["path"])
+        if data is None:
+            return JSONResponse({"message": "Not Found"}, status_code=404, headers=headers)
+        payload = {"encoding": "base64", "content": base64.b64encode(data).decode("ascii"), "size": len(data)}
+        return conditional(request, payload)
+
+    async def graphql(request: Request) -> Response:
+        await fault.delay()
+        body = await request.json()
+        variables = body.get("variables", {})
+        objects = {}
+        for alias, variable in GRAPHQL_OBJECT.findall(body.get("query", "")):
+            data = repo.contents.get(variables[variable].split(":", 1)[1])
+            objects[alias] = None if data is None else {
+                "text": data.decode("utf-8"),
+                "byteSize": len(data),
+                "isBinary": False,
+                "isTruncated": False,
+            }
+        return JSONResponse({"data": {"repository": objects}}, headers=headers)
+
+    async def pull(request: Request) -> Response:
+        await fault.delay()
+        return conditional(request, {"number": request.path_params["number"], "head": {"sha": "main"}})
+
+    async def pull_files(request: Request) -> Response:
+        await fault.delay()
+        page = int(request.query_params.get("page", 1))
+        per_page = int(request.query_params.get("per_page", 30))
+        paths = list(repo.contents)[(page - 1) * per_page : page * per_page]
+        items = [
+            {"filename": p, "status": "modified", "changes": 10, "sha": git_blob_sha(repo.contents[p])}
+            for p in paths
+        ]
+        return conditional(request, items)
+
+    async def compare(request: Request) -> Response:
+        # Every tenth file changed between any two commits, enough to exercise incremental runs.
+        await fault.delay()
+        page = int(request.query_params.get("page", 1))
+        per_page = int(request.query_params.get("per_page", 30))
+        paths = list(repo.contents)[::10][(page - 1) * per_page : page * per_page]
+        files = [
+            {"filename": p, "status": "modified", "changes": 3, "sha": git_blob_sha(repo.contents[p])}
+            for p in paths
+        ]
+        return conditional(request, {"status": "ahead", "files": files})
+
+    async def tarball(request: Request) -> Response:
+        await fault.delay()
+        return Response(repo.tarball(), media_type="application/x-gzip", headers=headers)
+
+    return Starlette(
+        routes=[
+            Route("/repos/{owner}/{repo}", repository),
+            Route("/repos/{owner}/{repo}/git/trees/{ref:path}", tree),
+            Route("/repos/{owner}/{repo}/contents/{path:path}", contents),
+            Route("/repos/{owner}/{repo}/pulls/{number:int}", pull),
+            Route("/repos/{owner}/{repo}/pulls/{number:int}/files", pull_files),
+            Route("/repos/{owner}/{repo}/compare/{basehead:path}", compare),
+            Route("/repos/{owner}/{repo}/tarball/{ref:path}", tarball),
+            Route("/graphql", graphql, methods=["POST"]),
+        ]
+    )
+
+
+GRAPHQL_OBJECT = re.compile(r"(\w+): object\(expression: \$(\w+)\)")
+FILE_HEADER = re.compile(r"# File: (\S+)")
+
+
+def openrouter_app(faults: FaultConfig | None = None, structured_models: list[str] | None = None) -> Starlette:
+    """`structured_models` are advertised as supporting JSON-schema output and never reply malformed."""
+    fault = _Faults(faults or FaultConfig())
+
+    async def models(request: Request) -> Response:
+        return JSONResponse(
+            {
+                "data": [
+                    {"id": model, "supported_parameters": ["max_tokens", "response_format", "structured_outputs"]}
+                    for model in structured_models or []
+                ]
+            }
+        )
+
+    async def completions(request: Request) -> Response:
+        body = await request.json()
+        await fault.delay()
+        if fault.roll(fault.config.error_rate):
+            return JSONResponse({"error": {"message": "Rate limited"}}, status_code=429)
+
+        prompt = body["messages"][-1]["content"]
+        digest = int(hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:4], 16)
+        if fault.roll(fault.config.malformed_rate) and "response_format" not in body:
+            content = "Sure! Here is the review: {summary: oops"
+        elif "triag" in body["messages"][0]["content"].lower():
+            # Triage request: chunks that would produce no findings come back as low risk.
+            content = json.dumps({"risk": 0.8 if digest % 3 else 0.1, "confidence": 0.9, "quality_score": 50 + digest % 50})
+        else:
+            match = FILE_HEADER.search(prompt)
+            path = match.group(1) if match else "unknown"
+            issues = [
+                {
+                    "file_path": path,
+                    "line_start": 1 + i,
+                    "line_end": 2 + i,
+                    "severity": ["low", "medium", "high"][(digest + i) % 3],
+                    "category": ["security", "performance", "quality"][(digest + i) % 3],
+                    "message": "Synthetic finding",
+                    "recommendation": "Synthetic fix",
+                }
+                for i in range(digest % 3)
+            ]
+            content = json.dumps({"summary": f"Reviewed {path}", "quality_score": 50 + digest % 50, "issues": issues})
+        prompt_tokens = sum(len(m["content"]) for m in body["messages"]) // 4
+        return JSONResponse(
+            {
+                "model": body.get("model"),
+                "choices": [{"message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4},
+            }
+        )
+
+    return Starlette(
+        routes=[
+            Route("/chat/completions", completions, methods=["POST"]),
+            Route("/models", models),
+        ]
+    )
+
+
+class ServerThread:
+    """Runs an ASGI app with uvicorn on an ephemeral localhost port in a background thread."""
+
+    def __init__(self, app) -> None:
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        port = self.server.servers[0].sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    def __enter__(self) -> "ServerThread":
+        self.thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline or not self.thread.is_alive():
+                raise RuntimeError("mock server failed to start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
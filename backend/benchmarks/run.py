@@ -0,0 +1,334 @@
+"""Offline end-to-end benchmark for AnalysisAgent.run.
+
+Usage (from backend/):
+    python -m benchmarks.run --files 200 --llm-latency-ms 50 --llm-error-rate 0.05
+    python -m benchmarks.run --files 200 --compare benchmarks/results/bench-20260101-120000.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.models import Analysis, Base, Issue
+from app.services import github_service
+from app.services.analysis_agent import REPAIR_PROMPT, SYSTEM_PROMPT, TRIAGE_PROMPT, AnalysisAgent, AnalysisInput
+from app.services.http_cache import HTTPCache
+from app.services.repo_cache import RepoMirrorCache
+from benchmarks.mock_servers import FaultConfig, ServerThread, SyntheticRepo, github_app, openrouter_app
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+GITHUB_METADATA_CALLS = [
+    "_fetch_default_branch", "_fetch_repo_tree_files", "_fetch_pr_files", "_fetch_pr_head",
+    "_size_listed_files", "_fetch_ignore_rules",
+]
+COMPARED_METRICS = ["wall_time_s", "chunks_per_s", "peak_rss_mb"]
+
+
+@dataclass
+class BenchmarkConfig:
+    files: int = 100
+    file_bytes: int = 4_000
+    mode: str = "api"
+    content_strategy: str = "auto"
+    cascade: bool = False
+    structured_output: str = "auto"
+    pr_number: int | None = None
+    concurrency: int = 4
+    llm_latency_ms: float = 20.0
+    llm_jitter_ms: float = 10.0
+    llm_error_rate: float = 0.0
+    llm_malformed_rate: float = 0.0
+    github_latency_ms: float = 0.0
+    seed: int = 1
+
+
+class StageRecorder:
+    def __init__(self) -> None:
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.transitions: list[tuple[str, float]] = []
+
+    def wrap(self, name: str, fn):
+        @functools.wraps(fn)
+        async def _timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                self.samples[name].append((time.perf_counter() - start) * 1000)
+
+        return _timed
+
+    def wrap_sync(self, name: str, fn):
+        @functools.wraps(fn)
+        def _timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.samples[name].append((time.perf_counter() - start) * 1000)
+
+        return _timed
+
+    def instrument(self, agent: AnalysisAgent) -> None:
+        for name in GITHUB_METADATA_CALLS:
+            setattr(agent.github, name, self.wrap("github_metadata", getattr(agent.github, name)))
+        agent.github._fetch_file_content = self.wrap("github_content", agent.github._fetch_file_content)
+        agent.github._query_blobs = self.wrap("github_graphql", agent.github._query_blobs)
+        stages = {
+            prompt: self.wrap(name, agent.openrouter.complete)
+            for prompt, name in [(SYSTEM_PROMPT, "llm_call"), (TRIAGE_PROMPT, "llm_triage"), (REPAIR_PROMPT, "llm_repair")]
+        }
+
+        async def complete(system_prompt, user_prompt, *args, **kwargs):
+            return await stages[system_prompt](system_prompt, user_prompt, *args, **kwargs)
+
+        agent.openrouter.complete = complete
+        agent._parse_response = self.wrap_sync("parse", agent._parse_response)
+
+        update_status = agent._update_status
+
+        async def _update_status(session, analysis_id, status, progress, message):
+            if not self.transitions or self.transitions[-1][0] != status:
+                self.transitions.append((status, time.perf_counter()))
+            await update_status(session, analysis_id, status, progress, message)
+
+        agent._update_status = self.wrap("db_update", _update_status)
+
+    def stage_durations(self, finished_at: float) -> dict[str, float]:
+        durations: dict[str, float] = {}
+        marks = self.transitions + [("done", finished_at)]
+        for (status, start), (_, end) in zip(marks, marks[1:]):
+            durations[status] = round(durations.get(status, 0.0) + (end - start) * 1000, 2)
+        return durations
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        return {
+            name: {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 50), 2),
+                "p95_ms": round(percentile(values, 95), 2),
+                "p99_ms": round(percentile(values, 99), 2),
+                "total_ms": round(sum(values), 2),
+            }
+            for name, values in sorted(self.samples.items())
+        }
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+@contextlib.contextmanager
+def patched(target, **values):
+    previous = {name: getattr(target, name) for name in values}
+    for name, value in values.items():
+        setattr(target, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(target, name, value)
+
+
+def build_bare_repo(repo: SyntheticRepo, root: Path) -> str:
+    work = root / "origin-work"
+    for path, data in repo.contents.items():
+        target = work / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+    env = {
+        **os.environ,
+        "GIT_AUTHOR_NAME": "bench", "GIT_AUTHOR_EMAIL": "bench@example.com",
+        "GIT_COMMITTER_NAME": "bench", "GIT_COMMITTER_EMAIL": "bench@example.com",
+    }
+    for args in (["init", "-q", "-b", "main"], ["add", "."], ["commit", "-q", "-m", "synthetic"]):
+        subprocess.run(["git", *args], cwd=work, env=env, check=True, capture_output=True)
+    bare = root / "origin.git"
+    subprocess.run(["git", "clone", "-q", "--bare", str(work), str(bare)], check=True, capture_output=True)
+    return bare.as_uri()
+
+
+async def run_benchmark(config: BenchmarkConfig) -> dict:
+    repo = SyntheticRepo(files=config.files, file_bytes=config.file_bytes, seed=config.seed)
+    github_faults = FaultConfig(latency_ms=config.github_latency_ms, seed=config.seed)
+    llm_faults = FaultConfig(
+        latency_ms=config.llm_latency_ms,
+        jitter_ms=config.llm_jitter_ms,
+        error_rate=config.llm_error_rate,
+        malformed_rate=config.llm_malformed_rate,
+        seed=config.seed,
+    )
+    with contextlib.ExitStack() as stack:
+        tmp = Path(stack.enter_context(TemporaryDirectory(prefix="acra-bench-")))
+        github = stack.enter_context(ServerThread(github_app(repo, github_faults)))
+        models = [settings.openrouter_model, settings.triage_model]
+        openrouter = stack.enter_context(ServerThread(openrouter_app(llm_faults, models)))
+        stack.enter_context(
+            patched(
+                settings,
+                github_api_base=github.url,
+                openrouter_api_base=openrouter.url,
+                openrouter_api_key=settings.openrouter_api_key or "bench-key",
+                max_concurrent_chunks=config.concurrency,
+                github_content_strategy=config.content_strategy,
+                cascade_enabled=config.cascade,
+                structured_output=config.structured_output,
+                max_files=max(settings.max_files, config.files),
+            )
+        )
+        repo_url = "https://github.com/bench/synthetic"
+        if config.mode == "git":
+            repo_url = build_bare_repo(repo, tmp)
+            stack.enter_context(patched(github_service, repo_cache=RepoMirrorCache(tmp / "mirrors", 10**12)))
+
+        engine = create_async_engine(f"sqlite+aiosqlite:///{(tmp / 'bench.db').as_posix()}")
+        sessions = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        try:
+            agent = AnalysisAgent()
+            # Keep conditional-request state per run so results do not depend on earlier runs.
+            agent.github.http_cache = HTTPCache(tmp / "http", settings.github_cache_max_body_bytes)
+            recorder = StageRecorder()
+            recorder.instrument(agent)
+            payload = AnalysisInput(
+                repo_url=repo_url,
+                pr_number=config.pr_number,
+                github_token=None,
+                allow_git_clone=config.mode == "git",
+            )
+            async with sessions() as session:
+                analysis = Analysis(repo_url=repo_url, pr_number=config.pr_number, status="queued", progress=0)
+                session.add(analysis)
+                await session.commit()
+
+                started = time.perf_counter()
+                await agent.run(analysis.id, session, payload)
+                finished = time.perf_counter()
+
+            async with sessions() as session:
+                stored = await session.get(Analysis, analysis.id)
+                status = stored.status
+                github_cache = (stored.extra_metadata or {}).get("github_cache")
+                parse_outcomes = (stored.extra_metadata or {}).get("parse")
+                issue_count = await session.scalar(select(func.count(Issue.id)).where(Issue.analysis_id == analysis.id))
+        finally:
+            await engine.dispose()
+
+    wall = finished - started
+    chunks = sum((parse_outcomes or {}).values())
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": asdict(config),
+        "status": status,
+        "issues": issue_count,
+        "chunks": chunks,
+        "github_cache": github_cache,
+        "parse": parse_outcomes,
+        "wall_time_s": round(wall, 3),
+        "chunks_per_s": round(chunks / wall, 2) if wall else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages_ms": recorder.stage_durations(finished),
+        "latency": recorder.summary(),
+    }
+
+
+def compare(current: dict, baseline: dict) -> list[str]:
+    lines = []
+    for metric in COMPARED_METRICS:
+        new, old = current.get(metric), baseline.get(metric)
+        if new is None or not old:
+            continue
+        lines.append(f"{metric}: {old} -> {new} ({(new - old) / old * 100:+.1f}%)")
+    for name, stats in current.get("latency", {}).items():
+        old = baseline.get("latency", {}).get(name, {}).get("p95_ms")
+        if old:
+            lines.append(f"{name}.p95_ms: {old} -> {stats['p95_ms']} ({(stats['p95_ms'] - old) / old * 100:+.1f}%)")
+    return lines
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmark for the analyze pipeline")
+    defaults = BenchmarkConfig()
+    parser.add_argument("--files", type=int, default=defaults.files)
+    parser.add_argument("--file-bytes", type=int, default=defaults.file_bytes)
+    parser.add_argument("--mode", choices=["api", "git"], default=defaults.mode)
+    parser.add_argument("--content-strategy", choices=["auto", "rest", "graphql"], default=defaults.content_strategy)
+    parser.add_argument("--cascade", action="store_true", help="triage chunks with the small model first")
+    parser.add_argument("--structured-output", choices=["auto", "on", "off"], default=defaults.structured_output)
+    parser.add_argument("--pr-number", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=defaults.concurrency)
+    parser.add_argument("--llm-latency-ms", type=float, default=defaults.llm_latency_ms)
+    parser.add_argument("--llm-jitter-ms", type=float, default=defaults.llm_jitter_ms)
+    parser.add_argument("--llm-error-rate", type=float, default=defaults.llm_error_rate)
+    parser.add_argument("--llm-malformed-rate", type=float, default=defaults.llm_malformed_rate)
+    parser.add_argument("--github-latency-ms", type=float, default=defaults.github_latency_ms)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--output", type=Path, default=RESULTS_DIR, help="directory for result JSON files")
+    parser.add_argument("--compare", type=Path, default=None, help="previous result JSON to compare against")
+    args = parser.parse_args(argv)
+
+    config = BenchmarkConfig(
+        files=args.files,
+        file_bytes=args.file_bytes,
+        mode=args.mode,
+        content_strategy=args.content_strategy,
+        cascade=args.cascade,
+        structured_output=args.structured_output,
+        pr_number=args.pr_number,
+        concurrency=args.concurrency,
+        llm_latency_ms=args.llm_latency_ms,
+        llm_jitter_ms=args.llm_jitter_ms,
+        llm_error_rate=args.llm_error_rate,
+        llm_malformed_rate=args.llm_malformed_rate,
+        github_latency_ms=args.github_latency_ms,
+        seed=args.seed,
+    )
+    result = asyncio.run(run_benchmark(config))
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    target = args.output / f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+    target.write_text(json.dumps(result, indent=2))
+    print(json.dumps(result, indent=2))
+    print(f"saved {target}")
+    if args.compare:
+        for line in compare(result, json.loads(args.compare.read_text())):
+            print(line)
+    return 0 if result["status"] == "completed" else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,73 @@
+"""Local stand-in for GitHub's webhook sender: posts signed pull_request events to ACRA.
+
+Simulates a developer pushing several commits in a row, to exercise debouncing and supersession.
+
+Usage (from backend/, with ACRA_WEBHOOK_SECRET set for both the server and this script):
+    python -m benchmarks.webhook_sender --repo https://github.com/acme/api --pr 7 --pushes 5 --interval-ms 500
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import secrets
+import sys
+import time
+
+import httpx
+
+from app.services.webhooks import sign
+
+
+def pull_request_event(repo_url: str, pr_number: int, action: str, head_sha: str) -> dict:
+    return {
+        "action": action,
+        "number": pr_number,
+        "pull_request": {"number": pr_number, "head": {"sha": head_sha}},
+        "repository": {"html_url": repo_url},
+    }
+
+
+def send(client: httpx.Client, url: str, secret: str, event: str, payload: dict) -> httpx.Response:
+    body = json.dumps(payload).encode("utf-8")
+    headers = {
+        "Content-Type": "application/json",
+        "X-GitHub-Event": event,
+        "X-GitHub-Delivery": secrets.token_hex(16),
+        "X-Hub-Signature-256": sign(secret, body),
+    }
+    return client.post(url, content=body, headers=headers)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Send signed pull_request webhooks to a local ACRA")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/api/v1/webhooks/github")
+    parser.add_argument("--secret", default=os.environ.get("ACRA_WEBHOOK_SECRET", ""))
+    parser.add_argument("--repo", required=True, help="repository URL, e.g. https://github.com/acme/api")
+    parser.add_argument("--pr", type=int, required=True)
+    parser.add_argument("--pushes", type=int, default=3, help="head commits to send after `opened`")
+    parser.add_argument("--interval-ms", type=float, default=500)
+    parser.add_argument("--close", action="store_true", help="finish with a `closed` event")
+    args = parser.parse_args(argv)
+    if not args.secret:
+        parser.error("--secret or ACRA_WEBHOOK_SECRET is required")
+
+    events = [("opened", secrets.token_hex(20))]
+    events += [("synchronize", secrets.token_hex(20)) for _ in range(args.pushes)]
+    if args.close:
+        events.append(("closed", events[-1][1]))
+
+    with httpx.Client(timeout=10) as client:
+        for index, (action, head_sha) in enumerate(events):
+            if index:
+                time.sleep(args.interval_ms / 1000)
+            payload = pull_request_event(args.repo, args.pr, action, head_sha)
+            resp = send(client, args.url, args.secret, "pull_request", payload)
+            print(f"{action:<12} {head_sha[:12]}  HTTP {resp.status_code}  {resp.text}")
+            if resp.status_code >= 400:
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
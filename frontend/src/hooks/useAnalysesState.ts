@@ -48,7 +48,7 @@ export function useAnalysesState() {
         ...prev,
         [analysisId]: { status: data.status, progress: data.progress, message: data.message }
       }));
-      if (data.status === "completed" || data.status === "failed") {
+      if (["completed", "failed", "cancelled"].includes(data.status)) {
         es.close();
         setRunning((curr) => (curr?.analysisId === analysisId ? null : curr));
         loadAnalyses();
@@ -1,11 +1,62 @@
+import asyncio
 import os
 import sys
+import tempfile
 from pathlib import Path
 
+import pytest
+
 ROOT = Path(__file__).resolve().parents[1]
 BACKEND_DIR = ROOT / "backend"
+TEST_DIR = Path(tempfile.mkdtemp(prefix="acra-tests-"))
 
 if str(BACKEND_DIR) not in sys.path:
     sys.path.insert(0, str(BACKEND_DIR))
 
 os.environ.setdefault("ACRA_OPENROUTER_API_KEY", "test-key")
+os.environ.setdefault("ACRA_DATABASE_URL", f"sqlite+aiosqlite:///{(TEST_DIR / 'acra.db').as_posix()}")
+os.environ.setdefault("ACRA_REPO_CACHE_DIR", str(TEST_DIR / "repos"))
+os.environ.setdefault("ACRA_GITHUB_CACHE_DIR", str(TEST_DIR / "github"))
+os.environ.setdefault("ACRA_STRUCTURED_OUTPUT", "off")
+
+
+@pytest.fixture
+def db_sessions():
+    """Fresh schema in the test database; returns the app's session factory."""
+    from app.db import AsyncSessionLocal, engine
+    from app.models import Base
+    from app.services.response_cache import analysis_cache
+
+    # Ids restart with the fresh schema, so bodies cached by an earlier test must not leak into this one.
+    analysis_cache.clear()
+
+    async def reset() -> None:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        await engine.dispose()
+
+    asyncio.run(reset())
+    return AsyncSessionLocal
+
+
+@pytest.fixture
+def create_analysis(db_sessions):
+    """Factory inserting an analysis of https://github.com/acme/api with optional issues; returns its id."""
+    from app.models import Analysis, Issue
+
+    def create(status: str = "completed", issues: list[dict] | None = None, **fields) -> int:
+        fields.setdefault("progress", 100 if status == "completed" else 0)
+
+        async def insert() -> int:
+            async with db_sessions() as session:
+                analysis = Analysis(repo_url="https://github.com/acme/api", status=status, **fields)
+                session.add(analysis)
+                await session.flush()
+                session.add_all(Issue(analysis_id=analysis.id, **issue) for issue in issues or [])
+                await session.commit()
+                return analysis.id
+
+        return asyncio.run(insert())
+
+    return create
@@ -0,0 +1,167 @@
+import asyncio
+from collections import Counter
+
+from app.core.config import settings
+from app.services.analysis_agent import REPAIR_PROMPT, SYSTEM_PROMPT, AnalysisAgent, Chunk
+from app.services.file_utils import FileItem
+from app.services.openrouter_service import Completion, OpenRouterService
+from app.services.tracing import Trace
+
+
+async def _collect(agent, files, counts):
+    return [chunk async for chunk in agent._build_chunks(files, counts)]
+
+
+def test_build_chunks_reads_files_lazily_and_settles_total(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "chunk_char_limit", 10)
+    source = tmp_path / "app.py"
+    source.write_text("a" * 25)
+    files = [FileItem(path="app.py", size=25, source=source)]
+    counts = {"total": 99}
+
+    chunks = asyncio.run(_collect(AnalysisAgent(), files, counts))
+
+    assert len(chunks) == 3
+    assert chunks[0].prompt.startswith("\n\n# File: app.py (part 1/3)\n")
+    assert counts["total"] == 3
+
+
+def test_cascade_escalates_only_flagged_chunks(monkeypatch):
+    monkeypatch.setattr(settings, "cascade_enabled", True)
+    monkeypatch.setattr(settings, "triage_escalate_risk", 0.5)
+    monkeypatch.setattr(settings, "triage_min_confidence", 0.6)
+    verdicts = {
+        "safe.py": '{"risk": 0.1, "confidence": 0.9, "quality_score": 90}',
+        "risky.py": '{"risk": 0.9, "confidence": 0.9, "quality_score": 40}',
+        "unsure.py": '{"risk": 0.1, "confidence": 0.2, "quality_score": 80}',
+        "garbled.py": "not json",
+    }
+    calls = []
+
+    async def fake_complete(system_prompt, user_prompt, model=None, **kwargs):
+        path = user_prompt.split("# File: ", 1)[1].split(" ", 1)[0]
+        calls.append((path, model))
+        if model:
+            return Completion(content=verdicts[path], model=model, prompt_tokens=5)
+        return Completion(content='{"summary": "full", "quality_score": 30, "issues": []}', model="big", prompt_tokens=50)
+
+    agent = AnalysisAgent()
+    monkeypatch.setattr(agent.openrouter, "complete", fake_complete)
+    trace = Trace()
+
+    async def review(path):
+        with trace.span("chunk") as span:
+            parsed = await agent._review_chunk(Chunk(path=path, part=1, parts=1, text="x"), span, trace)
+        return parsed, span
+
+    results = {path: asyncio.run(review(path)) for path in verdicts}
+
+    assert results["safe.py"][0].quality_score == 90
+    assert results["safe.py"][1]["tier"] == "triage"
+    assert results["safe.py"][1]["prompt_tokens"] == 5
+    for path in ("risky.py", "unsure.py", "garbled.py"):
+        assert results[path][0].summary == "full"
+        assert results[path][1]["tier"] == "full"
+        assert results[path][1]["prompt_tokens"] == 55
+    assert [path for path, model in calls if model is None] == ["risky.py", "unsure.py", "garbled.py"]
+
+
+def test_unparseable_review_is_repaired_then_retried(monkeypatch):
+    replies = {
+        SYSTEM_PROMPT: ["Sure! {summary: oops", '{"summary": "second try", "quality_score": 70, "issues": []}'],
+        REPAIR_PROMPT: ["still not json"],
+    }
+    calls = []
+
+    async def fake_complete(system_prompt, user_prompt, model=None, **kwargs):
+        calls.append((system_prompt, model, kwargs))
+        return Completion(content=replies[system_prompt].pop(0), model=model or "big", prompt_tokens=1)
+
+    agent = AnalysisAgent()
+    monkeypatch.setattr(agent.openrouter, "complete", fake_complete)
+    usage = Counter()
+    chunk = Chunk(path="app.py", part=1, parts=1, text="x = 1\n")
+
+    async def scenario():
+        completion = await agent._complete_review(chunk)
+        return await agent._recover_chunk(chunk, completion, usage)
+
+    parsed, outcome = asyncio.run(scenario())
+
+    assert outcome == "retried"
+    assert parsed.summary == "second try"
+    assert [(system, model) for system, model, _ in calls] == [
+        (SYSTEM_PROMPT, None),
+        (REPAIR_PROMPT, settings.triage_model),
+        (SYSTEM_PROMPT, None),
+    ]
+    assert calls[0][2]["max_tokens"] <= settings.llm_max_output_tokens
+    assert usage["prompt_tokens"] == 2
+
+
+def test_truncated_review_is_retried_with_the_full_budget(monkeypatch):
+    monkeypatch.setattr(settings, "llm_max_output_tokens", 8_192)
+    replies = [
+        Completion(content="", model="big", finish_reason="length"),
+        Completion(content='{"summary": "ok", "quality_score": 80, "issues": []}', model="big", finish_reason="stop"),
+    ]
+    budgets = []
+
+    async def fake_complete(system_prompt, user_prompt, model=None, **kwargs):
+        assert system_prompt == SYSTEM_PROMPT
+        budgets.append(kwargs["max_tokens"])
+        return replies.pop(0)
+
+    agent = AnalysisAgent()
+    monkeypatch.setattr(agent.openrouter, "complete", fake_complete)
+    chunk = Chunk(path="app.py", part=1, parts=1, text="x = 1\n")
+
+    async def scenario():
+        completion = await agent._complete_review(chunk)
+        return await agent._recover_chunk(chunk, completion, Counter())
+
+    parsed, outcome = asyncio.run(scenario())
+
+    assert outcome == "retried"
+    assert parsed.summary == "ok"
+    # No repair of the empty, cut-off reply; the re-ask gets the whole output budget.
+    assert budgets[0] < budgets[1] == 8_192
+
+
+def test_structured_output_follows_model_capabilities(monkeypatch):
+    service = OpenRouterService()
+    fetches = []
+
+    async def fake_fetch():
+        fetches.append(1)
+        return {"big/model": {"structured_outputs", "response_format"}, "small/model": {"max_tokens"}}
+
+    monkeypatch.setattr(settings, "structured_output", "auto")
+    monkeypatch.setattr(service, "_fetch_supported_parameters", fake_fetch)
+
+    async def scenario():
+        return [await service.supports_structured_output(model) for model in ("big/model", "small/model", "x/y")]
+
+    assert asyncio.run(scenario()) == [True, False, False]
+    assert len(fetches) == 1
+
+
+def test_failed_model_lookup_is_retried_after_backoff(monkeypatch):
+    service = OpenRouterService()
+    replies = [None, {"big/model": {"structured_outputs"}}]
+
+    async def flaky_fetch():
+        return replies.pop(0)
+
+    monkeypatch.setattr(settings, "structured_output", "auto")
+    monkeypatch.setattr(service, "_fetch_supported_parameters", flaky_fetch)
+
+    async def scenario():
+        first = await service.supports_structured_output("big/model")
+        # Still inside the backoff: no second lookup yet.
+        during = await service.supports_structured_output("big/model")
+        service._models_retry_at = 0.0  # the backoff has elapsed
+        return first, during, await service.supports_structured_output("big/model")
+
+    assert asyncio.run(scenario()) == (False, False, True)
+    assert replies == []
@@ -0,0 +1,28 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.tracing import Trace
+
+
+def test_timings_endpoint_returns_waterfall(create_analysis):
+    trace = Trace()
+    with trace.span("fetch", files=1):
+        pass
+    with trace.span("chunk", file="a.py", bytes=10, prompt_tokens=5, retries=0):
+        pass
+    analysis_id = create_analysis(timings=trace.to_dict())
+
+    client = TestClient(app)
+    response = client.get(f"/api/v1/analyses/{analysis_id}/timings")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["analysis_id"] == analysis_id
+    assert body["stages"][0]["name"] == "fetch"
+    assert body["spans"][0]["attrs"]["file"] == "a.py"
+    assert body["totals"]["chunks"] == 1
+
+
+def test_timings_endpoint_404_for_unknown_analysis(db_sessions):
+    client = TestClient(app)
+    assert client.get("/api/v1/analyses/999/timings").status_code == 404
@@ -0,0 +1,21 @@
+import asyncio
+
+from benchmarks.run import BenchmarkConfig, compare, percentile, run_benchmark
+
+
+def test_percentile_interpolates():
+    assert percentile([], 95) == 0.0
+    assert percentile([10.0, 20.0, 30.0, 40.0], 50) == 25.0
+    assert percentile([10.0, 20.0, 30.0, 40.0], 100) == 40.0
+
+
+def test_run_benchmark_against_mock_servers():
+    config = BenchmarkConfig(files=6, file_bytes=500, concurrency=2, llm_latency_ms=0, llm_jitter_ms=0)
+
+    result = asyncio.run(run_benchmark(config))
+
+    assert result["status"] == "completed"
+    assert result["chunks"] == 6
+    assert result["latency"]["llm_call"]["count"] == 6
+    assert {"fetching", "analyzing", "persisting"} <= set(result["stages_ms"])
+    assert compare(result, result)[0].startswith("wall_time_s")
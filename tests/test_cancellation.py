@@ -0,0 +1,105 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.models import Analysis
+from app.services.analysis_agent import AnalysisAgent, AnalysisInput
+from app.services.file_utils import FileItem
+from app.services.task_registry import analysis_tasks
+
+
+class HangingLLM:
+    """Never answers; records how many requests started and how many were aborted."""
+
+    def __init__(self):
+        self.started = 0
+        self.aborted = 0
+
+    async def complete(self, system_prompt, user_prompt, model=None, **kwargs):
+        self.started += 1
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            self.aborted += 1
+            raise
+
+
+def _agent_with_files(tmp_path, monkeypatch, count):
+    files = []
+    for index in range(count):
+        source = tmp_path / f"mod{index}.py"
+        source.write_text(f"value = {index}\n")
+        files.append(FileItem(path=source.name, size=source.stat().st_size, source=source, sha=str(index)))
+
+    async def fake_fetch(payload, workspace, plans):
+        return files
+
+    agent = AnalysisAgent()
+    llm = HangingLLM()
+    monkeypatch.setattr(agent, "_fetch_files", fake_fetch)
+    monkeypatch.setattr(agent.openrouter, "complete", llm.complete)
+    return agent, llm
+
+
+def _load(sessions, analysis_id) -> Analysis:
+    async def load() -> Analysis:
+        async with sessions() as session:
+            return await session.get(Analysis, analysis_id)
+
+    return asyncio.run(load())
+
+
+PAYLOAD = AnalysisInput(repo_url="https://github.com/acme/api", pr_number=None, github_token=None, allow_git_clone=False)
+
+
+def test_cancel_aborts_in_flight_chunk_requests(db_sessions, create_analysis, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "max_concurrent_chunks", 2)
+    agent, llm = _agent_with_files(tmp_path, monkeypatch, count=5)
+    analysis_id = create_analysis("queued")
+
+    async def scenario():
+        async def runner():
+            async with db_sessions() as session:
+                await agent.run(analysis_id, session, PAYLOAD)
+
+        task = analysis_tasks.start(analysis_id, runner())
+        while llm.started < 2:
+            await asyncio.sleep(0.01)
+        cancelled = await analysis_tasks.cancel(analysis_id, "Cancelled by request", wait_s=2)
+        return cancelled, task
+
+    cancelled, task = asyncio.run(scenario())
+
+    assert cancelled and task.cancelled()
+    assert not analysis_tasks.is_running(analysis_id)
+    assert (llm.started, llm.aborted) == (2, 2)
+    analysis = _load(db_sessions, analysis_id)
+    assert analysis.status == "cancelled"
+    assert analysis.extra_metadata["cancelled_reason"] == "Cancelled by request"
+
+
+def test_deadline_cancels_the_run_without_raising(db_sessions, create_analysis, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "analysis_deadline_s", 0.05)
+    agent, llm = _agent_with_files(tmp_path, monkeypatch, count=1)
+    analysis_id = create_analysis("queued")
+
+    async def scenario():
+        async with db_sessions() as session:
+            await agent.run(analysis_id, session, PAYLOAD)
+
+    asyncio.run(scenario())
+
+    assert llm.aborted == 1
+    analysis = _load(db_sessions, analysis_id)
+    assert analysis.status == "cancelled"
+    assert "Deadline" in analysis.extra_metadata["cancelled_reason"]
+
+
+def test_cancel_endpoint_rejects_runs_that_are_not_active(create_analysis):
+    analysis_id = create_analysis("queued")
+    client = TestClient(app)
+
+    assert client.post(f"/api/v1/analyses/{analysis_id}/cancel").status_code == 409
+    assert client.post("/api/v1/analyses/999/cancel").status_code == 404
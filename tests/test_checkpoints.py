@@ -0,0 +1,145 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.main import app
+from app.models import Analysis, ChunkResult, Issue
+from app.services.analysis_agent import AnalysisAgent, AnalysisInput
+from app.services.file_utils import FileItem
+from app.services.openrouter_service import Completion
+from app.services.task_registry import analysis_tasks
+
+PAYLOAD = AnalysisInput(repo_url="https://github.com/acme/api", pr_number=None, github_token=None, allow_git_clone=False)
+
+
+def _reply(path):
+    issue = {"file_path": path, "line_start": 1, "severity": "high", "category": "security", "message": path}
+    return Completion(content=json.dumps({"summary": path, "quality_score": 70, "issues": [issue]}), model="m")
+
+
+def _agent(files, complete):
+    async def fake_fetch(payload, workspace, plans):
+        return files
+
+    agent = AnalysisAgent()
+    agent._fetch_files = fake_fetch
+    agent.openrouter.complete = complete
+    return agent
+
+
+def test_interrupted_analysis_resumes_from_checkpoints(db_sessions, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "max_concurrent_chunks", 1)
+    files = []
+    for name in ("a.py", "b.py", "c.py"):
+        source = tmp_path / name
+        source.write_text(f"import os  # {name}\n")
+        files.append(FileItem(path=name, size=source.stat().st_size, source=source, sha=name))
+
+    async def scenario():
+        async with db_sessions() as session:
+            analysis = Analysis(repo_url=PAYLOAD.repo_url, status="queued", progress=0)
+            session.add(analysis)
+            await session.commit()
+        analysis_id = analysis.id
+
+        first_calls = []
+
+        async def dies_on_third_chunk(system_prompt, user_prompt, model=None, **kwargs):
+            path = user_prompt.split("# File: ", 1)[1].split(" ", 1)[0]
+            first_calls.append(path)
+            if len(first_calls) == 3:
+                await asyncio.Event().wait()
+            return _reply(path)
+
+        async def first_run():
+            async with db_sessions() as session:
+                await _agent(files, dies_on_third_chunk).run(analysis_id, session, PAYLOAD)
+
+        async def checkpoints():
+            async with db_sessions() as session:
+                return await session.scalar(select(func.count()).select_from(ChunkResult))
+
+        analysis_tasks.start(analysis_id, first_run())
+        while len(first_calls) < 3 or await checkpoints() < 2:
+            await asyncio.sleep(0.01)
+        await analysis_tasks.cancel(analysis_id, "Worker restarted", wait_s=2)
+        checkpointed = await checkpoints()
+
+        resumed_calls = []
+
+        async def answers(system_prompt, user_prompt, model=None, **kwargs):
+            path = user_prompt.split("# File: ", 1)[1].split(" ", 1)[0]
+            resumed_calls.append(path)
+            return _reply(path)
+
+        async with db_sessions() as session:
+            await _agent(files, answers).run(analysis_id, session, PAYLOAD)
+
+        async with db_sessions() as session:
+            analysis = await session.get(Analysis, analysis_id)
+            issues = (await session.execute(select(Issue.message))).scalars().all()
+            remaining = await session.scalar(select(func.count()).select_from(ChunkResult))
+        return checkpointed, resumed_calls, analysis, sorted(issues), remaining
+
+    checkpointed, resumed_calls, analysis, issues, remaining = asyncio.run(scenario())
+
+    assert checkpointed == 2
+    assert resumed_calls == ["c.py"]
+    assert analysis.status == "completed"
+    assert analysis.extra_metadata["parse"] == {"resumed": 2, "ok": 1}
+    assert issues == ["a.py", "b.py", "c.py"]
+    assert remaining == 0
+
+
+def test_parse_error_checkpoints_are_retried_on_resume(db_sessions, tmp_path):
+    files = []
+    for name in ("a.py", "b.py"):
+        source = tmp_path / name
+        source.write_text(f"import os  # {name}\n")
+        files.append(FileItem(path=name, size=source.stat().st_size, source=source, sha=name))
+
+    async def scenario():
+        agent = _agent(files, None)
+        chunks = [chunk async for chunk in agent._build_chunks(files, {"total": 0})]
+        async with db_sessions() as session:
+            analysis = Analysis(repo_url=PAYLOAD.repo_url, status="queued", progress=0)
+            session.add(analysis)
+            await session.flush()
+            session.add_all([
+                ChunkResult(analysis_id=analysis.id, fingerprint=chunks[0].fingerprint, file_path="a.py",
+                            outcome="ok", summary="a.py", quality_score=70, issues=[]),
+                ChunkResult(analysis_id=analysis.id, fingerprint=chunks[1].fingerprint, file_path="b.py",
+                            outcome="parse_error"),
+            ])
+            await session.commit()
+            analysis_id = analysis.id
+
+        calls = []
+
+        async def answers(system_prompt, user_prompt, model=None, **kwargs):
+            path = user_prompt.split("# File: ", 1)[1].split(" ", 1)[0]
+            calls.append(path)
+            return _reply(path)
+
+        agent.openrouter.complete = answers
+        async with db_sessions() as session:
+            await agent.run(analysis_id, session, PAYLOAD)
+            analysis = await session.get(Analysis, analysis_id)
+        return calls, analysis
+
+    calls, analysis = asyncio.run(scenario())
+
+    assert calls == ["b.py"]
+    assert analysis.status == "completed"
+    assert analysis.extra_metadata["parse"] == {"resumed": 1, "ok": 1}
+
+
+def test_resume_endpoint_refuses_completed_analyses(create_analysis):
+    analysis_id = create_analysis()
+    client = TestClient(app)
+
+    assert client.post(f"/api/v1/analyses/{analysis_id}/resume").status_code == 409
+    assert client.post("/api/v1/analyses/999/resume").status_code == 404
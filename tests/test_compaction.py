@@ -0,0 +1,80 @@
+from app.services.compaction import compact_source, group_duplicates
+from app.services.analysis_agent import Chunk
+from app.services.file_utils import FileItem
+
+PYTHON_SOURCE = """#!/usr/bin/env python
+# Copyright (c) Example Corp.
+# Licensed under the Apache License, Version 2.0.
+
+import os
+
+
+
+def load():   
+    # one
+    # two
+    # three
+    # four
+    # five
+    # the api_key below is only for local use
+    # six
+    return os.environ["TOKEN"]
+"""
+
+
+def test_compact_source_strips_boilerplate_and_maps_lines():
+    compacted = compact_source("app/config.py", PYTHON_SOURCE)
+
+    lines = compacted.text.split("\n")
+    assert lines[0] == "#!/usr/bin/env python"
+    assert "Copyright" not in compacted.text
+    assert "    # five" not in lines and "    # six" not in lines
+    assert "    # the api_key below is only for local use" in lines
+    assert "def load():" in lines
+    original = PYTHON_SOURCE.split("\n")
+    for index, line in enumerate(lines):
+        assert original[compacted.line_map[index] - 1].rstrip() == line
+
+
+def test_c_preprocessor_lines_are_not_mistaken_for_a_header():
+    source = "// Copyright (c) Example Corp.\n#include <stdio.h>\n#define SIZE 4\n"
+
+    compacted = compact_source("main.c", source)
+
+    assert compacted.text == "#include <stdio.h>\n#define SIZE 4"
+
+
+def test_chunk_maps_relative_lines_back_to_original_file():
+    compacted = compact_source("app/config.py", PYTHON_SOURCE)
+    chunk = Chunk(path="app/config.py", part=2, parts=2, text="", first_line=3, line_map=compacted.line_map)
+
+    # Line 1 of this chunk is the third compacted line, `import os`, which is line 5 of the file.
+    assert chunk.original_line(1) == 5
+    assert chunk.original_line(None) is None
+
+
+def test_group_duplicates_keeps_first_path():
+    files = [FileItem("a/x.json", sha="1"), FileItem("b/y.py", sha="2"), FileItem("vendor/x.json", sha="1")]
+
+    groups = group_duplicates(files)
+
+    assert [(group.file.path, group.duplicates) for group in groups] == [
+        ("a/x.json", ["vendor/x.json"]),
+        ("b/y.py", []),
+    ]
+
+
+def test_star_led_code_lines_are_not_comments():
+    copies = "\n".join("    *dst++ = *src++;" for _ in range(8))
+    sums = "\n".join("    * b" for _ in range(6))
+    source = (
+        f"void copy(char *dst, const char *src) {{\n{copies}\n}}\n"
+        f"int area = a\n{sums};\n"
+        "/*\n * one\n * two\n * three\n * four\n * five\n */\n"
+    )
+
+    compacted = compact_source("copy.c", source)
+
+    assert compacted.text.count("*dst++ = *src++;") == 8
+    assert compacted.text.count("    * b") == 6
+    assert " * three" in compacted.text and " * four" not in compacted.text
@@ -0,0 +1,61 @@
+import csv
+import io
+import json
+
+from fastapi.testclient import TestClient
+
+from app.api.v1 import analyze
+from app.main import app
+
+
+def _issues(count: int) -> list[dict]:
+    return [
+        {
+            "file_path": f"src/mod{index}.py",
+            "line_start": index + 1 if index % 2 else None,
+            "line_end": index + 2 if index % 2 else None,
+            "severity": "high" if index % 2 else "low",
+            "category": "security",
+            "message": f"=HYPERLINK(\"x\") {index}" if index == 0 else f"finding {index}",
+        }
+        for index in range(count)
+    ]
+
+
+def test_exports_stream_every_issue_in_each_format(create_analysis, monkeypatch):
+    monkeypatch.setattr(analyze, "EXPORT_BATCH_ROWS", 2)
+    analysis_id = create_analysis(issues=_issues(5))
+    client = TestClient(app)
+
+    ndjson = client.get(f"/api/v1/analyses/{analysis_id}/export", headers={"Accept-Encoding": "identity"})
+    rows = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    assert "content-encoding" not in ndjson.headers
+    assert [row["file_path"] for row in rows] == [f"src/mod{index}.py" for index in range(5)]
+
+    sarif = client.get(f"/api/v1/analyses/{analysis_id}/export?format=sarif")
+    log = sarif.json()
+    results = log["runs"][0]["results"]
+    assert log["version"] == "2.1.0"
+    assert len(results) == 5
+    assert results[1]["level"] == "error"
+    assert results[1]["locations"][0]["physicalLocation"]["region"] == {"startLine": 2, "endLine": 3}
+    assert "region" not in results[0]["locations"][0]["physicalLocation"]
+
+    exported = client.get(f"/api/v1/analyses/{analysis_id}/export?format=csv")
+    table = list(csv.reader(io.StringIO(exported.text)))
+    assert table[0][:3] == ["id", "file_path", "line_start"]
+    assert len(table) == 6
+    assert table[1][6].startswith("'=HYPERLINK")
+
+
+def test_export_is_gzipped_when_accepted(create_analysis):
+    analysis_id = create_analysis(issues=_issues(3))
+    client = TestClient(app)
+
+    response = client.get(f"/api/v1/analyses/{analysis_id}/export", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.text.splitlines()) == 3
+    assert client.get("/api/v1/analyses/999/export").status_code == 404
+    assert client.get(f"/api/v1/analyses/{analysis_id}/export?format=xml").status_code == 422
@@ -0,0 +1,101 @@
+import asyncio
+import base64
+
+import httpx
+
+from app.core.config import settings
+from app.services.file_planner import PlanBudget, plan_files, score_file
+from app.services.file_utils import FileItem
+from app.services.github_service import GitHubService
+
+
+def test_score_file_prefers_sensitive_code_over_docs_and_tests():
+    auth = score_file(FileItem(path="app/auth/login.py", size=4_000))
+    handler = score_file(FileItem(path="app/api/handlers.py", size=4_000))
+    readme = score_file(FileItem(path="docs/guide.md", size=4_000))
+    test = score_file(FileItem(path="tests/test_login.py", size=4_000))
+
+    assert auth > handler > readme
+    assert auth > test
+
+
+def test_score_file_uses_churn():
+    item = FileItem(path="app/util.py", size=4_000)
+    assert score_file(item, {"app/util.py": 30}) > score_file(item)
+
+
+def test_plan_files_respects_budgets_and_records_skips(monkeypatch):
+    monkeypatch.setattr(settings, "max_file_bytes", 50_000)
+    files = [
+        FileItem(path="docs/readme.md", size=4_000),
+        FileItem(path="app/auth.py", size=4_000),
+        FileItem(path="app/db/models.py", size=4_000),
+        FileItem(path="app/huge.py", size=60_000),
+    ]
+
+    plan = plan_files(files, PlanBudget(max_files=10, max_tokens=2_000))
+
+    assert [f.path for f in plan.selected] == ["app/auth.py", "app/db/models.py"]
+    assert dict(plan.skipped) == {"app/huge.py": "oversized", "docs/readme.md": "token_budget"}
+    metadata = plan.to_metadata()
+    assert metadata["selected"] == 2 and metadata["skipped"] == 2
+
+
+def test_plan_files_caps_file_count():
+    files = [FileItem(path=f"src/mod{i}.py", size=1_000) for i in range(5)]
+    plan = plan_files(files, PlanBudget(max_files=3))
+    assert len(plan.selected) == 3
+    assert {reason for _, reason in plan.skipped} == {"file_budget"}
+
+
+def test_manual_pr_is_planned_filtered_and_read_at_its_head(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "github_content_strategy", "rest")
+    pr_files = [
+        {"filename": "app/auth.py", "status": "modified", "changes": 5, "sha": "a"},
+        {"filename": "app/db/models.py", "status": "modified", "changes": 5, "sha": "b"},
+        {"filename": "app/new.py", "status": "added", "changes": 300, "sha": "c"},
+        {"filename": "scratch/notes.py", "status": "added", "changes": 1, "sha": "d"},
+    ]
+    # Only the PR head has these: the .gitignore and the auth module were both changed in the PR.
+    head_contents = {".gitignore": b"scratch/\n", "app/auth.py": b"import os\nSECRET = os.environ['KEY']\n"}
+    content_refs = []
+    tree = [
+        {"path": "app/auth.py", "type": "blob", "size": 6_000},
+        {"path": "app/db/models.py", "type": "blob", "size": 6_000},
+    ]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path.endswith("/pulls/7/files"):
+            return httpx.Response(200, json=pr_files if request.url.params["page"] == "1" else [])
+        if path.endswith("/pulls/7"):
+            return httpx.Response(200, json={"head": {"sha": "c7"}})
+        if path.endswith("/git/trees/c7"):
+            return httpx.Response(200, json={"tree": tree})
+        if "/contents/" in path:
+            content_refs.append(request.url.params.get("ref"))
+            data = head_contents.get(path.split("/contents/", 1)[1])
+            if request.url.params.get("ref") == "c7" and data is not None:
+                return httpx.Response(200, json={"encoding": "base64", "content": base64.b64encode(data).decode()})
+        return httpx.Response(404, json={"message": "Not Found"})
+
+    plans = []
+
+    def select(files, churn):
+        plans.append(plan_files(files, PlanBudget(max_files=10, max_tokens=2_000), churn))
+        return plans[-1].selected
+
+    service = GitHubService(http_cache=None)
+    service.base_url = "http://gh"
+    transport = httpx.MockTransport(handler)
+    original = httpx.AsyncClient
+
+    monkeypatch.setattr(httpx, "AsyncClient", lambda **kwargs: original(transport=transport, **kwargs))
+    files = asyncio.run(service.fetch_repo_files_via_api("https://github.com/acme/api", None, 7, tmp_path, select))
+
+    # The tree sizes changed files; a file missing from it is estimated from its changed lines.
+    assert [item.path for item in plans[0].selected] == ["app/auth.py"]
+    assert dict(plans[0].skipped) == {"app/db/models.py": "token_budget", "app/new.py": "token_budget"}
+    # Without a webhook head_sha, ignore rules and contents still come from the PR head.
+    assert [item.path for item in files] == ["app/auth.py"]
+    assert set(content_refs) == {"c7"}
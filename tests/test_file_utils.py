@@ -0,0 +1,66 @@
+import base64
+import os
+
+from app.core.config import settings
+from app.services.file_utils import (
+    classify_content,
+    is_relevant_content,
+    is_relevant_file,
+    read_local_file,
+    walk_local_files,
+)
+from app.services.ignore_rules import IgnoreMatcher
+
+
+def test_is_relevant_file_skips_vendored_and_generated_paths():
+    assert is_relevant_file("src/app.py")
+    assert not is_relevant_file("frontend/node_modules/react/index.js")
+    assert not is_relevant_file("vendor/github.com/pkg/errors/errors.go")
+    assert not is_relevant_file("static/app.min.js")
+    assert not is_relevant_file("api/service_pb2.py")
+    assert not is_relevant_file("proto/service.pb.go")
+
+
+def test_classify_content_detects_generated_markers():
+    content = "// Code generated by protoc-gen-go. DO NOT EDIT.\n" + "var x = 1;\n" * 200
+    assert classify_content("gen/service.go", content) == "generated"
+
+
+def test_classify_content_detects_minified_and_high_entropy_content():
+    minified = "var a=1;" * 600
+    assert classify_content("static/app.js", minified) == "minified"
+
+    blob = "\n".join(base64.b64encode(os.urandom(60)).decode() for _ in range(100))
+    assert classify_content("fixtures/blob.ts", blob) == "high_entropy"
+
+
+def test_classify_content_keeps_regular_source_and_skips_large_data():
+    source = "def handler(request):\n    return render(request, 'index.html')\n\n" * 100
+    assert is_relevant_content("app/views.py", source)
+    assert classify_content("fixtures/big.json", "[" + "1," * 60_000 + "1]") == "oversized"
+
+
+def test_walk_local_files_prunes_ignored_directories(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "app.py").write_text("print('hi')\n")
+    (tmp_path / "build").mkdir()
+    (tmp_path / "build" / "out.py").write_text("x = 1\n")
+    (tmp_path / "node_modules" / "pkg").mkdir(parents=True)
+    (tmp_path / "node_modules" / "pkg" / "index.js").write_text("module.exports = 1\n")
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".git" / "config.toml").write_text("x = 1\n")
+
+    assert walk_local_files(tmp_path, IgnoreMatcher.from_lines(["build/"])) == ["src/app.py"]
+
+
+def test_read_local_file_checks_size_before_loading(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "max_file_bytes", 10)
+    (tmp_path / "big.py").write_text("x = 1\n" * 10)
+    (tmp_path / "small.py").write_text("x = 1\n")
+
+    assert read_local_file(tmp_path, "big.py") is None
+    item = read_local_file(tmp_path, "small.py")
+    assert item is not None
+    assert item.size == 6
+    assert item.sha == "7d4290a117a4ddcc11daae7ea675841033830c8f"
+    assert item.read_text() == "x = 1\n"
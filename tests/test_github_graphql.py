@@ -0,0 +1,57 @@
+import asyncio
+import base64
+import json
+import re
+
+import httpx
+
+from app.core.config import settings
+from app.services.file_utils import FileItem
+from app.services.github_service import GitHubService, RepoRef
+
+BLOBS = {
+    "app.py": {"text": "print('hi')\n", "byteSize": 12, "isBinary": False, "isTruncated": False},
+    "logo.png": {"text": None, "byteSize": 900, "isBinary": True, "isTruncated": False},
+    "big.py": {"text": "x" * 10, "byteSize": 10**9, "isBinary": False, "isTruncated": False},
+    "long.py": {"text": "partial", "byteSize": 40, "isBinary": False, "isTruncated": True},
+}
+
+
+def test_graphql_fetch_splits_batches_and_skips_by_metadata(monkeypatch):
+    monkeypatch.setattr(settings, "github_graphql_batch_size", 10)
+    batch_sizes: list[int] = []
+    rest_paths: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/graphql":
+            body = json.loads(request.content)
+            aliases = re.findall(r"(\w+): object\(expression: \$(\w+)\)", body["query"])
+            if len(aliases) > 2:
+                return httpx.Response(200, json={"errors": [{"type": "MAX_NODE_LIMIT_EXCEEDED"}]})
+            batch_sizes.append(len(aliases))
+            objects = {alias: BLOBS.get(body["variables"][var].split(":", 1)[1]) for alias, var in aliases}
+            return httpx.Response(200, json={"data": {"repository": objects}})
+        path = request.url.path.split("/contents/", 1)[1]
+        rest_paths.append(path)
+        content = base64.b64encode(b"full text\n").decode("ascii")
+        return httpx.Response(200, json={"encoding": "base64", "content": content})
+
+    service = GitHubService(http_cache=None)
+    files = [FileItem(path) for path in [*BLOBS, "missing.py"]]
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://gh") as client:
+            service.base_url = "http://gh"
+            return [pair async for pair in service._fetch_blobs_via_graphql(client, RepoRef("o", "r"), "t", files)]
+
+    results = {item.path: data for item, data in asyncio.run(scenario())}
+
+    assert results == {
+        "app.py": b"print('hi')\n",
+        "logo.png": None,
+        "big.py": None,
+        "long.py": b"full text\n",
+        "missing.py": None,
+    }
+    assert batch_sizes and max(batch_sizes) <= 2
+    assert rest_paths == ["long.py"]
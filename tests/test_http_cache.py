@@ -0,0 +1,65 @@
+import asyncio
+import os
+
+import httpx
+
+from app.services.github_service import GitHubService
+from app.services.http_cache import HTTPCache, track_cache_stats
+
+
+def _transport(seen: list[dict]) -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(dict(request.headers))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"', "X-RateLimit-Remaining": "4998"})
+        return httpx.Response(200, json={"default_branch": "main"}, headers={"ETag": '"v1"'})
+
+    return httpx.MockTransport(handler)
+
+
+def test_revalidated_response_is_served_from_cache(tmp_path):
+    service = GitHubService(http_cache=HTTPCache(tmp_path, 1_000_000))
+    seen: list[dict] = []
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=_transport(seen)) as client:
+            with track_cache_stats() as stats:
+                first = await service._get(client, "https://api.github.test/repos/o/r", "token-a")
+                second = await service._get(client, "https://api.github.test/repos/o/r", "token-a")
+                other = await service._get(client, "https://api.github.test/repos/o/r", "token-b")
+        return first, second, other, stats
+
+    first, second, other, stats = asyncio.run(scenario())
+
+    assert first.json() == second.json() == other.json() == {"default_branch": "main"}
+    assert second.status_code == 200
+    assert "if-none-match" not in seen[0]
+    assert seen[1]["if-none-match"] == '"v1"'
+    # Entries are scoped to the credential, so another token starts cold.
+    assert "if-none-match" not in seen[2]
+    assert stats.to_metadata() == {"saved_requests": 1, "fetched_requests": 2}
+
+
+def test_responses_without_validators_are_not_stored(tmp_path):
+    cache = HTTPCache(tmp_path, 1_000_000)
+    key = cache.key("https://api.github.test/x", None)
+
+    asyncio.run(cache.store(key, {"content-type": "application/json"}, b"{}"))
+
+    assert asyncio.run(cache.lookup(key)) is None
+
+
+def test_least_recently_used_entries_are_evicted_over_budget(tmp_path):
+    cache = HTTPCache(tmp_path, 1_000_000, max_bytes=1_000)
+    keys = [cache.key(f"https://api.github.test/{index}", None) for index in range(3)]
+
+    async def scenario():
+        for index, key in enumerate(keys[:2]):
+            await cache.store(key, {"etag": f'"{index}"'}, b"x" * 300)
+            os.utime(cache._path(key), (index, index))
+        # Reading the oldest entry makes it the most recently used.
+        await cache.lookup(keys[0])
+        await cache.store(keys[2], {"etag": '"2"'}, b"x" * 300)
+        return [await cache.lookup(key) is not None for key in keys]
+
+    assert asyncio.run(scenario()) == [True, False, True]
@@ -0,0 +1,49 @@
+import pathspec
+
+from app.services.file_utils import walk_local_files
+from app.services.ignore_rules import IgnoreMatcher, read_info_exclude
+
+ROOT_RULES = ["# comment", "*.log", "!keep.log", "/dist", "build/", "docs/**/tmp", "**/cache", "secret?.py", ""]
+PATHS = [
+    "app.log", "src/keep.log", "src/deep/x.log", "dist/a.py", "src/dist/a.py", "build/x.py", "src/build/y.py",
+    "build.py", "old.log/notes.md", "docs/a/b/tmp/x.md", "docs/tmp/x.md", "lib/cache/c.py", "secret1.py", "secret10.py", "src/app.py",
+]
+
+
+def test_root_rules_agree_with_pathspec():
+    spec = pathspec.PathSpec.from_lines("gitwildmatch", ROOT_RULES)
+    matcher = IgnoreMatcher.from_lines(ROOT_RULES)
+
+    assert [path for path in PATHS if matcher.is_ignored(path)] == [path for path in PATHS if spec.match_file(path)]
+    assert matcher.filter(PATHS) == [path for path in PATHS if not spec.match_file(path)]
+
+
+def test_nested_rules_take_precedence_and_ignored_directories_stay_ignored():
+    matcher = IgnoreMatcher(["*.tmp"])
+    matcher.add("", ["*.gen.py", "out/", "!out/keep.py"])
+    matcher.add("pkg", ["!*.gen.py", "fixtures/"])
+    matcher.add("pkg/sub", ["*.gen.py"])
+
+    assert matcher.is_ignored("a.gen.py")
+    assert not matcher.is_ignored("pkg/a.gen.py")
+    assert matcher.is_ignored("pkg/sub/a.gen.py")
+    assert matcher.is_ignored("pkg/fixtures/data.py")
+    assert not matcher.is_ignored("fixtures/data.py")
+    # Like git, a file inside an excluded directory cannot be re-included.
+    assert matcher.is_ignored("out/keep.py")
+    assert matcher.is_dir_ignored("out")
+    assert matcher.is_ignored("pkg/notes.tmp")
+
+
+def test_local_walk_reads_nested_gitignore_and_info_exclude(tmp_path):
+    (tmp_path / ".git" / "info").mkdir(parents=True)
+    (tmp_path / ".git" / "info" / "exclude").write_text("local_only.py\n")
+    (tmp_path / ".gitignore").write_text("*.gen.py\n")
+    (tmp_path / "svc" / "generated").mkdir(parents=True)
+    (tmp_path / "svc" / ".gitignore").write_text("generated/\n!api.gen.py\n")
+    for path in ("app.py", "local_only.py", "x.gen.py", "svc/api.gen.py", "svc/main.py", "svc/generated/big.py"):
+        (tmp_path / path).write_text("x = 1\n")
+
+    paths = walk_local_files(tmp_path, IgnoreMatcher(read_info_exclude(tmp_path)))
+
+    assert sorted(paths) == ["app.py", "svc/api.gen.py", "svc/main.py"]
@@ -0,0 +1,59 @@
+import json
+import os
+
+from fastapi.testclient import TestClient
+
+from app.core.metrics import MetricsRegistry
+from app.main import app
+
+
+def test_render_counters_and_histograms_in_text_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("acra_test_requests_total", "Requests", ("status",))
+    latency = registry.histogram("acra_test_seconds", "Latency", buckets=(0.1, 1.0))
+    requests.inc(status=200)
+    requests.inc(2, status=200)
+    latency.observe(0.05)
+    latency.observe(0.5)
+
+    text = registry.render()
+
+    assert "# TYPE acra_test_requests_total counter" in text
+    assert 'acra_test_requests_total{status="200"} 3' in text
+    assert 'acra_test_seconds_bucket{le="0.1"} 1' in text
+    assert 'acra_test_seconds_bucket{le="+Inf"} 2' in text
+    assert "acra_test_seconds_count 2" in text
+
+
+def test_render_merges_snapshots_from_other_workers(tmp_path):
+    registry = MetricsRegistry(str(tmp_path))
+    requests = registry.counter("acra_test_requests_total", "Requests")
+    subscribers = registry.gauge("acra_test_subscribers", "Subscribers")
+    requests.inc(2)
+    subscribers.inc()
+    other_worker = {
+        "acra_test_requests_total": {"[]": 5.0},
+        "acra_test_subscribers": {"[]": 3.0},
+    }
+    live = tmp_path / f"metrics-{os.getppid()}.json"
+    live.write_text(json.dumps(other_worker))
+    # A worker that exited (or restarted under a new pid) left this snapshot behind; its
+    # snapshot has not been refreshed for a long time either.
+    exited = tmp_path / "metrics-999999999.json"
+    exited.write_text(json.dumps(other_worker))
+    os.utime(live, (0, 0))
+
+    text = registry.render()
+
+    # Counters keep the exited worker's total so they never go backwards; its gauges are dropped.
+    assert "acra_test_requests_total 12" in text
+    assert "acra_test_subscribers 4" in text
+    assert live.exists() and exited.exists()
+
+
+def test_metrics_endpoint_is_exposed():
+    client = TestClient(app)
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE acra_chunks_analyzed_total counter" in response.text
@@ -0,0 +1,34 @@
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.services.profiling import ALLOCATIONS_ARTIFACT, PROFILE_ARTIFACT, RunProfiler, artifact_path
+
+
+def test_run_profiler_writes_artifacts(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "artifacts_dir", str(tmp_path))
+    profiler = RunProfiler(7)
+    assert profiler.start()
+    assert not RunProfiler(8).start()
+    _ = [str(i) * 10 for i in range(1000)]
+    profiler.stop()
+
+    names = profiler.write_artifacts()
+
+    assert PROFILE_ARTIFACT in names
+    assert artifact_path(7, PROFILE_ARTIFACT) is not None
+    assert "allocation sites" in artifact_path(7, ALLOCATIONS_ARTIFACT).read_text()
+    assert artifact_path(7, "../../etc/passwd") is None
+
+
+def test_profiling_requires_admin_key(monkeypatch):
+    monkeypatch.setattr(settings, "admin_api_key", "admin-secret")
+    client = TestClient(app)
+    payload = {"repo_url": "https://github.com/acme/api", "profile": True}
+
+    assert client.post("/api/v1/analyze", json=payload).status_code == 403
+    assert client.get("/api/v1/analyses/1/artifacts/profile.pstats").status_code == 403
+    response = client.get(
+        "/api/v1/analyses/1/artifacts/profile.pstats", headers={"Authorization": "Bearer admin-secret"}
+    )
+    assert response.status_code == 404
@@ -0,0 +1,84 @@
+import asyncio
+import fcntl
+import os
+import shutil
+import subprocess
+
+from app.services.repo_cache import RepoMirrorCache
+
+GIT_ENV = {
+    **os.environ,
+    "GIT_AUTHOR_NAME": "test",
+    "GIT_AUTHOR_EMAIL": "test@example.com",
+    "GIT_COMMITTER_NAME": "test",
+    "GIT_COMMITTER_EMAIL": "test@example.com",
+}
+
+
+def _git(*args, cwd):
+    subprocess.run(["git", *args], cwd=cwd, env=GIT_ENV, check=True, capture_output=True)
+
+
+def _make_origin(tmp_path, name):
+    work = tmp_path / f"{name}-work"
+    work.mkdir()
+    _git("init", "-q", "-b", "main", cwd=work)
+    (work / "app.py").write_text("print('v1')\n")
+    _git("add", ".", cwd=work)
+    _git("commit", "-q", "-m", "v1", cwd=work)
+    bare = tmp_path / f"{name}.git"
+    _git("clone", "-q", "--bare", str(work), str(bare), cwd=tmp_path)
+    _git("remote", "add", "origin", str(bare), cwd=work)
+    return work, f"file://{bare}"
+
+
+def test_materialize_reuses_mirror_and_fetches_new_commits(tmp_path):
+    work, url = _make_origin(tmp_path, "repo")
+    cache = RepoMirrorCache(tmp_path / "cache", max_bytes=10**9)
+
+    asyncio.run(cache.materialize(url, None, tmp_path / "first"))
+    assert (tmp_path / "first" / "app.py").read_text() == "print('v1')\n"
+
+    (work / "app.py").write_text("print('v2')\n")
+    _git("commit", "-q", "-am", "v2", cwd=work)
+    _git("push", "-q", "origin", "main", cwd=work)
+
+    asyncio.run(cache.materialize(url, None, tmp_path / "second"))
+    assert (tmp_path / "second" / "app.py").read_text() == "print('v2')\n"
+    assert len(list((tmp_path / "cache").glob("*.git"))) == 1
+
+
+def test_evict_drops_least_recently_used_mirror(tmp_path):
+    _, first_url = _make_origin(tmp_path, "first")
+    _, second_url = _make_origin(tmp_path, "second")
+    cache = RepoMirrorCache(tmp_path / "cache", max_bytes=10**9)
+    asyncio.run(cache.materialize(first_url, None, tmp_path / "a"))
+    asyncio.run(cache.materialize(second_url, None, tmp_path / "b"))
+
+    cache.max_bytes = 1
+    os.utime(cache.mirror_path(first_url) / "acra-last-used", (0, 0))
+    evicted = asyncio.run(cache.evict())
+    # Both checkouts still exist, so neither mirror may be removed yet.
+    assert evicted == []
+
+    shutil.rmtree(tmp_path / "a")
+    shutil.rmtree(tmp_path / "b")
+    evicted = asyncio.run(cache.evict())
+
+    assert evicted[0] == cache.mirror_path(first_url)
+    assert not cache.mirror_path(first_url).exists()
+
+
+def test_evict_skips_mirrors_locked_by_another_worker(tmp_path):
+    _, url = _make_origin(tmp_path, "repo")
+    cache = RepoMirrorCache(tmp_path / "cache", max_bytes=10**9)
+    asyncio.run(cache.materialize(url, None, tmp_path / "a"))
+    shutil.rmtree(tmp_path / "a")
+    cache.max_bytes = 1
+    lock_path = cache.mirror_path(url).with_name(f"{cache.mirror_path(url).name}.lock")
+
+    with open(lock_path) as held:
+        fcntl.flock(held, fcntl.LOCK_EX)
+        assert asyncio.run(cache.evict()) == []
+
+    assert asyncio.run(cache.evict()) == [cache.mirror_path(url)]
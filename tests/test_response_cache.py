@@ -0,0 +1,104 @@
+import asyncio
+import os
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.db import engine
+from app.main import app
+from app.services.response_cache import ResponseCache
+
+ISSUES = [{"file_path": "a.py", "severity": "high", "category": "security", "message": "m"}]
+
+
+def test_completed_analysis_is_served_from_cache_with_etag(create_analysis):
+    analysis_id = create_analysis(issues=ISSUES)
+    client = TestClient(app)
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        first = client.get(f"/api/v1/analyses/{analysis_id}", headers={"Accept-Encoding": "identity"})
+        queries_for_first = len(statements)
+        repeat = client.get(f"/api/v1/analyses/{analysis_id}", headers={"Accept-Encoding": "gzip"})
+        revalidated = client.get(
+            f"/api/v1/analyses/{analysis_id}",
+            headers={"Accept-Encoding": "gzip", "If-None-Match": repeat.headers["etag"]},
+        )
+        # The identity body's validator does not match the gzip representation.
+        mismatched = client.get(
+            f"/api/v1/analyses/{analysis_id}",
+            headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]},
+        )
+        queries_for_repeats = len(statements) - queries_for_first
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+    assert first.status_code == 200
+    assert first.json()["issues"][0]["file_path"] == "a.py"
+    assert repeat.headers["content-encoding"] == "gzip"
+    assert repeat.json() == first.json()
+    assert repeat.headers["etag"] == first.headers["etag"][:-1] + '-gzip"'
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == repeat.headers["etag"]
+    assert mismatched.status_code == 200
+    assert queries_for_first > 0 and queries_for_repeats == 0
+
+    assert client.delete(f"/api/v1/analyses/{analysis_id}").status_code == 200
+    assert client.get(f"/api/v1/analyses/{analysis_id}").status_code == 404
+
+
+def test_running_analysis_is_not_cached(create_analysis):
+    analysis_id = create_analysis("analyzing", issues=ISSUES)
+    client = TestClient(app)
+
+    response = client.get(f"/api/v1/analyses/{analysis_id}")
+
+    assert response.status_code == 200
+    assert "etag" not in response.headers
+
+
+def test_disk_copy_is_shared_and_invalidates_other_workers(tmp_path):
+    worker_a = ResponseCache(8, str(tmp_path))
+    worker_b = ResponseCache(8, str(tmp_path))
+
+    async def scenario():
+        stored = await worker_a.put(1, b'{"id": 1}')
+        loaded = await worker_b.get(1)
+        worker_b.invalidate(1)
+        return stored, loaded, await worker_a.get(1)
+
+    stored, loaded, after_delete = asyncio.run(scenario())
+
+    assert loaded.etag == stored.etag and loaded.body == b'{"id": 1}'
+    assert after_delete is None
+
+
+def test_disk_only_cache_serves_from_the_directory(tmp_path):
+    cache = ResponseCache(0, str(tmp_path), max_disk_entries=10)
+
+    async def scenario():
+        stored = await cache.put(1, b'{"id": 1}')
+        return stored, await cache.get(1), await cache.get(2)
+
+    stored, loaded, missing = asyncio.run(scenario())
+
+    assert loaded.etag == stored.etag and loaded.body == b'{"id": 1}'
+    assert missing is None
+
+
+def test_disk_copies_are_bounded(tmp_path):
+    cache = ResponseCache(8, str(tmp_path), max_disk_entries=2)
+
+    async def scenario():
+        for analysis_id in (1, 2):
+            await cache.put(analysis_id, b"{}")
+            os.utime(tmp_path / f"analysis-{analysis_id}.json", (analysis_id, analysis_id))
+        await cache.put(3, b"{}")
+
+    asyncio.run(scenario())
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["analysis-2.json", "analysis-3.json"]
@@ -0,0 +1,154 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.api.v1 import scans
+from app.core.config import settings
+from app.main import app
+from app.models import Analysis, Issue, ScanJob
+from app.services.progress import progress_hub
+from app.services.scan_scheduler import ScanOptions, ScanScheduler, job_status
+from app.services.task_registry import scan_tasks
+
+
+class FakeAgent:
+    """Completes each child with one issue and reserves 60 tokens from the shared pool."""
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+
+    async def run(self, analysis_id, session, payload):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.01)
+        payload.token_pool.reserve(60)
+        analysis = await session.get(Analysis, analysis_id)
+        analysis.status = "completed"
+        analysis.progress = 100
+        analysis.quality_score = 80
+        session.add(Issue(analysis_id=analysis_id, file_path="a.py", severity="high", category="security", message="m"))
+        await session.commit()
+        self.running -= 1
+
+
+def _create_job(sessions, repos, token_budget):
+    async def create():
+        async with sessions() as session:
+            job = ScanJob(status="queued", total=len(repos), token_budget=token_budget)
+            session.add(job)
+            await session.flush()
+            session.add_all(
+                Analysis(repo_url=repo, job_id=job.id, status="queued", progress=0) for repo in repos
+            )
+            await session.commit()
+            return job.id
+
+    return asyncio.run(create())
+
+
+def test_scheduler_shares_concurrency_and_token_budget(db_sessions, monkeypatch):
+    monkeypatch.setattr(settings, "batch_max_concurrency", 2)
+    repos = [f"https://github.com/acme/repo-{i}" for i in range(4)]
+    job_id = _create_job(db_sessions, repos, token_budget=100)
+    agent = FakeAgent()
+    scheduler = ScanScheduler(agent, db_sessions)
+
+    async def scenario():
+        queue = progress_hub.get_job_queue(job_id)
+        await scheduler.run_job(job_id, ScanOptions(github_token=None, allow_git_clone=False))
+        events = []
+        while not queue.empty():
+            events.append(queue.get_nowait())
+        async with db_sessions() as session:
+            job = await session.get(ScanJob, job_id)
+            return job.status, job.extra_metadata, events
+
+    status, metadata, events = asyncio.run(scenario())
+
+    # Two children run at once and reserve 120 tokens, exhausting the 100-token pool for the rest.
+    assert agent.peak == 2
+    assert status == "partial"
+    assert metadata["statuses"] == {"completed": 2, "skipped": 2}
+    assert metadata["issues_by_severity"] == {"high": 2}
+    assert metadata["tokens_reserved"] == 120
+    assert sorted(event.status for event in events) == ["skipped", "skipped"]
+
+
+def test_job_status_reflects_how_children_settled():
+    assert job_status({"completed": 3}) == "completed"
+    assert job_status({"completed": 1, "skipped": 2}) == "partial"
+    assert job_status({"cancelled": 2, "skipped": 1}) == "cancelled"
+    assert job_status({"skipped": 2}) == "failed"
+    assert job_status({"failed": 1}) == "failed"
+
+
+def test_interrupted_scan_reruns_only_unfinished_children(db_sessions, monkeypatch):
+    repos = ["https://github.com/acme/done", "https://github.com/acme/open"]
+    job_id = _create_job(db_sessions, repos, token_budget=1_000)
+    agent = FakeAgent()
+    monkeypatch.setattr(scans.scheduler, "agent", agent)
+
+    async def scenario():
+        async with db_sessions() as session:
+            job = await session.get(ScanJob, job_id)
+            job.status = "running"
+            children = (await session.execute(select(Analysis).order_by(Analysis.id))).scalars().all()
+            children[0].status = "completed"
+            children[1].status = "analyzing"
+            await session.commit()
+
+        resumed = await scans.resume_interrupted_scans()
+        tracked = scan_tasks.is_running(job_id)
+        await scan_tasks.wait_all(5)
+        async with db_sessions() as session:
+            job = await session.get(ScanJob, job_id)
+            return resumed, tracked, job.status, job.extra_metadata["statuses"]
+
+    resumed, tracked, status, statuses = asyncio.run(scenario())
+
+    assert resumed == [job_id]
+    assert tracked
+    assert not scan_tasks.is_running(job_id)
+    assert agent.peak == 1
+    assert status == "completed"
+    assert statuses == {"completed": 2}
+
+
+def test_shutdown_cancels_running_scan_jobs(db_sessions, monkeypatch):
+    monkeypatch.setattr(settings, "batch_max_concurrency", 1)
+    job_id = _create_job(db_sessions, ["https://github.com/acme/a", "https://github.com/acme/b"], token_budget=0)
+    started = asyncio.Event()
+
+    class StuckAgent:
+        async def run(self, analysis_id, session, payload):
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                analysis = await session.get(Analysis, analysis_id)
+                analysis.status = "cancelled"
+                await session.commit()
+                raise
+
+    scheduler = ScanScheduler(StuckAgent(), db_sessions)
+
+    async def scenario():
+        scan_tasks.start(job_id, scheduler.run_job(job_id, ScanOptions(None, False)))
+        await started.wait()
+        await app.router.shutdown()
+        async with db_sessions() as session:
+            return (await session.get(ScanJob, job_id)).status
+
+    assert asyncio.run(scenario()) == "cancelled"
+    assert not scan_tasks.is_running(job_id)
+
+
+def test_create_scan_requires_exactly_one_source(db_sessions):
+    client = TestClient(app)
+
+    assert client.post("/api/v1/scans", json={}).status_code == 422
+    both = {"org": "acme", "targets": [{"repo_url": "https://github.com/acme/api"}]}
+    assert client.post("/api/v1/scans", json=both).status_code == 422
+    assert client.get("/api/v1/scans/999").status_code == 404
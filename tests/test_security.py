@@ -0,0 +1,59 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.security import (
+    MemoryBucketStore,
+    RateLimitMiddleware,
+    SecurityHeadersMiddleware,
+    TokenBucketLimiter,
+)
+
+
+def test_memory_bucket_store_refills_and_evicts_lru():
+    store = MemoryBucketStore(max_keys=2)
+    assert store.take("a", capacity=2, refill_per_s=1, now=0.0)
+    assert store.take("a", capacity=2, refill_per_s=1, now=0.0)
+    assert not store.take("a", capacity=2, refill_per_s=1, now=0.0)
+    assert store.take("a", capacity=2, refill_per_s=1, now=1.0)
+
+    store.take("b", capacity=2, refill_per_s=1, now=1.0)
+    store.take("c", capacity=2, refill_per_s=1, now=1.0)
+    assert len(store) == 2
+
+
+def test_memory_bucket_store_drops_idle_buckets():
+    store = MemoryBucketStore(max_keys=100)
+    for i in range(50):
+        store.take(f"client-{i}", capacity=5, refill_per_s=1, now=0.0)
+    store.take("late", capacity=5, refill_per_s=1, now=10.0)
+    assert len(store) == 1
+
+
+def test_shared_limiter_state_is_visible_across_instances(tmp_path):
+    path = str(tmp_path / "limits.db")
+    first = TokenBucketLimiter(limit=1, window_s=60, shared_path=path)
+    second = TokenBucketLimiter(limit=1, window_s=60, shared_path=path)
+
+    assert asyncio.run(first.allow("client:/api/v1/analyze"))
+    assert not asyncio.run(second.allow("client:/api/v1/analyze"))
+
+
+def test_rate_limit_middleware_returns_429_with_security_headers():
+    app = FastAPI()
+
+    @app.get("/api/ping")
+    async def ping():
+        return {"ok": True}
+
+    app.add_middleware(RateLimitMiddleware, limiter=TokenBucketLimiter(limit=1, window_s=60))
+    app.add_middleware(SecurityHeadersMiddleware)
+    client = TestClient(app)
+
+    assert client.get("/api/ping").status_code == 200
+    response = client.get("/api/ping")
+    assert response.status_code == 429
+    assert response.json() == {"detail": "Rate limit exceeded"}
+    assert response.headers["retry-after"] == "60"
+    assert response.headers["x-frame-options"] == "DENY"
@@ -0,0 +1,26 @@
+from app.services.tracing import Trace, waterfall
+
+
+def test_trace_records_compact_spans_and_expands_to_waterfall():
+    trace = Trace()
+    with trace.span("fetch", files=2):
+        pass
+    with trace.span("chunk", file="a.py", bytes=100) as span:
+        span.update(prompt_tokens=40, completion_tokens=10, retries=1)
+    with trace.span("chunk", file="b.py", bytes=50) as span:
+        span.update(prompt_tokens=20, completion_tokens=5, retries=0)
+
+    stored = trace.to_dict()
+    assert stored["spans"][0][0] == "fetch"
+    assert len(stored["spans"][0]) == 4
+
+    view = waterfall(stored)
+    assert [stage["name"] for stage in view["stages"]] == ["fetch"]
+    assert [span["attrs"]["file"] for span in view["spans"]] == ["a.py", "b.py"]
+    assert view["spans"][0]["start_ms"] <= view["spans"][1]["start_ms"]
+    assert view["totals"] == {"chunks": 2, "bytes": 150, "prompt_tokens": 60, "completion_tokens": 15, "retries": 1}
+
+
+def test_waterfall_handles_missing_trace():
+    view = waterfall(None)
+    assert view["spans"] == [] and view["totals"]["chunks"] == 0
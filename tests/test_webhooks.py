@@ -0,0 +1,158 @@
+import asyncio
+import json
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.services.github_service import GitHubService, RepoRef
+from app.services.task_registry import analysis_tasks
+from app.services import webhooks
+from app.services.webhooks import PullRequestEvent, PushDebouncer, sign
+
+REPO = "https://github.com/acme/api"
+
+
+def test_webhook_endpoint_verifies_signature(monkeypatch):
+    client = TestClient(app)
+    body = json.dumps({"zen": "Keep it logically awesome."}).encode()
+
+    assert client.post("/api/v1/webhooks/github", content=body).status_code == 404
+
+    monkeypatch.setattr(settings, "webhook_secret", "s3cret")
+    monkeypatch.setattr(settings, "api_key", "api-key")
+    unsigned = client.post("/api/v1/webhooks/github", content=body, headers={"X-GitHub-Event": "ping"})
+    forged = client.post(
+        "/api/v1/webhooks/github",
+        content=body,
+        headers={"X-GitHub-Event": "ping", "X-Hub-Signature-256": sign("other", body)},
+    )
+    signed = client.post(
+        "/api/v1/webhooks/github",
+        content=body,
+        headers={"X-GitHub-Event": "ping", "X-Hub-Signature-256": sign("s3cret", body)},
+    )
+
+    assert unsigned.status_code == 401
+    assert forged.status_code == 401
+    assert signed.status_code == 202
+    assert signed.json() == {"status": "pong"}
+
+
+def test_pushes_are_debounced_and_superseded_runs_cancelled():
+    launches = []
+    cancelled = []
+
+    async def scenario():
+        async def fake_launch(repo_url, pr_number, head_sha, base_sha):
+            analysis_id = len(launches) + 1
+            launches.append((head_sha, base_sha))
+
+            async def run():
+                try:
+                    await asyncio.sleep(0 if head_sha == "c3" else 10)
+                except asyncio.CancelledError:
+                    cancelled.append(head_sha)
+                    raise
+                return "completed"
+
+            return analysis_id, analysis_tasks.start(analysis_id, run())
+
+        debouncer = PushDebouncer(fake_launch, debounce_s=0.05)
+
+        def push(action, sha):
+            return debouncer.handle(PullRequestEvent(REPO, 7, action, sha))
+
+        statuses = [await push("opened", "c1"), await push("synchronize", "c2"), await push("synchronize", "c2")]
+        await push("synchronize", "c3")
+        await asyncio.sleep(0.2)
+        # c3 completed, so the next head is analyzed incrementally against it.
+        await push("synchronize", "c4")
+        await asyncio.sleep(0.2)
+        await push("synchronize", "c5")
+        await asyncio.sleep(0.2)
+        await push("closed", "c5")
+        await asyncio.sleep(0.05)
+        return statuses
+
+    statuses = asyncio.run(scenario())
+
+    assert statuses == ["scheduled", "scheduled", "duplicate"]
+    assert launches == [("c3", None), ("c4", "c3"), ("c5", "c3")]
+    assert cancelled == ["c4", "c5"]
+
+
+def test_push_during_launch_cancels_the_run_being_created(monkeypatch):
+    launches = []
+    tasks = []
+
+    async def scenario():
+        creating = asyncio.Event()
+        committed = asyncio.Event()
+
+        async def slow_launch(repo_url, pr_number, head_sha, base_sha):
+            launches.append(head_sha)
+            if head_sha == "c1":
+                creating.set()
+                await committed.wait()
+
+            tasks.append(analysis_tasks.start(len(launches), asyncio.sleep(10)))
+            return len(launches), tasks[-1]
+
+        debouncer = PushDebouncer(slow_launch, debounce_s=0.01)
+        await debouncer.handle(PullRequestEvent(REPO, 7, "opened", "c1"))
+        await creating.wait()
+        await debouncer.handle(PullRequestEvent(REPO, 7, "synchronize", "c2"))
+        committed.set()
+        await asyncio.sleep(0.1)
+        await debouncer.handle(PullRequestEvent(REPO, 7, "closed", "c2"))
+        await asyncio.sleep(0.01)
+
+        # Idle PRs are forgotten once they expire.
+        monkeypatch.setattr(webhooks, "IDLE_STATE_TTL_S", -1)
+        debouncer._states[(REPO, 8)] = webhooks._PullRequestState(head_sha="c9")
+        await debouncer.handle(PullRequestEvent(REPO, 9, "labeled", "c1"))
+        return debouncer._states
+
+    states = asyncio.run(scenario())
+
+    assert launches == ["c1", "c2"]
+    assert [task.cancelled() for task in tasks] == [True, True]
+    assert states == {}
+
+
+def test_incremental_fetch_compares_commits_and_reads_at_head():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if "/compare/gone...c2" in request.url.path:
+            return httpx.Response(404, json={"message": "Not Found"})
+        if "/compare/" in request.url.path:
+            files = [
+                {"filename": "app.py", "status": "modified", "changes": 4, "sha": "a"},
+                {"filename": "old.py", "status": "removed", "changes": 9, "sha": "b"},
+            ]
+            return httpx.Response(200, json={"files": files})
+        return httpx.Response(200, json={"encoding": "base64", "content": "cHJpbnQoMSkK"})
+
+    service = GitHubService(http_cache=None)
+    service.base_url = "http://gh"
+    ref = RepoRef("acme", "api")
+    churn = {}
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            files = await service._fetch_compare_files(client, ref, None, "c1", "c2", churn)
+            missing = await service._fetch_compare_files(client, ref, None, "gone", "c2")
+            content = await service._fetch_file_content(client, ref, None, "app.py", "c2")
+            return files, missing, content
+
+    files, missing, content = asyncio.run(scenario())
+
+    assert [item.path for item in files] == ["app.py"]
+    assert churn == {"app.py": 4}
+    assert missing is None
+    assert content == b"print(1)\n"
+    assert requests[-1].url.params["ref"] == "c2"